@@ -0,0 +1,55 @@
+"""douyin content files download priority
+
+Revision ID: 3d7b52e8a1f4
+Revises: 8e4a1c6f2d90
+Create Date: 2026-10-19 16:21:08.417362
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3d7b52e8a1f4'
+down_revision: Union[str, None] = '8e4a1c6f2d90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 抖音相关的表由应用启动时 create_all 创建，表不存在时跳过，已存在的字段不重复添加
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('douyin_content_files'):
+        return
+    existing = {column['name'] for column in inspector.get_columns('douyin_content_files')}
+    if 'priority' not in existing:
+        op.add_column('douyin_content_files', sa.Column(
+            'priority', sa.Integer(), nullable=True, comment='下载通道: 0=封面和图集首图优先下载, 1=视频等大文件'
+        ))
+    # 已有记录按文件类型补上下载通道
+    op.execute(
+        "UPDATE douyin_content_files SET priority = CASE "
+        "WHEN file_type IN ('cover', 'origin_cover', 'dynamic_cover') OR (file_type = 'image' AND file_index = 1) "
+        "THEN 0 ELSE 1 END WHERE priority IS NULL"
+    )
+    indexes = {index['name'] for index in inspector.get_indexes('douyin_content_files')}
+    if 'ix_douyin_content_files_queue' in indexes:
+        op.drop_index('ix_douyin_content_files_queue', table_name='douyin_content_files')
+    op.create_index('ix_douyin_content_files_queue', 'douyin_content_files',
+                    ['download_status', 'priority', 'next_retry_at'], unique=False)
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('douyin_content_files'):
+        return
+    indexes = {index['name'] for index in inspector.get_indexes('douyin_content_files')}
+    existing = {column['name'] for column in inspector.get_columns('douyin_content_files')}
+    with op.batch_alter_table('douyin_content_files') as batch_op:
+        if 'ix_douyin_content_files_queue' in indexes:
+            batch_op.drop_index('ix_douyin_content_files_queue')
+        if 'priority' in existing:
+            batch_op.drop_column('priority')
+        batch_op.create_index('ix_douyin_content_files_queue', ['download_status', 'next_retry_at'], unique=False)
@@ -0,0 +1,38 @@
+"""douyin content files add file_mtime
+
+Revision ID: 5b2d7e9c41a3
+Revises: cb157142fd8a
+Create Date: 2026-10-19 10:12:40.218311
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b2d7e9c41a3'
+down_revision: Union[str, None] = 'cb157142fd8a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_column(table_name: str, column_name: str) -> bool:
+    # 抖音相关的表由应用启动时 create_all 创建，可能不存在或已包含该字段
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table(table_name):
+        return True
+    return any(column['name'] == column_name for column in inspector.get_columns(table_name))
+
+
+def upgrade() -> None:
+    if not _has_column('douyin_content_files', 'file_mtime'):
+        op.add_column('douyin_content_files', sa.Column('file_mtime', sa.BigInteger(), nullable=True, comment='文件修改时间(纳秒)，与大小一起判断文件是否变化'))
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if inspector.has_table('douyin_content_files') and _has_column('douyin_content_files', 'file_mtime'):
+        with op.batch_alter_table('douyin_content_files') as batch_op:
+            batch_op.drop_column('file_mtime')
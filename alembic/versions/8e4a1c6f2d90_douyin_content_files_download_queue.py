@@ -0,0 +1,56 @@
+"""douyin content files download queue
+
+Revision ID: 8e4a1c6f2d90
+Revises: 5b2d7e9c41a3
+Create Date: 2026-10-19 14:03:27.551904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e4a1c6f2d90'
+down_revision: Union[str, None] = '5b2d7e9c41a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _queue_columns():
+    return (
+        sa.Column('source_urls', sa.JSON(), nullable=True, comment='下载地址列表，按顺序回退'),
+        sa.Column('retry_count', sa.Integer(), nullable=True, comment='已失败的下载次数'),
+        sa.Column('next_retry_at', sa.DateTime(timezone=True), nullable=True, comment='下次允许重试的时间'),
+        sa.Column('claim_token', sa.String(length=32), nullable=True, comment='领取该文件的下载批次标识'),
+        sa.Column('claimed_at', sa.DateTime(timezone=True), nullable=True, comment='被下载进程领取的时间'),
+    )
+
+
+def upgrade() -> None:
+    # 抖音相关的表由应用启动时 create_all 创建，表不存在时跳过，已存在的字段不重复添加
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('douyin_content_files'):
+        return
+    existing = {column['name'] for column in inspector.get_columns('douyin_content_files')}
+    for column in _queue_columns():
+        if column.name not in existing:
+            op.add_column('douyin_content_files', column)
+    indexes = {index['name'] for index in inspector.get_indexes('douyin_content_files')}
+    if 'ix_douyin_content_files_queue' not in indexes:
+        op.create_index('ix_douyin_content_files_queue', 'douyin_content_files', ['download_status', 'next_retry_at'], unique=False)
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('douyin_content_files'):
+        return
+    indexes = {index['name'] for index in inspector.get_indexes('douyin_content_files')}
+    existing = {column['name'] for column in inspector.get_columns('douyin_content_files')}
+    with op.batch_alter_table('douyin_content_files') as batch_op:
+        if 'ix_douyin_content_files_queue' in indexes:
+            batch_op.drop_index('ix_douyin_content_files_queue')
+        for column in _queue_columns():
+            if column.name in existing:
+                batch_op.drop_column(column.name)
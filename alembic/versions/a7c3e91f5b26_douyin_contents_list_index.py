@@ -0,0 +1,38 @@
+"""douyin contents list index
+
+Revision ID: a7c3e91f5b26
+Revises: 3d7b52e8a1f4
+Create Date: 2026-10-19 18:02:44.193205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c3e91f5b26'
+down_revision: Union[str, None] = '3d7b52e8a1f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 抖音相关的表由应用启动时 create_all 创建，表不存在时跳过，已存在的索引不重复创建
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('douyin_contents'):
+        return
+    indexes = {index['name'] for index in inspector.get_indexes('douyin_contents')}
+    if 'ix_douyin_contents_creator_list' not in indexes:
+        op.create_index('ix_douyin_contents_creator_list', 'douyin_contents',
+                        ['creator_id', 'content_type', 'is_top', 'create_time'], unique=False)
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('douyin_contents'):
+        return
+    indexes = {index['name'] for index in inspector.get_indexes('douyin_contents')}
+    if 'ix_douyin_contents_creator_list' in indexes:
+        op.drop_index('ix_douyin_contents_creator_list', table_name='douyin_contents')
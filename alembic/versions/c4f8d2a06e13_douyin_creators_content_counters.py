@@ -0,0 +1,64 @@
+"""douyin creators content counters
+
+Revision ID: c4f8d2a06e13
+Revises: a7c3e91f5b26
+Create Date: 2026-10-19 19:14:37.528610
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4f8d2a06e13'
+down_revision: Union[str, None] = 'a7c3e91f5b26'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COUNTER_COLUMNS = (
+    ('video_count', sa.Integer(), '已采集的视频数'),
+    ('image_count', sa.Integer(), '已采集的图集数'),
+    ('downloaded_file_count', sa.Integer(), '已下载完成的文件数'),
+    ('downloaded_bytes', sa.BigInteger(), '已下载文件的总字节数'),
+)
+
+
+def upgrade() -> None:
+    # 抖音相关的表由应用启动时 create_all 创建，表不存在时跳过，已存在的字段不重复添加
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('douyin_creators'):
+        return
+    existing = {column['name'] for column in inspector.get_columns('douyin_creators')}
+    for name, column_type, comment in COUNTER_COLUMNS:
+        if name not in existing:
+            op.add_column('douyin_creators', sa.Column(name, column_type, nullable=True, comment=comment))
+
+    if not inspector.has_table('douyin_contents') or not inspector.has_table('douyin_content_files'):
+        return
+    # 按现有数据补上计数
+    op.execute(
+        "UPDATE douyin_creators SET "
+        "video_count = (SELECT COUNT(*) FROM douyin_contents c "
+        "WHERE c.creator_id = douyin_creators.id AND c.content_type = 'video'), "
+        "image_count = (SELECT COUNT(*) FROM douyin_contents c "
+        "WHERE c.creator_id = douyin_creators.id AND c.content_type = 'image'), "
+        "downloaded_file_count = (SELECT COUNT(*) FROM douyin_content_files f "
+        "JOIN douyin_contents c ON f.content_id = c.id "
+        "WHERE c.creator_id = douyin_creators.id AND f.download_status = 'completed'), "
+        "downloaded_bytes = (SELECT COALESCE(SUM(f.file_size), 0) FROM douyin_content_files f "
+        "JOIN douyin_contents c ON f.content_id = c.id "
+        "WHERE c.creator_id = douyin_creators.id AND f.download_status = 'completed')"
+    )
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('douyin_creators'):
+        return
+    existing = {column['name'] for column in inspector.get_columns('douyin_creators')}
+    with op.batch_alter_table('douyin_creators') as batch_op:
+        for name, _, _ in reversed(COUNTER_COLUMNS):
+            if name in existing:
+                batch_op.drop_column(name)
@@ -0,0 +1,40 @@
+"""douyin crawl checkpoints drop pending downloads
+
+Revision ID: e91b6d3c7a58
+Revises: c4f8d2a06e13
+Create Date: 2026-10-19 20:41:12.806395
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e91b6d3c7a58'
+down_revision: Union[str, None] = 'c4f8d2a06e13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 待下载任务已改由 douyin_content_files 下载队列保存，删除 create_all 建表时留下的旧字段
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('douyin_crawl_checkpoints'):
+        return
+    existing = {column['name'] for column in inspector.get_columns('douyin_crawl_checkpoints')}
+    if 'pending_downloads' in existing:
+        with op.batch_alter_table('douyin_crawl_checkpoints') as batch_op:
+            batch_op.drop_column('pending_downloads')
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('douyin_crawl_checkpoints'):
+        return
+    existing = {column['name'] for column in inspector.get_columns('douyin_crawl_checkpoints')}
+    if 'pending_downloads' not in existing:
+        op.add_column('douyin_crawl_checkpoints', sa.Column(
+            'pending_downloads', sa.JSON(), nullable=True, comment='尚未完成的下载任务'
+        ))
@@ -0,0 +1,45 @@
+"""douyin contents default sort indexes
+
+Revision ID: f3a58c7d2e90
+Revises: e91b6d3c7a58
+Create Date: 2026-10-19 21:16:05.527381
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a58c7d2e90'
+down_revision: Union[str, None] = 'e91b6d3c7a58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 视频/图文列表默认按 aweme_id 排序，不区分类型的作品列表默认按发布时间排序
+INDEXES = {
+    'ix_douyin_contents_creator_type_aweme': ['creator_id', 'content_type', 'is_top', 'aweme_id'],
+    'ix_douyin_contents_creator_all': ['creator_id', 'is_top', 'create_time'],
+}
+
+
+def upgrade() -> None:
+    # 抖音相关的表由应用启动时 create_all 创建，表不存在时跳过，已存在的索引不重复创建
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('douyin_contents'):
+        return
+    indexes = {index['name'] for index in inspector.get_indexes('douyin_contents')}
+    for name, columns in INDEXES.items():
+        if name not in indexes:
+            op.create_index(name, 'douyin_contents', columns, unique=False)
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('douyin_contents'):
+        return
+    indexes = {index['name'] for index in inspector.get_indexes('douyin_contents')}
+    for name in INDEXES:
+        if name in indexes:
+            op.drop_index(name, table_name='douyin_contents')
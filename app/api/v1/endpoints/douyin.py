@@ -14,7 +14,8 @@ from app.schemas.douyin import (
     DouyinFollowingListResponse,
     DouyinCreatorAddRequest,
     DouyinCreatorUpdate,
-    DouyinContentListResponse
+    DouyinContentListResponse,
+    DouyinContentMetricPoint
 )
 from app.services.douyin import save_douyin_cookie, get_douyin_cookie
 from app.db.session import get_db
@@ -22,19 +23,47 @@ from app.core.task_executor import start_task
 
 from typing import Optional, List
 from ....models.douyin import DouyinCreator, DouyinContent, DouyinContentFile
-from ....scripts.douyin.tiktok_api import TikTokApi
+from ....scripts.douyin.tiktok_api import AsyncTikTokApi
+from ....scripts.douyin.pacer import get_pacer_stats
+from ....scripts.douyin.download_engine import get_download_engine_stats
+from ....scripts.douyin.share_links import async_resolve_share_link
+from ....scripts.douyin.download_queue import fetch_deferred_file
+from ....scripts.douyin.download_policy import COVER_VARIANTS, select_cover_file
+from app.crud.douyin import (
+    get_content_metrics_rollup, get_download_queue_stats, get_content_files_by_aweme_ids,
+    get_contents_page, get_creator_content_total, CONTENT_SORT_FIELDS
+)
 from app.core.security import get_current_user
 from app.core.error_codes import ErrorCode
 from datetime import datetime
 from app.schemas.task import TaskType, TaskCreate
 from sqlalchemy import desc
-from fastapi.responses import StreamingResponse
+from app.core.media import MediaFileResponse, REVALIDATE_CACHE_CONTROL
 import os
+import asyncio
 
 import re
 
 router = APIRouter()
 
+
+# 文件仍在下载队列中时提示客户端稍后重试的间隔（秒）
+QUEUED_FILE_RETRY_AFTER = 5
+
+
+async def _ensure_local_file(db: Session, file_record: DouyinContentFile) -> bool:
+    """延迟下载的文件在首次请求时立即下载，返回文件是否可用
+
+    仍在下载队列中的文件交给后台下载线程，返回 503 和 Retry-After 让客户端稍后重试
+    （<img>/<video> 会把 2xx 的响应体当作媒体内容，不能用 202）。
+    """
+    if file_record.file_path and os.path.exists(file_record.file_path):
+        return True
+    if file_record.download_status in ("pending", "downloading"):
+        raise HTTPException(status_code=503, detail="文件正在下载，请稍后重试",
+                            headers={"Retry-After": str(QUEUED_FILE_RETRY_AFTER)})
+    return await asyncio.to_thread(fetch_deferred_file, db, file_record)
+
 @router.post("/creators", response_model=ApiResponse[DouyinCreatorResponse])
 async def add_douyin_creator(
     creator_data: DouyinCreatorAddRequest,
@@ -53,10 +82,10 @@ async def add_douyin_creator(
                 share_url = match.group(0)
 
         saved_cookie = get_douyin_cookie(db, current_user.id)
-        tiktok_api = TikTokApi(cookie=saved_cookie)
+        tiktok_api = AsyncTikTokApi(cookie=saved_cookie)
 
-        # 从分享URL获取sec_user_id
-        sec_user_id = tiktok_api.get_sec_user_id(share_url)
+        # 从分享URL获取sec_user_id（优先使用短链解析缓存）
+        sec_user_id, _ = await async_resolve_share_link(db, tiktok_api, share_url)
         if not sec_user_id:
             return ApiResponse(code=400, message="无法从分享链接获取用户ID", data=None)
             
@@ -69,7 +98,7 @@ async def add_douyin_creator(
             return ApiResponse(code=400, message="该创作者已存在", data=None)
             
         # 获取用户信息
-        user_info = tiktok_api.get_user_info(sec_user_id)
+        user_info = await tiktok_api.get_user_info(sec_user_id)
         # print("user_info", user_info)
         if not user_info:
             return ApiResponse(code=400, message="无法获取创作者信息", data=None)
@@ -227,8 +256,8 @@ async def refresh_creator(
 
         # 使用抖音API获取最新信息
         saved_cookie = get_douyin_cookie(db, current_user.id)
-        tiktok_api = TikTokApi(cookie=saved_cookie)
-        user_info = tiktok_api.get_user_info(creator.sec_user_id)
+        tiktok_api = AsyncTikTokApi(cookie=saved_cookie)
+        user_info = await tiktok_api.get_user_info(creator.sec_user_id)
         
         if not user_info:
             return ApiResponse(code=400, message="无法获取创作者最新信息", data=None)
@@ -341,6 +370,8 @@ async def get_creator_videos(
     limit: int = Query(20, ge=1, le=100),
     sort_by: str = Query("aweme_id", description="排序字段: aweme_id, created_at, play_count, digg_count, collect_count, share_count"),
     sort_desc: bool = Query(True, description="是否降序排序"),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor，传入时忽略 skip"),
+    with_total: Optional[bool] = Query(None, description="是否返回总数，默认只在第一页（不带游标）返回"),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
@@ -352,6 +383,8 @@ async def get_creator_videos(
         limit: 返回的记录数
         sort_by: 排序字段
         sort_desc: 是否降序排序
+        cursor: 上一页返回的 next_cursor
+        with_total: 是否返回总数
     """
     try:
         # 检查创作者是否存在
@@ -365,34 +398,27 @@ async def get_creator_videos(
                 message="创作者不存在"
             )
             
-        # 构建查询
-        query = db.query(DouyinContent).filter(
-            DouyinContent.creator_id == creator.id,
-            DouyinContent.content_type == "video"
-        )
-        
-        # 默认按照is_top降序排序（置顶视频在前）
-        query = query.order_by(desc(DouyinContent.is_top))
-        
-        # 添加排序
-        sort_field = getattr(DouyinContent, sort_by, DouyinContent.aweme_id)
-        if sort_desc:
-            query = query.order_by(desc(DouyinContent.is_top), desc(sort_field))
-        else:
-            query = query.order_by(desc(DouyinContent.is_top), sort_field)
-        
-        # 获取总记录数
-        total = query.count()
+        # 置顶视频在前，其余按排序字段排序；用游标翻页时每页的查询代价与页码无关
+        sort_by = sort_by if sort_by in CONTENT_SORT_FIELDS else "aweme_id"
+        try:
+            videos, next_cursor = get_contents_page(
+                db, creator.id, "video", sort_by, sort_desc, limit, cursor=cursor, skip=skip
+            )
+        except ValueError as e:
+            return ApiResponse(code=ErrorCode.PARAM_ERROR, message=str(e))
         
-        # 获取分页数据
-        videos = query.offset(skip).limit(limit).all()
+        # 总数默认只在第一页返回，从创作者的计数读取
+        if with_total is None:
+            with_total = cursor is None
+        total = get_creator_content_total(creator, "video") if with_total else None
         
         return ApiResponse(
             code=200,
             message="获取视频列表成功",
             data=PaginationResponse(
                 items=videos,
-                total=total
+                total=total,
+                next_cursor=next_cursor
             )
         )
     except Exception as e:
@@ -401,7 +427,7 @@ async def get_creator_videos(
             message=f"获取视频列表失败: {str(e)}"
         )
 
-@router.get("/videos/{aweme_id}/play", response_class=StreamingResponse)
+@router.get("/videos/{aweme_id}/play", response_class=MediaFileResponse)
 async def play_video(
     aweme_id: str,
     request: Request,
@@ -420,99 +446,41 @@ async def play_video(
         
         video_path = video_file.file_path
         
-        if not os.path.exists(video_path):
+        if not await _ensure_local_file(db, video_file):
             raise HTTPException(status_code=404, detail="视频文件不存在")
 
-        file_size = os.path.getsize(video_path)
-        range_header = request.headers.get("range")
-
-        # 处理范围请求
-        if range_header:
-            start_byte = 0
-            end_byte = file_size - 1
-
-            if range_header.startswith("bytes="):
-                range_data = range_header.replace("bytes=", "").split("-")
-                if len(range_data) == 2:
-                    if range_data[0]:
-                        start_byte = int(range_data[0])
-                    if range_data[1]:
-                        end_byte = int(range_data[1])
-
-            chunk_size = end_byte - start_byte + 1
-
-            def iterfile():
-                with open(video_path, "rb") as f:
-                    f.seek(start_byte)
-                    remaining = chunk_size
-                    while remaining > 0:
-                        chunk = f.read(min(8192, remaining))
-                        if not chunk:
-                            break
-                        remaining -= len(chunk)
-                        yield chunk
-
-            headers = {
-                "Content-Range": f"bytes {start_byte}-{end_byte}/{file_size}",
-                "Accept-Ranges": "bytes",
-                "Content-Length": str(chunk_size),
-                "Content-Type": "video/mp4",
-            }
-
-            return StreamingResponse(
-                iterfile(),
-                status_code=206,
-                headers=headers
-            )
-        else:
-            # 如果没有范围请求，返回完整文件
-            def iterfile():
-                with open(video_path, "rb") as f:
-                    while chunk := f.read(8192):
-                        yield chunk
-
-            headers = {
-                "Accept-Ranges": "bytes",
-                "Content-Length": str(file_size),
-                "Content-Type": "video/mp4",
-            }
-
-            return StreamingResponse(
-                iterfile(),
-                headers=headers
-            )
+        # 范围请求（含后缀和多范围）、416 和零拷贝发送由 MediaFileResponse 处理
+        return MediaFileResponse(video_path, media_type="video/mp4", file_hash=video_file.file_hash)
 
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"播放视频失败: {str(e)}")
 
-@router.get("/videos/{aweme_id}/cover", response_class=StreamingResponse)
+@router.get("/videos/{aweme_id}/cover", response_class=MediaFileResponse)
 async def get_video_cover(
     aweme_id: str,
     db: Session = Depends(get_db),
 ):
     """获取视频封面"""
     try:
-        # 查询视频封面文件记录
-        cover_file = db.query(DouyinContentFile).filter(
+        # 查询视频封面文件记录，按封面偏好选择已下载的封面，都没有下载时下载最优的一个
+        cover_file = select_cover_file(db.query(DouyinContentFile).filter(
             DouyinContentFile.aweme_id == aweme_id,
-            DouyinContentFile.file_type == "cover"
-        ).first()
+            DouyinContentFile.file_type.in_(COVER_VARIANTS)
+        ).all())
         
-        if not cover_file or not cover_file.file_path:
+        if not cover_file:
             raise HTTPException(status_code=404, detail="封面文件不存在")
         
         cover_path = cover_file.file_path
         
-        if not os.path.exists(cover_path):
+        if not await _ensure_local_file(db, cover_file):
             raise HTTPException(status_code=404, detail="封面文件不存在")
         
-        def iterfile():
-            with open(cover_path, "rb") as f:
-                yield from f
-        
-        return StreamingResponse(iterfile(), media_type="image/jpeg")
+        # 同一作品的封面可能换成更优的封面，浏览器需要用 ETag 重新验证
+        return MediaFileResponse(cover_path, media_type="image/jpeg", file_hash=cover_file.file_hash,
+                                 cache_control=REVALIDATE_CACHE_CONTROL)
     except HTTPException:
         raise
     except Exception as e:
@@ -525,6 +493,8 @@ async def get_creator_image_posts(
     limit: int = Query(20, ge=1, le=100),
     sort_by: str = Query("aweme_id", description="排序字段: aweme_id, created_at, digg_count, collect_count, share_count"),
     sort_desc: bool = Query(True, description="是否降序排序"),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor，传入时忽略 skip"),
+    with_total: Optional[bool] = Query(None, description="是否返回总数，默认只在第一页（不带游标）返回"),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
@@ -541,34 +511,27 @@ async def get_creator_image_posts(
                 message="创作者不存在"
             )
             
-        # 构建查询
-        query = db.query(DouyinContent).filter(
-            DouyinContent.creator_id == creator.id,
-            DouyinContent.content_type == "image"
-        )
-        
-        # 默认按照is_top降序排序（置顶图集在前）
-        query = query.order_by(desc(DouyinContent.is_top))
-        
-        # 添加排序
-        sort_field = getattr(DouyinContent, sort_by, DouyinContent.aweme_id)
-        if sort_desc:
-            query = query.order_by(desc(DouyinContent.is_top), desc(sort_field))
-        else:
-            query = query.order_by(desc(DouyinContent.is_top), sort_field)
-        
-        # 获取总记录数
-        total = query.count()
+        # 置顶图集在前，其余按排序字段排序；用游标翻页时每页的查询代价与页码无关
+        sort_by = sort_by if sort_by in CONTENT_SORT_FIELDS else "aweme_id"
+        try:
+            image_posts, next_cursor = get_contents_page(
+                db, creator.id, "image", sort_by, sort_desc, limit, cursor=cursor, skip=skip
+            )
+        except ValueError as e:
+            return ApiResponse(code=ErrorCode.PARAM_ERROR, message=str(e))
         
-        # 获取分页数据
-        image_posts = query.offset(skip).limit(limit).all()
+        # 总数默认只在第一页返回，从创作者的计数读取
+        if with_total is None:
+            with_total = cursor is None
+        total = get_creator_content_total(creator, "image") if with_total else None
         
         return ApiResponse(
             code=200,
             message="获取图集列表成功",
             data=PaginationResponse(
                 items=image_posts,
-                total=total
+                total=total,
+                next_cursor=next_cursor
             )
         )
     except Exception as e:
@@ -608,7 +571,7 @@ async def get_image_post_detail(
             message=f"获取图集详情失败: {str(e)}"
         )
 
-@router.get("/image-posts/{aweme_id}/images/{image_index}", response_class=StreamingResponse)
+@router.get("/image-posts/{aweme_id}/images/{image_index}", response_class=MediaFileResponse)
 async def get_image_file(
     aweme_id: str,
     image_index: int,
@@ -628,14 +591,10 @@ async def get_image_file(
         
         image_path = image_file.file_path
         
-        if not os.path.exists(image_path):
+        if not await _ensure_local_file(db, image_file):
             raise HTTPException(status_code=404, detail="图片文件不存在")
         
-        def iterfile():
-            with open(image_path, "rb") as f:
-                yield from f
-        
-        return StreamingResponse(iterfile(), media_type="image/jpeg")
+        return MediaFileResponse(image_path, media_type="image/jpeg", file_hash=image_file.file_hash)
     except HTTPException:
         raise
     except Exception as e:
@@ -655,8 +614,8 @@ async def get_following_list(
         if not saved_cookie:
             return ApiResponse(code=400, message="未找到保存的Cookie", data=None)
             
-        tiktok_api = TikTokApi(cookie=saved_cookie)
-        following_list = tiktok_api.get_me_following_list(count=count, max_time=max_time, min_time=min_time)
+        tiktok_api = AsyncTikTokApi(cookie=saved_cookie)
+        following_list = await tiktok_api.get_me_following_list(count=count, max_time=max_time, min_time=min_time)
         
         if not following_list or not following_list.followings:
             return ApiResponse(code=404, message="未找到关注列表数据", data=None)
@@ -705,6 +664,44 @@ async def get_following_list(
     except Exception as e:
         return ApiResponse(code=500, message=f"获取关注列表失败: {str(e)}", data=None)
 
+@router.get("/pacer/status", response_model=ApiResponse[dict])
+async def get_pacer_status(
+    current_user = Depends(get_current_user)
+):
+    """获取抖音请求限速器的当前速率"""
+    return ApiResponse(
+        code=200,
+        message="获取限速状态成功",
+        data=get_pacer_stats()
+    )
+
+@router.get("/downloads/status", response_model=ApiResponse[dict])
+async def get_download_status(
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """获取共享下载引擎的并发、连接和速率状态，以及下载队列中各状态的文件数"""
+    return ApiResponse(
+        code=200,
+        message="获取下载状态成功",
+        data={"engine": get_download_engine_stats(), "queue": get_download_queue_stats(db)}
+    )
+
+@router.get("/contents/{content_id}/metrics", response_model=ApiResponse[List[DouyinContentMetricPoint]])
+async def get_content_metrics(
+    content_id: int,
+    bucket_seconds: int = Query(86400, ge=60, description="汇总时间桶（秒），默认按天"),
+    start_ts: Optional[int] = Query(None, description="起始时间戳（秒）"),
+    end_ts: Optional[int] = Query(None, description="结束时间戳（秒，不含）"),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """获取内容的互动数据增长曲线"""
+    if not db.query(DouyinContent.id).filter(DouyinContent.id == content_id).first():
+        return ApiResponse(code=404, message="内容不存在", data=None)
+    points = get_content_metrics_rollup(db, content_id, bucket_seconds, start_ts, end_ts)
+    return ApiResponse(code=200, message="获取互动数据成功", data=points)
+
 @router.post("/creators/add", response_model=ApiResponse[DouyinCreatorResponse])
 async def add_douyin_creator_legacy(
     share_url: str,
@@ -734,6 +731,8 @@ async def get_creator_contents(
     content_type: Optional[str] = Query(None, description="内容类型筛选: video, image, 不传则返回所有类型"),
     sort_by: str = Query("create_time", description="排序字段: aweme_id, create_time, digg_count, collect_count, share_count, play_count"),
     sort_desc: bool = Query(True, description="是否降序排序"),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor，传入时忽略 skip"),
+    with_total: Optional[bool] = Query(None, description="是否返回总数，默认只在第一页（不带游标）返回"),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
@@ -746,6 +745,8 @@ async def get_creator_contents(
         content_type: 内容类型筛选: video, image, 不传则返回所有类型
         sort_by: 排序字段
         sort_desc: 是否降序排序
+        cursor: 上一页返回的 next_cursor
+        with_total: 是否返回总数
     """
     try:
         # 检查创作者是否存在
@@ -759,30 +760,24 @@ async def get_creator_contents(
                 message="创作者不存在"
             )
             
-        # 构建查询
-        query = db.query(DouyinContent).filter(
-            DouyinContent.creator_id == creator_id
-        )
-        
-        # 根据内容类型筛选
-        if content_type:
-            query = query.filter(DouyinContent.content_type == content_type)
-        
-        # 默认按照is_top降序排序（置顶内容在前）
-        query = query.order_by(desc(DouyinContent.is_top))
-        
-        # 添加排序
-        sort_field = getattr(DouyinContent, sort_by, DouyinContent.create_time)
-        if sort_desc:
-            query = query.order_by(desc(DouyinContent.is_top), desc(sort_field))
-        else:
-            query = query.order_by(desc(DouyinContent.is_top), sort_field)
+        # 置顶内容在前，其余按排序字段排序；用游标翻页时每页的查询代价与页码无关
+        sort_by = sort_by if sort_by in CONTENT_SORT_FIELDS else "create_time"
+        try:
+            contents, next_cursor = get_contents_page(
+                db, creator_id, content_type, sort_by, sort_desc, limit, cursor=cursor, skip=skip
+            )
+        except ValueError as e:
+            return ApiResponse(code=ErrorCode.PARAM_ERROR, message=str(e))
         
-        # 获取总记录数
-        total = query.count()
+        # 总数默认只在第一页返回，从创作者的计数读取
+        if with_total is None:
+            with_total = cursor is None
+        total = get_creator_content_total(creator, content_type) if with_total else None
         
-        # 获取分页数据
-        contents = query.offset(skip).limit(limit).all()
+        # 整页作品的封面和图片文件一次查出，按作品ID分组后在内存中选择封面
+        files_by_aweme = get_content_files_by_aweme_ids(
+            db, [content.aweme_id for content in contents], list(COVER_VARIANTS) + ["image"]
+        )
         
         # 处理返回数据，添加封面和图片文件ID
         result_contents = []
@@ -792,60 +787,19 @@ async def get_creator_contents(
                 column.name: getattr(content, column.name)
                 for column in content.__table__.columns
             }
+            content_files = files_by_aweme.get(content.aweme_id, [])
             
             # 添加封面和图片文件ID
             if content.content_type == "video":
-                # 按照优先级查询视频封面文件: dynamic_cover > origin_cover > cover
-                cover_file = None
-                
-                # 1. 首先查询dynamic_cover
-                dynamic_cover = db.query(DouyinContentFile).filter(
-                    DouyinContentFile.aweme_id == content.aweme_id,
-                    DouyinContentFile.file_type == "dynamic_cover"
-                ).first()
-                
-                if dynamic_cover and dynamic_cover.file_path and os.path.exists(dynamic_cover.file_path):
-                    cover_file = dynamic_cover
-                else:
-                    # 2. 其次查询origin_cover
-                    origin_cover = db.query(DouyinContentFile).filter(
-                        DouyinContentFile.aweme_id == content.aweme_id,
-                        DouyinContentFile.file_type == "origin_cover"
-                    ).first()
-                    
-                    if origin_cover and origin_cover.file_path and os.path.exists(origin_cover.file_path):
-                        cover_file = origin_cover
-                    else:
-                        # 3. 最后查询普通cover
-                        normal_cover = db.query(DouyinContentFile).filter(
-                            DouyinContentFile.aweme_id == content.aweme_id,
-                            DouyinContentFile.file_type == "cover"
-                        ).first()
-                        
-                        if normal_cover and normal_cover.file_path and os.path.exists(normal_cover.file_path):
-                            cover_file = normal_cover
-                
-                if cover_file:
-                    # 返回文件ID
-                    content_dict["cover_file_id"] = cover_file.id
-                else:
-                    content_dict["cover_file_id"] = None
-                
+                # 按照封面偏好选择封面文件（默认 dynamic_cover > origin_cover > cover），
+                # 未下载的封面也返回文件ID，首次请求该文件时再下载
+                cover_file = select_cover_file([f for f in content_files if f.file_type in COVER_VARIANTS])
+                content_dict["cover_file_id"] = cover_file.id if cover_file else None
                 content_dict["image_file_ids"] = None
                 
             elif content.content_type == "image":
-                # 查询图集中的图片文件
-                image_files = db.query(DouyinContentFile).filter(
-                    DouyinContentFile.aweme_id == content.aweme_id,
-                    DouyinContentFile.file_type == "image"
-                ).order_by(DouyinContentFile.file_index).all()
-                
-                if image_files:
-                    # 返回文件ID列表
-                    content_dict["image_file_ids"] = [image_file.id for image_file in image_files]
-                else:
-                    content_dict["image_file_ids"] = []
-                
+                # 图集中的图片文件，已按文件序号排序
+                content_dict["image_file_ids"] = [f.id for f in content_files if f.file_type == "image"]
                 content_dict["cover_file_id"] = None
             
             result_contents.append(content_dict)
@@ -855,7 +809,8 @@ async def get_creator_contents(
             message="获取作品列表成功",
             data=PaginationResponse(
                 items=result_contents,
-                total=total
+                total=total,
+                next_cursor=next_cursor
             )
         )
     except Exception as e:
@@ -864,7 +819,7 @@ async def get_creator_contents(
             message=f"获取作品列表失败: {str(e)}"
         )
 
-@router.get("/files/{file_id}", response_class=StreamingResponse)
+@router.get("/files/{file_id}", response_class=MediaFileResponse)
 async def get_file_by_id(
     file_id: int,
     db: Session = Depends(get_db),
@@ -881,7 +836,7 @@ async def get_file_by_id(
         
         file_path = file_record.file_path
         
-        if not os.path.exists(file_path):
+        if not await _ensure_local_file(db, file_record):
             raise HTTPException(status_code=404, detail="文件不存在")
         
         # 根据文件类型设置不同的媒体类型
@@ -891,11 +846,7 @@ async def get_file_by_id(
         elif file_record.file_type in ["cover", "origin_cover", "dynamic_cover"]:
             media_type = "image/jpeg"
     
-        def iterfile():
-            with open(file_path, "rb") as f:
-                yield from f
-        
-        return StreamingResponse(iterfile(), media_type=media_type)
+        return MediaFileResponse(file_path, media_type=media_type, file_hash=file_record.file_hash)
     except HTTPException:
         raise
     except Exception as e:
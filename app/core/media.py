@@ -0,0 +1,251 @@
+"""
+本地媒体文件响应
+
+视频、封面、图片等接口共用的文件响应：支持单个、后缀（bytes=-N）和多个范围的 Range 请求，
+范围无法满足时返回 416。服务器支持 ASGI 的 http.response.pathsend / http.response.zerocopy 扩展时
+由服务器直接用 sendfile 发送文件，否则用 pread 按大块读取，拖动视频进度条不再逐个 8KB 块在 Python 中循环。
+
+传入文件哈希时以它作为强 ETag，并带上 Last-Modified 和 Cache-Control；
+If-None-Match 命中时直接返回 304，不读取文件，If-Range 与当前版本不一致时返回完整文件。
+"""
+import os
+import secrets
+from email.utils import formatdate, parsedate_to_datetime
+from typing import List, Mapping, Optional, Tuple
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+# 每次读取并发送的字节数
+MEDIA_CHUNK_SIZE = int(os.getenv("MEDIA_CHUNK_SIZE", str(1024 * 1024)))
+# 一个请求最多接受的范围数，超过时忽略 Range 返回完整文件
+MEDIA_MAX_RANGES = 16
+
+# 下载后内容不会再变化的文件（按文件ID、图片序号访问）的缓存策略，以及同一地址内容可能变化时的缓存策略
+IMMUTABLE_CACHE_CONTROL = os.getenv("MEDIA_CACHE_CONTROL", "public, max-age=31536000, immutable")
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+PATHSEND_EXTENSION = "http.response.pathsend"
+ZEROCOPY_EXTENSION = "http.response.zerocopy"
+
+
+def parse_range_header(range_header: str, file_size: int) -> Optional[List[Tuple[int, int]]]:
+    """解析 Range 请求头
+
+    Returns:
+        按起始位置排序并合并重叠部分的闭区间列表 [(start, end)]；
+        请求头无效或范围过多时返回 None（忽略 Range，返回完整文件）；
+        所有范围都超出文件大小时返回空列表（416）
+    """
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec.strip():
+        return None
+
+    ranges = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, separator, last = (value.strip() for value in part.partition("-"))
+        if not separator or (first and not first.isdigit()) or (last and not last.isdigit()) or not (first or last):
+            return None
+        if not first:
+            # 后缀范围：最后 N 个字节
+            start, end = max(file_size - int(last), 0), file_size - 1
+            if int(last) == 0:
+                continue
+        else:
+            start = int(first)
+            end = min(int(last), file_size - 1) if last else file_size - 1
+            if last and int(last) < start:
+                return None
+        if start <= end:
+            ranges.append((start, end))
+    if len(ranges) > MEDIA_MAX_RANGES:
+        return None
+
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def etag_matches(header: str, etag: str, weak: bool = True) -> bool:
+    """判断 If-None-Match（弱比较）或 If-Range（强比较）是否与 ETag 匹配"""
+    if weak and header.strip() == "*":
+        return True
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if weak:
+            candidate = candidate[2:] if candidate.startswith("W/") else candidate
+        if candidate == etag:
+            return True
+    return False
+
+
+def _not_modified_since(header: str, mtime: float) -> bool:
+    try:
+        return int(mtime) <= parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+def _read_at(file, offset: int, size: int) -> bytes:
+    if hasattr(os, "pread"):
+        return os.pread(file.fileno(), size, offset)
+    file.seek(offset)
+    return file.read(size)
+
+
+class MediaFileResponse(Response):
+    """支持 Range 请求、条件请求和零拷贝发送的文件响应
+
+    Args:
+        file_hash: 文件内容的哈希，作为强 ETag
+        cache_control: Cache-Control 响应头，默认为 IMMUTABLE_CACHE_CONTROL
+    """
+
+    def __init__(self, path: str, media_type: str = "application/octet-stream",
+                 headers: Optional[Mapping[str, str]] = None, stat_result: Optional[os.stat_result] = None,
+                 file_hash: Optional[str] = None, cache_control: Optional[str] = IMMUTABLE_CACHE_CONTROL):
+        self.path = path
+        self.status_code = 200
+        self.media_type = media_type
+        self.background = None
+        self.stat_result = stat_result
+        self.etag = f'"{file_hash}"' if file_hash else None
+        self.init_headers(headers)
+        if self.etag:
+            self.headers["etag"] = self.etag
+        if cache_control:
+            self.headers["cache-control"] = cache_control
+
+    def _response_headers(self, content_length: int, **extra: str) -> list:
+        headers = MutableHeaders(raw=list(self.raw_headers))
+        headers["accept-ranges"] = "bytes"
+        headers["content-length"] = str(content_length)
+        for name, value in extra.items():
+            headers[name.replace("_", "-")] = value
+        return headers.raw
+
+    async def _send_not_modified(self, send: Send) -> None:
+        headers = [(name, value) for name, value in self.raw_headers
+                   if name not in (b"content-type", b"content-length")]
+        await send({"type": "http.response.start", "status": 304, "headers": headers})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        request_headers = Headers(scope=scope)
+        if_none_match = request_headers.get("if-none-match")
+        # ETag 匹配时不需要 stat 或打开文件
+        if self.etag and if_none_match and etag_matches(if_none_match, self.etag):
+            await self._send_not_modified(send)
+            return
+
+        stat_result = self.stat_result or await anyio.to_thread.run_sync(os.stat, self.path)
+        file_size = stat_result.st_size
+        last_modified = formatdate(stat_result.st_mtime, usegmt=True)
+        self.headers["last-modified"] = last_modified
+        if_modified_since = request_headers.get("if-modified-since")
+        if not if_none_match and if_modified_since and _not_modified_since(if_modified_since, stat_result.st_mtime):
+            await self._send_not_modified(send)
+            return
+
+        range_header = request_headers.get("range")
+        if_range = request_headers.get("if-range")
+        if range_header and if_range and not (
+                (self.etag and etag_matches(if_range, self.etag, weak=False)) or if_range == last_modified):
+            # 客户端缓存的是其他版本，返回完整文件
+            range_header = None
+        ranges = parse_range_header(range_header, file_size) if range_header else None
+        send_body = scope["method"].upper() != "HEAD"
+        extensions = scope.get("extensions") or {}
+
+        if ranges == []:
+            await send({
+                "type": "http.response.start",
+                "status": 416,
+                "headers": self._response_headers(0, content_range=f"bytes */{file_size}"),
+            })
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        if ranges is None:
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": self._response_headers(file_size),
+            })
+            if not send_body:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+            elif PATHSEND_EXTENSION in extensions:
+                await send({"type": PATHSEND_EXTENSION, "path": os.path.abspath(self.path)})
+            else:
+                await self._send_ranges(send, extensions, [(0, file_size - 1)] if file_size else [])
+            return
+
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            await send({
+                "type": "http.response.start",
+                "status": 206,
+                "headers": self._response_headers(end - start + 1,
+                                                  content_range=f"bytes {start}-{end}/{file_size}"),
+            })
+            if send_body:
+                await self._send_ranges(send, extensions, ranges)
+            else:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        # 多个范围：multipart/byteranges
+        boundary = secrets.token_hex(16)
+        part_headers = [
+            (f"--{boundary}\r\nContent-Type: {self.media_type}\r\n"
+             f"Content-Range: bytes {start}-{end}/{file_size}\r\n\r\n").encode("latin-1")
+            for start, end in ranges
+        ]
+        closing = f"--{boundary}--\r\n".encode("latin-1")
+        content_length = sum(len(head) + end - start + 1 + 2 for head, (start, end) in zip(part_headers, ranges))
+        content_length += len(closing)
+        await send({
+            "type": "http.response.start",
+            "status": 206,
+            "headers": self._response_headers(content_length, content_type=f"multipart/byteranges; boundary={boundary}"),
+        })
+        if send_body:
+            await self._send_ranges(send, extensions, ranges, part_headers, closing)
+        else:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def _send_ranges(self, send: Send, extensions: dict, ranges: List[Tuple[int, int]],
+                           part_headers: Optional[List[bytes]] = None, closing: bytes = b"") -> None:
+        """依次发送各个范围的内容，多范围时在每段前后加上分段头和分隔符"""
+        zerocopy = ZEROCOPY_EXTENSION in extensions
+        file = await anyio.to_thread.run_sync(open, self.path, "rb")
+        try:
+            for index, (start, end) in enumerate(ranges):
+                if part_headers:
+                    await send({"type": "http.response.body", "body": part_headers[index], "more_body": True})
+                if zerocopy:
+                    await send({"type": ZEROCOPY_EXTENSION, "file": file, "offset": start,
+                                "count": end - start + 1, "more_body": True})
+                else:
+                    offset = start
+                    while offset <= end:
+                        size = min(MEDIA_CHUNK_SIZE, end - offset + 1)
+                        chunk = await anyio.to_thread.run_sync(_read_at, file, offset, size)
+                        if not chunk:
+                            break
+                        offset += len(chunk)
+                        await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                if part_headers:
+                    await send({"type": "http.response.body", "body": b"\r\n", "more_body": True})
+            await send({"type": "http.response.body", "body": closing, "more_body": False})
+        finally:
+            await anyio.to_thread.run_sync(file.close)
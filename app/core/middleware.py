@@ -1,3 +1,4 @@
+import re
 import time
 import json
 import logging
@@ -12,15 +13,34 @@ import traceback
 logger = logging.getLogger(__name__)
 
 
+# 经过本中间件转发的响应只能是普通的响应体消息，不能使用服务器的零拷贝扩展
+ZERO_COPY_EXTENSIONS = ("http.response.pathsend", "http.response.zerocopy")
+
+
 class APILoggingMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app: ASGIApp, exclude_paths: list = None):
+    def __init__(self, app: ASGIApp, exclude_paths: list = None, exclude_patterns: list = None):
         super().__init__(app)
         self.exclude_paths = exclude_paths or []
+        self.exclude_patterns = [re.compile(pattern) for pattern in exclude_patterns or []]
+
+    async def __call__(self, scope, receive, send) -> None:
+        # 排除的路径不经过 BaseHTTPMiddleware 转发，媒体文件可以使用零拷贝扩展直接发送
+        if scope["type"] == "http" and self._is_excluded(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        if scope["type"] == "http" and scope.get("extensions"):
+            scope = dict(scope)
+            scope["extensions"] = {
+                name: value for name, value in scope["extensions"].items() if name not in ZERO_COPY_EXTENSIONS
+            }
+        await super().__call__(scope, receive, send)
+
+    def _is_excluded(self, path: str) -> bool:
+        return any(path.startswith(prefix) for prefix in self.exclude_paths) or any(
+            pattern.match(path) for pattern in self.exclude_patterns
+        )
 
     async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        # 检查是否需要排除此路径
-        if any(request.url.path.startswith(path) for path in self.exclude_paths):
-            return await call_next(request)
 
         # 记录请求开始时间
         start_time = time.time()
@@ -76,25 +96,31 @@ class APILoggingMiddleware(BaseHTTPMiddleware):
             response = await call_next(request)
             status_code = response.status_code
             
-            # 尝试读取响应体
-            response_body_bytes = b""
-            async for chunk in response.body_iterator:
-                response_body_bytes += chunk
-            
-            # 重建响应
-            response = Response(
-                content=response_body_bytes,
-                status_code=response.status_code,
-                headers=dict(response.headers),
-                media_type=response.media_type
-            )
-            
-            # 尝试解析响应体
-            try:
-                response_body = response_body_bytes.decode("utf-8")
-            except UnicodeDecodeError:
+            # 文件等二进制响应直接流式返回，不读入内存
+            content_type = response.headers.get("content-type", "")
+            if content_type and not content_type.startswith(("application/json", "text/")):
                 has_binary_data = True
                 response_body = "二进制数据，未记录"
+            else:
+                # 尝试读取响应体
+                response_body_bytes = b""
+                async for chunk in response.body_iterator:
+                    response_body_bytes += chunk
+            
+                # 重建响应
+                response = Response(
+                    content=response_body_bytes,
+                    status_code=response.status_code,
+                    headers=dict(response.headers),
+                    media_type=response.media_type
+                )
+            
+                # 尝试解析响应体
+                try:
+                    response_body = response_body_bytes.decode("utf-8")
+                except UnicodeDecodeError:
+                    has_binary_data = True
+                    response_body = "二进制数据，未记录"
         except Exception as e:
             logger.error(f"处理请求时出错: {str(e)}")
             traceback.print_exc()
@@ -2,7 +2,7 @@ from typing import Dict, Callable, Any, List
 import logging
 # from app.scripts.douyin import tasks as douyin_tasks
 # from app.scripts.douyin.task import test_aa
-from app.scripts.douyin.task import collect_creator_videos, test_task, test_task_async, collect_creator_info
+from app.scripts.douyin.task import collect_creator_videos, collect_all_creator_videos, test_task, test_task_async, collect_creator_info, prune_content_store, recount_creator_counters_task
 import inspect
 
 logger = logging.getLogger(__name__)
@@ -12,9 +12,12 @@ task_functions: Dict[str, Callable[[], Any]] = {
     # 抖音相关任务
     # "test_aa": test_aa,
     "collect_creator_videos": collect_creator_videos,
+    "collect_all_creator_videos": collect_all_creator_videos,
     'test_task': test_task,
     'test_task_async': test_task_async,
-    'collect_creator_info': collect_creator_info
+    'collect_creator_info': collect_creator_info,
+    'prune_content_store': prune_content_store,
+    'recount_creator_counters': recount_creator_counters_task
 }
 
 def get_task_function(function_name: str) -> Callable[[], Any] | None:
@@ -1,8 +1,17 @@
+import json
+import uuid
+from collections import Counter
+import base64
+import binascii
 from typing import List, Optional, Union, Dict
+from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, or_, insert, select, func, asc, desc, false
+from sqlalchemy.dialects import mysql, sqlite, postgresql
 
-from app.models.douyin import DouyinContentFile, DouyinContent
+from app.models.douyin import (
+    DouyinCreator, DouyinContentFile, DouyinContent, DouyinShareLink, DouyinContentMetric, DouyinCrawlCheckpoint
+)
 from app.schemas.douyin import (
     DouyinContentFileCreate, DouyinContentFileUpdate, 
     DouyinContentCreate, DouyinContentUpdate
@@ -36,6 +45,7 @@ def create_content_file(db: Session, content_file: DouyinContentFileCreate) -> D
         dynamic_cover_path=content_file.dynamic_cover_path,
         file_size=content_file.file_size,
         file_hash=content_file.file_hash,
+        file_mtime=content_file.file_mtime,
         download_status=content_file.download_status,
         error_message=content_file.error_message
     )
@@ -65,6 +75,24 @@ def get_content_file_by_aweme_id_and_type(
     
     return query.first()
 
+def get_content_files_by_aweme_ids(
+    db: Session,
+    aweme_ids: List[str],
+    file_types: Optional[List[str]] = None
+) -> Dict[str, List[DouyinContentFile]]:
+    """一次查询多个作品的内容文件，按作品ID分组，每组按文件序号排序"""
+    if not aweme_ids:
+        return {}
+    query = db.query(DouyinContentFile).filter(DouyinContentFile.aweme_id.in_(aweme_ids))
+    if file_types:
+        query = query.filter(DouyinContentFile.file_type.in_(file_types))
+
+    files_by_aweme: Dict[str, List[DouyinContentFile]] = {}
+    for content_file in query.order_by(DouyinContentFile.aweme_id, DouyinContentFile.file_index,
+                                       DouyinContentFile.id):
+        files_by_aweme.setdefault(content_file.aweme_id, []).append(content_file)
+    return files_by_aweme
+
 def get_content_files(
     db: Session,
     skip: int = 0,
@@ -107,13 +135,18 @@ def delete_content_file(db: Session, content_file_id: int) -> bool:
     if not db_content_file:
         return False
     
+    if db_content_file.download_status == "completed":
+        count_downloaded_files(db, [db_content_file], sign=-1)
     db.delete(db_content_file)
     db.commit()
     return True
 
 def get_pending_content_files(db: Session, limit: int = 10, file_type: Optional[str] = None) -> List[DouyinContentFile]:
-    """获取待下载的内容文件列表"""
-    query = db.query(DouyinContentFile).filter(DouyinContentFile.download_status == "pending")
+    """获取待下载的内容文件列表（不含尚未到重试时间的文件）"""
+    query = db.query(DouyinContentFile).filter(
+        DouyinContentFile.download_status == "pending",
+        or_(DouyinContentFile.next_retry_at.is_(None), DouyinContentFile.next_retry_at <= datetime.now())
+    )
     
     if file_type:
         query = query.filter(DouyinContentFile.file_type == file_type)
@@ -131,6 +164,9 @@ def update_content_file_download_status(
     if not db_content_file:
         return None
     
+    # 进入或离开已完成状态时同步创作者的已下载计数
+    if (db_content_file.download_status == "completed") != (status == "completed"):
+        count_downloaded_files(db, [db_content_file], sign=1 if status == "completed" else -1)
     db_content_file.download_status = status
     if error_message:
         db_content_file.error_message = error_message
@@ -139,20 +175,156 @@ def update_content_file_download_status(
     db.refresh(db_content_file)
     return db_content_file
 
+# 下载队列相关操作
+def enqueue_content_files(db: Session, rows: List[Dict]) -> int:
+    """将待下载的文件加入下载队列（不提交，与作品数据在同一事务中提交）
+
+    rows 为 douyin_content_files 的字段字典（各行字段一致），已有记录的文件跳过。
+    Returns:
+        新加入队列的文件数
+    """
+    if not rows:
+        return 0
+    existing_keys = set(
+        db.query(DouyinContentFile.aweme_id, DouyinContentFile.file_type, DouyinContentFile.file_index).filter(
+            DouyinContentFile.aweme_id.in_({row["aweme_id"] for row in rows})
+        ).all()
+    )
+    new_rows = []
+    for row in rows:
+        key = (row["aweme_id"], row["file_type"], row["file_index"])
+        if key not in existing_keys:
+            existing_keys.add(key)
+            new_rows.append(row)
+    if new_rows:
+        db.execute(insert(DouyinContentFile), new_rows)
+    return len(new_rows)
+
+def claim_content_files(db: Session, limit: int, priority: Optional[int] = None) -> List[DouyinContentFile]:
+    """领取一批待下载的文件
+
+    先查出候选ID，再用带 download_status='pending' 条件的 UPDATE 领取，同一文件只会被一个批次领取成功；
+    多个进程/线程并发领取时各自只拿到自己 claim_token 标记的记录。
+    priority 指定时只领取该下载通道的文件，否则优先领取封面等优先通道的文件。
+    """
+    now = datetime.now()
+    query = db.query(DouyinContentFile.id).filter(
+        DouyinContentFile.download_status == "pending",
+        or_(DouyinContentFile.next_retry_at.is_(None), DouyinContentFile.next_retry_at <= now)
+    )
+    if priority is not None:
+        query = query.filter(DouyinContentFile.priority == priority)
+    candidate_ids = [
+        file_id for (file_id,) in query.order_by(DouyinContentFile.priority, DouyinContentFile.id).limit(limit).all()
+    ]
+    if not candidate_ids:
+        return []
+    
+    claim_token = uuid.uuid4().hex
+    db.query(DouyinContentFile).filter(
+        DouyinContentFile.id.in_(candidate_ids),
+        DouyinContentFile.download_status == "pending"
+    ).update({
+        DouyinContentFile.download_status: "downloading",
+        DouyinContentFile.claim_token: claim_token,
+        DouyinContentFile.claimed_at: now,
+    }, synchronize_session=False)
+    db.commit()
+    return db.query(DouyinContentFile).filter(DouyinContentFile.claim_token == claim_token).all()
+
+def claim_content_file(db: Session, content_file_id: int) -> Optional[DouyinContentFile]:
+    """领取单个延迟下载的文件，不是延迟下载（在队列中、下载中、已完成或已失败）时返回 None
+
+    队列中的文件由后台下载线程按通道下载，不在请求中抢先下载。
+    """
+    claim_token = uuid.uuid4().hex
+    claimed = db.query(DouyinContentFile).filter(
+        DouyinContentFile.id == content_file_id,
+        DouyinContentFile.download_status == "deferred"
+    ).update({
+        DouyinContentFile.download_status: "downloading",
+        DouyinContentFile.claim_token: claim_token,
+        DouyinContentFile.claimed_at: datetime.now(),
+    }, synchronize_session=False)
+    db.commit()
+    if not claimed:
+        return None
+    return db.query(DouyinContentFile).filter(DouyinContentFile.claim_token == claim_token).first()
+
+def refresh_claims(db: Session, claim_tokens: List[str]) -> int:
+    """刷新仍在下载中的文件的领取时间，避免下载时间超过租约后被放回队列，返回刷新的文件数"""
+    if not claim_tokens:
+        return 0
+    refreshed = db.query(DouyinContentFile).filter(
+        DouyinContentFile.claim_token.in_(claim_tokens),
+        DouyinContentFile.download_status == "downloading"
+    ).update({DouyinContentFile.claimed_at: datetime.now()}, synchronize_session=False)
+    db.commit()
+    return refreshed
+
+def release_stale_claims(db: Session, claimed_before: Optional[datetime] = None) -> int:
+    """把下载中断（进程退出或超时）的文件放回队列，claimed_before 为空时放回全部
+
+    Returns:
+        放回队列的文件数
+    """
+    query = db.query(DouyinContentFile).filter(DouyinContentFile.download_status == "downloading")
+    if claimed_before is not None:
+        query = query.filter(or_(DouyinContentFile.claimed_at.is_(None), DouyinContentFile.claimed_at < claimed_before))
+    count = query.update({
+        DouyinContentFile.download_status: "pending",
+        DouyinContentFile.claim_token: None,
+        DouyinContentFile.claimed_at: None,
+    }, synchronize_session=False)
+    db.commit()
+    return count
+
+def get_download_queue_stats(db: Session) -> Dict[str, int]:
+    """按下载状态统计队列中的文件数"""
+    rows = db.query(DouyinContentFile.download_status, func.count(DouyinContentFile.id)).group_by(
+        DouyinContentFile.download_status
+    ).all()
+    return {status or "unknown": count for status, count in rows}
+
+def get_file_fingerprints(db: Session, aweme_ids: List[str]) -> Dict[str, tuple]:
+    """批量获取已记录文件的指纹，返回 {file_path: (file_size, file_mtime, file_hash)}"""
+    if not aweme_ids:
+        return {}
+    rows = db.query(
+        DouyinContentFile.file_path, DouyinContentFile.file_size,
+        DouyinContentFile.file_mtime, DouyinContentFile.file_hash
+    ).filter(
+        DouyinContentFile.aweme_id.in_(set(aweme_ids)),
+        DouyinContentFile.file_path.isnot(None),
+        DouyinContentFile.file_mtime.isnot(None)
+    ).all()
+    return {file_path: (file_size, file_mtime, file_hash) for file_path, file_size, file_mtime, file_hash in rows}
+
 def create_content_files_bulk(db: Session, content_files: List[DouyinContentFileCreate]) -> Dict[str, List[DouyinContentFile]]:
-    """批量创建内容文件记录"""
+    """批量创建内容文件记录
+
+    已存在的记录用一次 IN 查询找出，新记录一次性写入。
+    """
     created_files = []
     skipped_files = []
     
+    existing_files = {}
+    aweme_ids = {content_file.aweme_id for content_file in content_files}
+    if aweme_ids:
+        for existing_file in db.query(DouyinContentFile).filter(DouyinContentFile.aweme_id.in_(aweme_ids)).all():
+            key = (existing_file.aweme_id, existing_file.file_type, existing_file.file_index)
+            existing_files[key] = existing_file
+    
     for content_file in content_files:
-        # 检查是否已存在相同的记录
-        existing_file = db.query(DouyinContentFile).filter(
-            DouyinContentFile.aweme_id == content_file.aweme_id,
-            DouyinContentFile.file_type == content_file.file_type,
-            DouyinContentFile.file_index == content_file.file_index
-        ).first()
-        
+        # 检查是否已存在相同的记录（包括本批次中重复的记录）
+        key = (content_file.aweme_id, content_file.file_type, content_file.file_index)
+        existing_file = existing_files.get(key)
         if existing_file:
+            # 刷新已有记录的文件指纹，下次可直接通过大小和修改时间确认文件未变化
+            if content_file.file_mtime is not None and existing_file.file_path == content_file.file_path:
+                existing_file.file_size = content_file.file_size
+                existing_file.file_hash = content_file.file_hash
+                existing_file.file_mtime = content_file.file_mtime
             skipped_files.append(existing_file)
             continue
         
@@ -168,16 +340,18 @@ def create_content_files_bulk(db: Session, content_files: List[DouyinContentFile
             dynamic_cover_path=content_file.dynamic_cover_path,
             file_size=content_file.file_size,
             file_hash=content_file.file_hash,
+            file_mtime=content_file.file_mtime,
             download_status=content_file.download_status,
             error_message=content_file.error_message
         )
-        db.add(db_content_file)
+        existing_files[key] = db_content_file
         created_files.append(db_content_file)
     
     if created_files:
+        db.add_all(created_files)
+        count_downloaded_files(db, [f for f in created_files if f.download_status == "completed"])
+    if created_files or db.dirty:
         db.commit()
-        for file in created_files:
-            db.refresh(file)
     
     return {
         "created": created_files,
@@ -198,6 +372,7 @@ def create_content(db: Session, content: DouyinContentCreate) -> Optional[Douyin
     # 如果不存在则创建新记录
     db_content = DouyinContent(**content.model_dump())
     db.add(db_content)
+    count_created_contents(db, db_content.creator_id, [{"content_type": db_content.content_type}])
     db.commit()
     db.refresh(db_content)
     return db_content
@@ -223,6 +398,11 @@ def create_contents_bulk(db: Session, contents: List[DouyinContentCreate]) -> Di
         created_contents.append(db_content)
     
     if created_contents:
+        by_creator: Dict[int, List[Dict]] = {}
+        for db_content in created_contents:
+            by_creator.setdefault(db_content.creator_id, []).append({"content_type": db_content.content_type})
+        for creator_id, rows in by_creator.items():
+            count_created_contents(db, creator_id, rows)
         db.commit()
         for content in created_contents:
             db.refresh(content)
@@ -232,6 +412,132 @@ def create_contents_bulk(db: Session, contents: List[DouyinContentCreate]) -> Di
         "skipped": skipped_contents
     }
 
+# 采集时需要刷新的统计字段
+CONTENT_STAT_COLUMNS = ("admire_count", "comment_count", "digg_count", "collect_count", "share_count", "play_count")
+
+def get_content_ids_by_aweme_ids(db: Session, aweme_ids: List[str]) -> Dict[str, int]:
+    """批量查询已存在的内容，返回 {aweme_id: id}"""
+    if not aweme_ids:
+        return {}
+    rows = db.query(DouyinContent.aweme_id, DouyinContent.id).filter(
+        DouyinContent.aweme_id.in_(set(aweme_ids))
+    ).all()
+    return {aweme_id: content_id for aweme_id, content_id in rows}
+
+def get_content_stats_by_aweme_ids(db: Session, aweme_ids: List[str]) -> Dict[str, tuple]:
+    """批量查询已存在内容的ID和当前统计值，返回 {aweme_id: (id, {统计字段: 值})}"""
+    if not aweme_ids:
+        return {}
+    columns = [getattr(DouyinContent, column) for column in CONTENT_STAT_COLUMNS]
+    rows = db.query(DouyinContent.aweme_id, DouyinContent.id, *columns).filter(
+        DouyinContent.aweme_id.in_(set(aweme_ids))
+    ).all()
+    return {
+        row[0]: (row[1], dict(zip(CONTENT_STAT_COLUMNS, row[2:])))
+        for row in rows
+    }
+
+def build_content_stats_upsert(dialect: str, rows: List[Dict]):
+    """生成批量写入统计数据的 upsert 语句，数据库不支持时返回 None"""
+    if dialect == "mysql":
+        stmt = mysql.insert(DouyinContent).values(rows)
+        set_ = {column: stmt.inserted[column] for column in CONTENT_STAT_COLUMNS}
+        set_["updated_at"] = func.now()
+        return stmt.on_duplicate_key_update(set_)
+    if dialect in ("sqlite", "postgresql"):
+        dialect_insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        stmt = dialect_insert(DouyinContent).values(rows)
+        set_ = {column: stmt.excluded[column] for column in CONTENT_STAT_COLUMNS}
+        set_["updated_at"] = func.now()
+        return stmt.on_conflict_do_update(index_elements=["aweme_id"], set_=set_)
+    return None
+
+def upsert_content_stats(db: Session, rows: List[Dict]) -> None:
+    """批量写入内容统计数据
+
+    一条 INSERT ... ON DUPLICATE KEY UPDATE (MySQL) / ON CONFLICT DO UPDATE (SQLite/PostgreSQL)，
+    按 aweme_id 冲突时只更新统计字段。rows 为完整的内容字段字典，且各行字段一致。
+    """
+    if not rows:
+        return
+    
+    stmt = build_content_stats_upsert(db.get_bind().dialect.name, rows)
+    if stmt is None:
+        # 其他数据库退回逐行更新
+        for row in rows:
+            db.query(DouyinContent).filter(DouyinContent.aweme_id == row["aweme_id"]).update(
+                {column: row[column] for column in CONTENT_STAT_COLUMNS}
+            )
+        return
+    
+    db.execute(stmt)
+
+# 单条多行 INSERT 的最大行数（SQLite 绑定参数数量有上限）
+BULK_INSERT_CHUNK = 200
+
+def bulk_insert_contents(db: Session, rows: List[Dict]) -> Dict[str, int]:
+    """批量插入新内容，返回 {aweme_id: id}
+
+    支持 RETURNING 的数据库一条语句完成，否则（MySQL）插入后再用一条 IN 查询取回ID。
+    """
+    if not rows:
+        return {}
+    
+    if db.get_bind().dialect.insert_returning:
+        # 多行 VALUES 显式写成一条语句，避免 executemany 按参数形态拆成多条
+        ids = {}
+        for i in range(0, len(rows), BULK_INSERT_CHUNK):
+            result = db.execute(
+                insert(DouyinContent)
+                .values(rows[i:i + BULK_INSERT_CHUNK])
+                .returning(DouyinContent.aweme_id, DouyinContent.id)
+            )
+            ids.update({aweme_id: content_id for aweme_id, content_id in result.all()})
+        return ids
+    
+    db.execute(insert(DouyinContent), rows)
+    return get_content_ids_by_aweme_ids(db, [row["aweme_id"] for row in rows])
+
+# 互动数据时间序列
+def bulk_insert_content_metrics(db: Session, rows: List[Dict]) -> None:
+    """批量追加互动数据快照，rows 含 content_id、ts 和各统计字段"""
+    if rows:
+        db.execute(insert(DouyinContentMetric), rows)
+
+def get_content_metrics_rollup(
+    db: Session,
+    content_id: int,
+    bucket_seconds: int = 86400,
+    start_ts: Optional[int] = None,
+    end_ts: Optional[int] = None
+) -> List[Dict]:
+    """按时间桶汇总内容的互动数据，每个桶取最大值，并计算相对上一个桶的增量
+
+    Returns:
+        List[Dict]: 按时间升序的 [{"ts": 桶起始时间戳, 统计字段..., "<字段>_delta": 增量}]
+    """
+    bucket = (DouyinContentMetric.ts - DouyinContentMetric.ts % bucket_seconds).label("bucket")
+    query = db.query(
+        bucket,
+        *[func.max(getattr(DouyinContentMetric, column)).label(column) for column in CONTENT_STAT_COLUMNS]
+    ).filter(DouyinContentMetric.content_id == content_id)
+    if start_ts is not None:
+        query = query.filter(DouyinContentMetric.ts >= start_ts)
+    if end_ts is not None:
+        query = query.filter(DouyinContentMetric.ts < end_ts)
+    
+    points = []
+    previous = None
+    for row in query.group_by(bucket).order_by(bucket).all():
+        point = {"ts": row.bucket}
+        for column in CONTENT_STAT_COLUMNS:
+            value = getattr(row, column) or 0
+            point[column] = value
+            point[f"{column}_delta"] = value - previous[column] if previous else 0
+        points.append(point)
+        previous = point
+    return points
+
 def get_content(db: Session, content_id: int) -> Optional[DouyinContent]:
     """根据ID获取内容记录"""
     return db.query(DouyinContent).filter(DouyinContent.id == content_id).first()
@@ -274,6 +580,85 @@ def get_contents_count(
     
     return query.count()
 
+# 作品列表可用的排序字段；列表按 (是否置顶, 排序字段, id) 做键集分页，翻到多深每页的查询代价都一样
+CONTENT_SORT_FIELDS = (
+    "aweme_id", "create_time", "created_at", "digg_count", "collect_count", "share_count", "play_count",
+    "comment_count", "admire_count"
+)
+# 记录创建时间与自增 id 的顺序一致，按 id 排序和翻页
+CONTENT_SORT_ALIASES = {"created_at": "id"}
+
+def encode_contents_cursor(content: DouyinContent, sort_by: str, sort_desc: bool) -> str:
+    """把一页最后一条作品的排序键编码为不透明的游标"""
+    value = getattr(content, CONTENT_SORT_ALIASES.get(sort_by, sort_by))
+    payload = {"s": sort_by, "d": sort_desc, "k": [content.is_top, value, content.id]}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+def decode_contents_cursor(cursor: str, sort_by: str, sort_desc: bool) -> tuple:
+    """解析游标，返回 (is_top, 排序字段的值, id)；游标无效或与当前排序方式不一致时抛出 ValueError"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        is_top, value, content_id = payload["k"]
+        if payload["s"] != sort_by or payload["d"] != sort_desc or not isinstance(content_id, int):
+            raise ValueError
+    except (ValueError, TypeError, KeyError, binascii.Error):
+        raise ValueError("无效的分页游标")
+    return is_top, value, content_id
+
+def _after(column, value, descending: bool):
+    """排在 value 之后的条件；NULL 按 MySQL/SQLite 的规则视为最小值（升序在前、降序在后）"""
+    if descending:
+        return false() if value is None else or_(column < value, column.is_(None))
+    return column.is_not(None) if value is None else column > value
+
+def _equal(column, value):
+    return column.is_(None) if value is None else column == value
+
+def get_contents_page(
+    db: Session,
+    creator_id: int,
+    content_type: Optional[str] = None,
+    sort_by: str = "create_time",
+    sort_desc: bool = True,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    skip: int = 0
+) -> tuple:
+    """按 (是否置顶 降序, 排序字段, id) 分页获取创作者的作品
+
+    传入 cursor 时从游标之后开始（键集分页，忽略 skip）；不传时兼容按 skip 偏移的旧用法。
+
+    Returns:
+        (作品列表, 下一页的游标)，没有下一页时游标为 None
+    """
+    if sort_by not in CONTENT_SORT_FIELDS:
+        raise ValueError(f"不支持的排序字段: {sort_by}")
+    sort_field = getattr(DouyinContent, CONTENT_SORT_ALIASES.get(sort_by, sort_by))
+    query = db.query(DouyinContent).filter(DouyinContent.creator_id == creator_id)
+    if content_type:
+        query = query.filter(DouyinContent.content_type == content_type)
+
+    order = desc if sort_desc else asc
+    query = query.order_by(desc(DouyinContent.is_top), order(sort_field), order(DouyinContent.id))
+    if cursor:
+        is_top, value, content_id = decode_contents_cursor(cursor, sort_by, sort_desc)
+        query = query.filter(or_(
+            _after(DouyinContent.is_top, is_top, True),
+            and_(_equal(DouyinContent.is_top, is_top), or_(
+                _after(sort_field, value, sort_desc),
+                and_(_equal(sort_field, value), _after(DouyinContent.id, content_id, sort_desc))
+            ))
+        ))
+    elif skip:
+        query = query.offset(skip)
+    contents = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(contents) > limit:
+        contents = contents[:limit]
+        next_cursor = encode_contents_cursor(contents[-1], sort_by, sort_desc)
+    return contents, next_cursor
+
 def update_content(
     db: Session,
     content_id: int,
@@ -298,10 +683,98 @@ def delete_content(db: Session, content_id: int) -> bool:
     if not db_content:
         return False
     
+    # 内容文件随内容一起删除，从创作者的计数中减去
+    count_created_contents(db, db_content.creator_id, [{"content_type": db_content.content_type}], sign=-1)
+    count_downloaded_files(db, [f for f in db_content.files if f.download_status == "completed"], sign=-1)
     db.delete(db_content)
     db.commit()
     return True
 
+# 创作者计数相关操作
+# 作品类型对应的创作者计数字段
+CONTENT_TYPE_COUNTERS = {"video": "video_count", "image": "image_count"}
+
+def increment_creator_counters(db: Session, creator_id: int, **deltas: int) -> None:
+    """在当前事务中增量更新创作者的计数（不提交）
+
+    用 UPDATE col = col + n 在数据库中累加，采集和下载线程并发更新同一创作者时不会互相覆盖。
+    """
+    values = {
+        getattr(DouyinCreator, name): func.coalesce(getattr(DouyinCreator, name), 0) + delta
+        for name, delta in deltas.items() if delta
+    }
+    if values:
+        db.query(DouyinCreator).filter(DouyinCreator.id == creator_id).update(values, synchronize_session=False)
+
+def count_created_contents(db: Session, creator_id: int, rows: List[Dict], sign: int = 1) -> None:
+    """把新增（sign=-1 时为删除）的作品按类型计入创作者，不提交"""
+    counts = Counter(row["content_type"] for row in rows)
+    increment_creator_counters(db, creator_id, **{
+        CONTENT_TYPE_COUNTERS[content_type]: sign * count
+        for content_type, count in counts.items() if content_type in CONTENT_TYPE_COUNTERS
+    })
+
+def count_downloaded_files(db: Session, files: List[DouyinContentFile], sign: int = 1) -> None:
+    """把下载完成（sign=-1 时为删除）的文件数和字节数计入所属创作者，不提交"""
+    by_content: Dict[int, List[int]] = {}
+    for content_file in files:
+        totals = by_content.setdefault(content_file.content_id, [0, 0])
+        totals[0] += 1
+        totals[1] += content_file.file_size or 0
+    if not by_content:
+        return
+    
+    by_creator: Dict[int, List[int]] = {}
+    rows = db.query(DouyinContent.id, DouyinContent.creator_id).filter(DouyinContent.id.in_(by_content)).all()
+    for content_id, creator_id in rows:
+        totals = by_creator.setdefault(creator_id, [0, 0])
+        totals[0] += by_content[content_id][0]
+        totals[1] += by_content[content_id][1]
+    for creator_id, (file_count, file_bytes) in by_creator.items():
+        increment_creator_counters(db, creator_id, downloaded_file_count=sign * file_count,
+                                   downloaded_bytes=sign * file_bytes)
+
+def recount_creator_counters(db: Session, creator_ids: Optional[List[int]] = None) -> int:
+    """按作品表和文件表重新统计创作者的计数，用于修复手工改库等造成的偏差，返回更新的创作者数"""
+    content_counts = db.query(
+        DouyinContent.creator_id, DouyinContent.content_type, func.count(DouyinContent.id)
+    ).group_by(DouyinContent.creator_id, DouyinContent.content_type)
+    file_counts = db.query(
+        DouyinContent.creator_id, func.count(DouyinContentFile.id), func.coalesce(func.sum(DouyinContentFile.file_size), 0)
+    ).join(DouyinContentFile, DouyinContentFile.content_id == DouyinContent.id).filter(
+        DouyinContentFile.download_status == "completed"
+    ).group_by(DouyinContent.creator_id)
+    creators = db.query(DouyinCreator)
+    if creator_ids is not None:
+        content_counts = content_counts.filter(DouyinContent.creator_id.in_(creator_ids))
+        file_counts = file_counts.filter(DouyinContent.creator_id.in_(creator_ids))
+        creators = creators.filter(DouyinCreator.id.in_(creator_ids))
+    
+    counters: Dict[int, Dict[str, int]] = {}
+    for creator_id, content_type, count in content_counts:
+        if content_type in CONTENT_TYPE_COUNTERS:
+            counters.setdefault(creator_id, {})[CONTENT_TYPE_COUNTERS[content_type]] = count
+    for creator_id, file_count, file_bytes in file_counts:
+        counters.setdefault(creator_id, {}).update(downloaded_file_count=file_count, downloaded_bytes=int(file_bytes))
+    
+    updated = 0
+    for creator in creators:
+        values = counters.get(creator.id, {})
+        creator.video_count = values.get("video_count", 0)
+        creator.image_count = values.get("image_count", 0)
+        creator.downloaded_file_count = values.get("downloaded_file_count", 0)
+        creator.downloaded_bytes = values.get("downloaded_bytes", 0)
+        updated += 1
+    db.commit()
+    return updated
+
+def get_creator_content_total(creator: DouyinCreator, content_type: Optional[str] = None) -> int:
+    """从创作者的计数读取作品总数，不查询作品表"""
+    if content_type is None:
+        return (creator.video_count or 0) + (creator.image_count or 0)
+    counter = CONTENT_TYPE_COUNTERS.get(content_type)
+    return (getattr(creator, counter) or 0) if counter else 0
+
 # 为了向后兼容，提供一些辅助函数
 def get_video_by_aweme_id(db: Session, aweme_id: str) -> Optional[DouyinContent]:
     """根据视频ID获取视频记录"""
@@ -371,6 +844,66 @@ def get_image_file_by_index(
     """根据图集ID和图片索引获取图片文件记录"""
     return get_content_file_by_aweme_id_and_type(db, aweme_id, "image", image_index)
 
+# 分享短链缓存相关操作
+def get_share_link(db: Session, short_url: str) -> Optional[DouyinShareLink]:
+    """获取未过期的分享短链解析结果"""
+    return db.query(DouyinShareLink).filter(
+        DouyinShareLink.short_url == short_url,
+        DouyinShareLink.expires_at > datetime.now()
+    ).first()
+
+def save_share_link(
+    db: Session,
+    short_url: str,
+    resolved_url: str,
+    sec_user_id: Optional[str] = None,
+    aweme_id: Optional[str] = None,
+    ttl_seconds: int = 30 * 24 * 3600
+) -> DouyinShareLink:
+    """保存分享短链解析结果，已存在则刷新"""
+    link = db.query(DouyinShareLink).filter(DouyinShareLink.short_url == short_url).first()
+    if not link:
+        link = DouyinShareLink(short_url=short_url)
+        db.add(link)
+    
+    link.resolved_url = resolved_url
+    link.sec_user_id = sec_user_id
+    link.aweme_id = aweme_id
+    link.expires_at = datetime.now() + timedelta(seconds=ttl_seconds)
+    
+    db.commit()
+    db.refresh(link)
+    return link
+
+# 采集断点相关操作
+def get_crawl_checkpoint(db: Session, creator_id: int) -> Optional[DouyinCrawlCheckpoint]:
+    """获取创作者未完成的采集断点"""
+    return db.query(DouyinCrawlCheckpoint).filter(DouyinCrawlCheckpoint.creator_id == creator_id).first()
+
+def save_crawl_checkpoint(
+    db: Session,
+    creator_id: int,
+    max_cursor: int,
+    pages_done: int,
+    last_aweme_id: str,
+    max_aweme_id: Optional[str] = None
+) -> DouyinCrawlCheckpoint:
+    """保存采集断点（不提交，与当前页数据在同一事务中提交）"""
+    checkpoint = get_crawl_checkpoint(db, creator_id)
+    if not checkpoint:
+        checkpoint = DouyinCrawlCheckpoint(creator_id=creator_id)
+        db.add(checkpoint)
+    
+    checkpoint.max_cursor = max_cursor
+    checkpoint.pages_done = pages_done
+    checkpoint.last_aweme_id = last_aweme_id
+    checkpoint.max_aweme_id = max_aweme_id
+    return checkpoint
+
+def delete_crawl_checkpoint(db: Session, creator_id: int) -> None:
+    """采集完成后删除断点（不提交）"""
+    db.query(DouyinCrawlCheckpoint).filter(DouyinCrawlCheckpoint.creator_id == creator_id).delete()
+
 if __name__ == "__main__":
     
     # from app.db.session import get_db_context, base_db
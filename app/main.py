@@ -9,7 +9,11 @@ from app.db.base import Base
 from app.core.scheduler import init_scheduler, shutdown_scheduler
 from app.core.middleware import APILoggingMiddleware
 from app.core.logging_config import setup_logging
+from app.scripts.douyin.tiktok_api import close_async_http_session
+from app.scripts.douyin.download_engine import shutdown_download_engine
+from app.scripts.douyin.download_queue import start_download_workers, stop_download_workers
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 import os
 import sys
@@ -27,6 +31,8 @@ async def lifespan(app: FastAPI):
             Base.metadata.create_all(base_db.engine)
             # 初始化任务调度器
             init_scheduler()
+            # 启动抖音下载队列线程池
+            start_download_workers()
             logger.info("应用启动成功：数据库和调度器已初始化")
         else:
             logger.error("应用启动失败：数据库初始化失败")
@@ -42,6 +48,12 @@ async def lifespan(app: FastAPI):
         # 停止数据库连接池监控定时器
         stop_pool_monitoring()
         
+        # 停止下载队列（正在下载的批次最多等待30秒，未完成的文件下次启动时放回队列），
+        # 再关闭抖音接口的共享HTTP会话和下载引擎
+        await asyncio.to_thread(stop_download_workers, 30)
+        await close_async_http_session()
+        await asyncio.to_thread(shutdown_download_engine)
+        
         # 关闭数据库连接
         if base_db.session_local:
             base_db.session_local().close()
@@ -56,7 +68,9 @@ app = FastAPI(title="Data Collection API", lifespan=lifespan)
 # 添加API日志中间件
 app.add_middleware(
     APILoggingMiddleware,
-    exclude_paths=["/docs", "/redoc", "/openapi.json", "/v1/logs"]  # 排除不需要记录的路径
+    exclude_paths=["/docs", "/redoc", "/openapi.json", "/v1/logs"],  # 排除不需要记录的路径
+    # 抖音媒体文件接口（视频拖动进度时会产生大量范围请求）
+    exclude_patterns=[r"^/v1/douyin/(videos/[^/]+/(play|cover)|files/\d+|image-posts/[^/]+/images/\d+)$"]
 )
 
 # 配置CORS
@@ -79,14 +93,15 @@ async def http_exception_handler(request: Request, exc: HTTPException):
             content=exc.detail
         )
     
-    # 处理其他HTTP异常
+    # 处理其他HTTP异常，保留 Retry-After 等响应头
     return JSONResponse(
         status_code=exc.status_code,
         content=ApiResponse(
             code=exc.status_code,
             message=str(exc.detail),
             data=None
-        ).model_dump()
+        ).model_dump(),
+        headers=exc.headers
     )
 
 @app.exception_handler(Exception)
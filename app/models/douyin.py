@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, BigInteger, Float, Boolean, ForeignKey, JSON, UniqueConstraint
+from sqlalchemy import Column, Integer, String, DateTime, Text, BigInteger, Float, Boolean, ForeignKey, JSON, UniqueConstraint, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db.base_class import Base
@@ -23,6 +23,11 @@ class DouyinCreator(Base):
     download_video = Column(Integer, default=1, comment="是否下载视频")
     download_cover = Column(Integer, default=1, comment="是否下载视频封面")
     last_aweme_id = Column(String(50), nullable=True, default="0", comment="最后一条视频ID")
+    # 由采集和下载随各自的事务增量维护的计数，列表和统计不再对作品表 COUNT(*)
+    video_count = Column(Integer, default=0, comment="已采集的视频数")
+    image_count = Column(Integer, default=0, comment="已采集的图集数")
+    downloaded_file_count = Column(Integer, default=0, comment="已下载完成的文件数")
+    downloaded_bytes = Column(BigInteger, default=0, comment="已下载文件的总字节数")
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(
         DateTime(timezone=True), 
@@ -79,6 +84,14 @@ class DouyinContent(Base):
     # 关联信息
     creator = relationship("DouyinCreator", back_populates="contents")
     files = relationship("DouyinContentFile", back_populates="content", cascade="all, delete-orphan")
+    
+    # 作品列表按 (是否置顶, 排序字段, id) 做键集分页，索引对应各接口的默认排序：
+    # 按类型列出时按发布时间或 aweme_id 排序，不区分类型时按发布时间排序
+    __table_args__ = (
+        Index('ix_douyin_contents_creator_list', 'creator_id', 'content_type', 'is_top', 'create_time'),
+        Index('ix_douyin_contents_creator_type_aweme', 'creator_id', 'content_type', 'is_top', 'aweme_id'),
+        Index('ix_douyin_contents_creator_all', 'creator_id', 'is_top', 'create_time'),
+    )
 
 class DouyinContentFile(Base):
     """抖音内容文件信息表（包含视频文件和图片文件）"""
@@ -103,11 +116,20 @@ class DouyinContentFile(Base):
     # 文件信息
     file_size = Column(BigInteger, nullable=True, comment="文件大小(字节)")
     file_hash = Column(String(100), nullable=True, comment="文件哈希值")
+    file_mtime = Column(BigInteger, nullable=True, comment="文件修改时间(纳秒)，与大小一起判断文件是否变化")
     
     # 下载状态
     download_status = Column(String(20), default="pending", comment="下载状态: pending/downloading/completed/failed")
     error_message = Column(Text, nullable=True, comment="错误信息")
     
+    # 下载队列
+    source_urls = Column(JSON, nullable=True, comment="下载地址列表，按顺序回退")
+    priority = Column(Integer, default=1, comment="下载通道: 0=封面和图集首图优先下载, 1=视频等大文件")
+    retry_count = Column(Integer, default=0, comment="已失败的下载次数")
+    next_retry_at = Column(DateTime(timezone=True), nullable=True, comment="下次允许重试的时间")
+    claim_token = Column(String(32), nullable=True, comment="领取该文件的下载批次标识")
+    claimed_at = Column(DateTime(timezone=True), nullable=True, comment="被下载进程领取的时间")
+    
     created_at = Column(DateTime(timezone=True), server_default=func.now(), comment="记录创建时间")
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), comment="记录更新时间")
     
@@ -117,4 +139,50 @@ class DouyinContentFile(Base):
     # 添加联合唯一约束，确保每个内容的每个文件类型和索引只有一条记录
     __table_args__ = (
         UniqueConstraint('aweme_id', 'file_type', 'file_index', name='uix_aweme_id_file_type_index'),
-    ) 
\ No newline at end of file
+        Index('ix_douyin_content_files_queue', 'download_status', 'priority', 'next_retry_at'),
+    ) 
+
+class DouyinShareLink(Base):
+    """抖音分享短链解析缓存"""
+    __tablename__ = "douyin_share_links"
+
+    id = Column(Integer, primary_key=True, index=True)
+    short_url = Column(String(255), unique=True, index=True, nullable=False, comment="分享短链")
+    resolved_url = Column(Text, nullable=True, comment="重定向后的地址")
+    sec_user_id = Column(String(100), nullable=True, comment="解析出的创作者sec_user_id")
+    aweme_id = Column(String(50), nullable=True, comment="解析出的作品ID")
+    expires_at = Column(DateTime(timezone=True), nullable=False, comment="缓存过期时间")
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), comment="记录创建时间")
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now(), comment="记录更新时间")
+
+
+class DouyinCrawlCheckpoint(Base):
+    """抖音创作者作品采集断点，每页保存一次，进程重启后从断点继续"""
+    __tablename__ = "douyin_crawl_checkpoints"
+
+    id = Column(Integer, primary_key=True, index=True)
+    creator_id = Column(Integer, ForeignKey("douyin_creators.id", ondelete="CASCADE"), unique=True, nullable=False, comment="创作者ID")
+    max_cursor = Column(BigInteger, default=0, comment="下一页的分页游标")
+    pages_done = Column(Integer, default=0, comment="已保存的页数")
+    last_aweme_id = Column(String(50), nullable=True, comment="本轮采集开始时的last_aweme_id（停止位置）")
+    max_aweme_id = Column(String(50), nullable=True, comment="本轮已采集的最大非置顶作品ID")
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), comment="记录创建时间")
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now(), comment="记录更新时间")
+
+class DouyinContentMetric(Base):
+    """抖音内容互动数据快照表（只追加），用于增长趋势分析"""
+    __tablename__ = "douyin_content_metrics"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    content_id = Column(Integer, ForeignKey("douyin_contents.id", ondelete="CASCADE"), nullable=False, comment="内容ID")
+    ts = Column(BigInteger, nullable=False, comment="采集时间戳(秒)")
+    admire_count = Column(Integer, default=0, comment="赞赏数")
+    comment_count = Column(Integer, default=0, comment="评论数")
+    digg_count = Column(Integer, default=0, comment="点赞数")
+    collect_count = Column(Integer, default=0, comment="收藏数")
+    play_count = Column(Integer, default=0, comment="播放数")
+    share_count = Column(Integer, default=0, comment="分享数")
+
+    __table_args__ = (
+        Index("ix_douyin_content_metrics_content_ts", "content_id", "ts"),
+    )
@@ -11,7 +11,8 @@ class ApiResponse(BaseModel, Generic[T]):
 
 class PaginationResponse(BaseModel, Generic[T]):
     items: List[T]
-    total: int
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
 
 class DouyinCookieSchema(BaseModel):
     cookie: str
@@ -65,6 +66,10 @@ class DouyinCreatorUpdate(BaseModel):
 
 class DouyinCreatorResponse(DouyinCreatorBase):
     id: int
+    video_count: Optional[int] = 0
+    image_count: Optional[int] = 0
+    downloaded_file_count: Optional[int] = 0
+    downloaded_bytes: Optional[int] = 0
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
@@ -82,6 +87,7 @@ class DouyinContentFileBase(BaseModel):
     dynamic_cover_path: Optional[str] = None
     file_size: Optional[int] = None
     file_hash: Optional[str] = None
+    file_mtime: Optional[int] = None
     download_status: str = "pending"
     error_message: Optional[str] = None
 
@@ -104,6 +110,7 @@ class DouyinContentFileUpdate(BaseModel):
     dynamic_cover_path: Optional[str] = None
     file_size: Optional[int] = None
     file_hash: Optional[str] = None
+    file_mtime: Optional[int] = None
     download_status: Optional[str] = None
     error_message: Optional[str] = None
 
@@ -232,4 +239,21 @@ class DouyinFollowingListResponse(BaseModel):
     max_time: int
     min_time: int
     next_req_count: int
-    owner_sec_uid: str
\ No newline at end of file
+    owner_sec_uid: str
+
+# 内容互动数据趋势模型
+class DouyinContentMetricPoint(BaseModel):
+    """按时间桶汇总的互动数据，*_delta 为相对上一个桶的增量"""
+    ts: int
+    admire_count: int = 0
+    comment_count: int = 0
+    digg_count: int = 0
+    collect_count: int = 0
+    share_count: int = 0
+    play_count: int = 0
+    admire_count_delta: int = 0
+    comment_count_delta: int = 0
+    digg_count_delta: int = 0
+    collect_count_delta: int = 0
+    share_count_delta: int = 0
+    play_count_delta: int = 0
@@ -15,6 +15,9 @@ Changes Made:
 1. Changed the ua_code to compatible with the current config file User-Agent string in https://github.com/Evil0ctal/Douyin_TikTok_Download_API/blob/main/crawlers/douyin/web/config.yaml
 """
 
+import hashlib
+from base64 import b64encode
+from functools import lru_cache
 from random import choice
 from random import randint
 from random import random
@@ -24,6 +27,10 @@ from urllib.parse import urlencode
 from urllib.parse import quote
 from gmssl import sm3, func
 
+# OpenSSL 自带 SM3 时直接使用 hashlib（C 实现），否则回退到 gmssl 的纯 Python 实现
+_HAS_OPENSSL_SM3 = "sm3" in hashlib.algorithms_available
+_B64_ALPHABET = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+
 __all__ = ["ABogus", ]
 
 
@@ -44,6 +51,7 @@ class ABogus:
         3817729613,
         2969243214,
     ]
+    __keystreams = {}
     __str = {
         "s0": "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/=",
         "s1": "Dkdpgh4ZKsQB80/Mfvw36XI1R25+WUAlEi7NLboqYTOPuzmFjJnryx9HVGcaStCe=",
@@ -514,13 +522,19 @@ class ABogus:
         return [int(i) & 255 for i in a]
 
     def generate_method_code(self, method: str = "GET") -> list[int]:
-        return self.sm3_to_array(self.sm3_to_array(method + self.__end_string))
+        return list(self._method_digest(method))
         # return self.sum(self.sum(method + self.__end_string))
 
     def generate_params_code(self, params: str) -> list[int]:
-        return self.sm3_to_array(self.sm3_to_array(params + self.__end_string))
+        return list(self.double_sm3(params))
         # return self.sum(self.sum(params + self.__end_string))
 
+    @classmethod
+    @lru_cache(maxsize=8)
+    def _method_digest(cls, method: str) -> bytes:
+        # 请求方法只有寥寥几种，摘要结果可以直接缓存
+        return cls.double_sm3(method)
+
     @classmethod
     def sm3_to_array(cls, data: str | list) -> list[int]:
         """
@@ -541,11 +555,20 @@ class ABogus:
         else:
             b = bytes(data)  # 将 List[int] 转换为字节数组
 
+        return list(cls.sm3_digest(b))
+
+    @staticmethod
+    def sm3_digest(data: bytes) -> bytes:
+        """计算 SM3 摘要，优先使用 OpenSSL 实现"""
+        if _HAS_OPENSSL_SM3:
+            return hashlib.new("sm3", data).digest()
         # 将字节数组转换为适合 sm3.sm3_hash 函数处理的列表格式
-        h = sm3.sm3_hash(func.bytes_to_list(b))
+        return bytes.fromhex(sm3.sm3_hash(func.bytes_to_list(data)))
 
-        # 将十六进制字符串结果转换为十进制整数列表
-        return [int(h[i: i + 2], 16) for i in range(0, len(h), 2)]
+    @classmethod
+    def double_sm3(cls, data: str) -> bytes:
+        """计算 sm3(sm3(data + end_string))"""
+        return cls.sm3_digest(cls.sm3_digest((data + cls.__end_string).encode("utf-8")))
 
     @classmethod
     def generate_browser_info(cls, platform: str = "Win32") -> str:
@@ -577,26 +600,69 @@ class ABogus:
         return "|".join(str(i) for i in value_list)
 
     @staticmethod
-    def rc4_encrypt(plaintext, key):
+    @lru_cache(maxsize=8)
+    def _rc4_state(key: str) -> tuple:
+        """RC4 密钥调度，结果按 key 缓存"""
         s = list(range(256))
         j = 0
-
         for i in range(256):
             j = (j + s[i] + ord(key[i % len(key)])) % 256
             s[i], s[j] = s[j], s[i]
+        return tuple(s)
 
-        i = 0
-        j = 0
-        cipher = []
+    @classmethod
+    def rc4_keystream(cls, key: str, length: int) -> bytes:
+        """获取 RC4 密钥流
 
-        for k in range(len(plaintext)):
-            i = (i + 1) % 256
-            j = (j + s[i]) % 256
+        RC4 的密钥流只取决于 key，签名时 key 固定，因此生成一次后按需截取即可。
+        """
+        cached = cls.__keystreams.get(key)
+        if cached is not None and len(cached) >= length:
+            return cached[:length]
+
+        s = list(cls._rc4_state(key))
+        i = j = 0
+        stream = bytearray(max(length, 256))
+        for k in range(len(stream)):
+            i = (i + 1) & 255
+            j = (j + s[i]) & 255
             s[i], s[j] = s[j], s[i]
-            t = (s[i] + s[j]) % 256
-            cipher.append(chr(s[t] ^ ord(plaintext[k])))
+            stream[k] = s[(s[i] + s[j]) & 255]
+        cached = bytes(stream)
+        cls.__keystreams[key] = cached
+        return cached[:length]
 
-        return ''.join(cipher)
+    @classmethod
+    def rc4_encrypt(cls, plaintext, key):
+        return "".join(map(chr, cls.rc4_encrypt_codes(
+            [ord(c) for c in plaintext], key)))
+
+    @classmethod
+    def rc4_encrypt_codes(cls, codes: list, key: str) -> list:
+        """对字符码列表做 RC4 加密（字符码可能超过 255，高位原样保留）"""
+        stream = cls.rc4_keystream(key, len(codes))
+        return [k ^ c for k, c in zip(stream, codes)]
+
+    @classmethod
+    def encode_codes(cls, codes: list, e="s4") -> str:
+        """按自定义字母表对字符码列表做 base64 编码
+
+        与 generate_result 结果一致：字符码超过 255 时，多出的高位会并入
+        同一组三字节中前一个字节的最低位，这里先做同样的折叠再交给 b64encode。
+        """
+        data = bytearray(len(codes))
+        for i in range(0, len(codes), 3):
+            group = codes[i:i + 3]
+            for k, code in enumerate(group):
+                if k + 1 < len(group):
+                    code |= group[k + 1] >> 8
+                data[i + k] = code & 255
+        return b64encode(bytes(data)).translate(cls._b64_table(e)).decode()
+
+    @classmethod
+    @lru_cache(maxsize=8)
+    def _b64_table(cls, e: str) -> bytes:
+        return bytes.maketrans(_B64_ALPHABET, cls.__str[e][:64].encode())
 
     def get_value(self,
                   url_params: dict | str,
@@ -607,17 +673,14 @@ class ABogus:
                   random_num_2=None,
                   random_num_3=None,
                   ) -> str:
-        string_1 = self.generate_string_1(
-            random_num_1,
-            random_num_2,
-            random_num_3,
-        )
-        string_2 = self.generate_string_2(urlencode(url_params) if isinstance(
+        codes = self.list_1(random_num_1) + self.list_2(random_num_2) + self.list_3(random_num_3)
+        a = self.generate_string_2_list(urlencode(url_params) if isinstance(
             url_params, dict) else url_params, method, start_time, end_time, )
-        string = string_1 + string_2
-        # return self.generate_result(
-        #     string, "s4") + self.generate_result_end(string, "s4")
-        return self.generate_result(string, "s4")
+        e = self.end_check_num(a)
+        a.extend(self.browser_code)
+        a.append(e)
+        codes.extend(self.rc4_encrypt_codes(a, "y"))
+        return self.encode_codes(codes, "s4")
 
 
 if __name__ == "__main__":
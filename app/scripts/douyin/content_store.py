@@ -0,0 +1,117 @@
+"""
+抖音资源的内容寻址存储（可选）
+
+同一张封面/图片经常被多个作品和转发复用，按 sec_user_id/aweme_id 保存会存多份相同的字节。
+开启后下载完成的文件按哈希保存到 <根目录>/ab/cd/<哈希>，原来的路径改为指向它的硬链接，
+相同内容只写一次；同时记录 ETag 到哈希的索引，下载时响应的 ETag 已存储过就不再传输响应体。
+"""
+import os
+import hashlib
+import shutil
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# 是否开启内容寻址存储，以及存储目录（默认为下载目录下的 .cas，需要与下载目录在同一文件系统才能使用硬链接）
+CONTENT_STORE_ENABLED = os.getenv("DOUYIN_CONTENT_STORE", "0").lower() in ("1", "true", "yes")
+CONTENT_STORE_PATH = os.getenv("DOUYIN_CONTENT_STORE_PATH", "")
+
+
+class ContentStore:
+    """按文件哈希分目录保存的内容存储，下载路径通过硬链接指向其中的文件"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.etag_root = os.path.join(root, "etags")
+
+    def blob_path(self, file_hash: str) -> str:
+        """哈希对应的存储路径，带算法前缀的哈希用十六进制部分分目录"""
+        digest = file_hash.split(":")[-1]
+        return os.path.join(self.root, digest[:2], digest[2:4], file_hash.replace(":", "_"))
+
+    def _etag_path(self, etag: str, size: int) -> str:
+        key = hashlib.sha1(f"{etag}:{size}".encode()).hexdigest()
+        return os.path.join(self.etag_root, key[:2], key)
+
+    def lookup_etag(self, etag: str, size: int) -> Optional[str]:
+        """查找 ETag 和大小相同的已存储文件，返回其哈希"""
+        try:
+            with open(self._etag_path(etag, size), "r", encoding="utf-8") as f:
+                file_hash = f.read().strip()
+        except OSError:
+            return None
+        return file_hash if file_hash and os.path.exists(self.blob_path(file_hash)) else None
+
+    def remember_etag(self, etag: str, size: int, file_hash: str) -> None:
+        """记录 ETag 对应的文件哈希"""
+        path = self._etag_path(etag, size)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(file_hash)
+        os.replace(tmp_path, path)
+
+    def link(self, file_hash: str, file_path: str) -> bool:
+        """把已存储的文件硬链接到 file_path，不支持硬链接时复制，文件不存在（或刚被清理）时返回 False"""
+        blob_path = self.blob_path(file_hash)
+        if not os.path.exists(blob_path):
+            return False
+        tmp_path = f"{file_path}.link"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        try:
+            os.link(blob_path, tmp_path)
+        except FileNotFoundError:
+            return False
+        except OSError:
+            try:
+                shutil.copyfile(blob_path, tmp_path)
+            except FileNotFoundError:
+                return False
+        os.replace(tmp_path, file_path)
+        return True
+
+    def commit(self, part_path: str, file_path: str, file_hash: str) -> None:
+        """把下载完成的临时文件放入存储并链接到 file_path，已有相同内容时丢弃临时文件
+
+        临时文件先硬链接进存储，链接到 file_path 之后才删除，存储中的文件在此期间硬链接数始终大于 1，
+        不会被并发的 prune 删除；已有的文件在链接前被删除时，用临时文件重新放入存储。
+        """
+        blob_path = self.blob_path(file_hash)
+        try:
+            if not self.link(file_hash, file_path):
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                try:
+                    os.link(part_path, blob_path)
+                except FileExistsError:
+                    # 其他下载刚放入了相同内容
+                    pass
+                if not self.link(file_hash, file_path):
+                    raise FileNotFoundError(f"存储中的文件已被清理 {blob_path}")
+            os.remove(part_path)
+        except OSError as e:
+            # 存储目录不可用时退回普通保存
+            logger.warning(f"写入内容存储失败，直接保存文件 {file_path}: {str(e)}")
+            if os.path.exists(part_path):
+                os.replace(part_path, file_path)
+
+    def prune(self) -> int:
+        """删除已没有任何下载路径引用（硬链接数为 1）的文件，返回删除的文件数"""
+        removed = 0
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            if dirpath == self.root:
+                dirnames[:] = [name for name in dirnames if name != "etags"]
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                if os.stat(path).st_nlink == 1:
+                    os.remove(path)
+                    removed += 1
+        return removed
+
+
+def get_content_store(base_path: str) -> Optional[ContentStore]:
+    """未开启内容寻址存储时返回 None"""
+    if not CONTENT_STORE_ENABLED:
+        return None
+    return ContentStore(CONTENT_STORE_PATH or os.path.join(base_path, ".cas"))
@@ -0,0 +1,379 @@
+"""
+进程级抖音资源下载引擎
+
+所有 DownloadManager 共用一个在后台线程中运行的事件循环和一个带连接池的 aiohttp 会话：
+全局限制同时进行的下载数，连接池按主机限制连接数，多个采集任务并发时公平共享带宽并复用 CDN 连接。
+同步代码通过 DownloadEngine.fetch_to_file 提交请求并等待结果。
+写文件等阻塞的磁盘操作在单独的 I/O 线程池中执行，磁盘慢时不会卡住事件循环中的其他下载和对冲计时。
+
+请求分为两个通道：封面、图集首图等小文件走优先通道，有独立的并发数，不会排在视频后面；
+视频等大文件走批量通道，可以用令牌桶限制其带宽，回填历史作品时列表页的封面几秒内就能显示。
+
+有多个镜像地址时使用对冲请求：先请求历史延迟最低的主机，在 DOUYIN_DOWNLOAD_HEDGE_DELAY 秒内没有收到响应头
+就再请求下一个镜像（最多 DOUYIN_DOWNLOAD_HEDGE_FANOUT 个），使用最先正常响应的一个并取消其余请求，
+每个 CDN 主机的响应延迟按指数加权平均记录下来，供之后排序镜像地址。
+"""
+import asyncio
+import os
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# 下载通道：优先通道（封面、图集首图）和批量通道（视频等大文件）
+LANE_PRIORITY = 0
+LANE_BULK = 1
+LANE_NAMES = {LANE_PRIORITY: "priority", LANE_BULK: "bulk"}
+# 批量通道和优先通道各自同时进行的下载数、连接池总连接数和单个主机的连接数
+ENGINE_CONCURRENCY = int(os.getenv("DOUYIN_DOWNLOAD_CONCURRENCY", "8"))
+ENGINE_PRIORITY_CONCURRENCY = int(os.getenv("DOUYIN_DOWNLOAD_PRIORITY_CONCURRENCY", "4"))
+ENGINE_MAX_CONNECTIONS = int(os.getenv("DOUYIN_DOWNLOAD_MAX_CONNECTIONS", "32"))
+ENGINE_PER_HOST_CONNECTIONS = int(os.getenv("DOUYIN_DOWNLOAD_PER_HOST_CONNECTIONS", "4"))
+# 连接超时和两次读取之间的最长间隔（秒）
+ENGINE_CONNECT_TIMEOUT = 10
+ENGINE_READ_TIMEOUT = 30
+# 批量通道的带宽上限（字节/秒），0 表示不限制
+ENGINE_BULK_BANDWIDTH = int(os.getenv("DOUYIN_DOWNLOAD_BULK_BANDWIDTH", "0"))
+# 对冲请求同时请求的镜像数（1 表示不对冲），以及请求下一个镜像前等待响应头的时间（秒）
+ENGINE_HEDGE_FANOUT = int(os.getenv("DOUYIN_DOWNLOAD_HEDGE_FANOUT", "2"))
+ENGINE_HEDGE_DELAY = float(os.getenv("DOUYIN_DOWNLOAD_HEDGE_DELAY", "0.2"))
+# 主机响应延迟的指数加权平均系数，以及请求失败时额外记入的延迟（秒）
+HOST_LATENCY_ALPHA = 0.3
+HOST_FAILURE_PENALTY = 5.0
+# 写入文件时每次读取的分块大小
+ENGINE_CHUNK_SIZE = 256 * 1024
+# 计算实时速率的时间窗口（秒）
+THROUGHPUT_WINDOW = 10
+
+
+class _TokenBucket:
+    """按字节计的令牌桶，最多积攒1秒的令牌（只在引擎的事件循环中使用，不需要加锁）"""
+
+    def __init__(self, rate: int):
+        self.rate = rate
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+
+    async def consume(self, size: int):
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # 令牌不足时先记账再等待，并发的请求依次排在后面，总速率不超过上限
+        self.tokens -= size
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+
+class DownloadEngine:
+    """在独立事件循环线程中执行下载请求的共享引擎"""
+
+    def __init__(self,
+                 concurrency: int = ENGINE_CONCURRENCY,
+                 max_connections: int = ENGINE_MAX_CONNECTIONS,
+                 per_host_connections: int = ENGINE_PER_HOST_CONNECTIONS,
+                 priority_concurrency: int = ENGINE_PRIORITY_CONCURRENCY,
+                 bulk_bandwidth: int = ENGINE_BULK_BANDWIDTH,
+                 hedge_fanout: int = ENGINE_HEDGE_FANOUT,
+                 hedge_delay: float = ENGINE_HEDGE_DELAY):
+        self.concurrency = concurrency
+        self.max_connections = max_connections
+        self.per_host_connections = per_host_connections
+        self.priority_concurrency = priority_concurrency
+        self.bulk_bandwidth = bulk_bandwidth
+        self.hedge_fanout = max(hedge_fanout, 1)
+        self.hedge_delay = hedge_delay
+        self._loop = asyncio.new_event_loop()
+        # 每个进行中的下载最多同时占用一个 I/O 线程
+        self._io_executor = ThreadPoolExecutor(max_workers=concurrency + priority_concurrency,
+                                               thread_name_prefix="douyin-download-io")
+        self._thread = threading.Thread(target=self._run_loop, name="douyin-download-engine", daemon=True)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphores: Dict[int, asyncio.Semaphore] = {}
+        self._bulk_bucket: Optional[_TokenBucket] = None
+        self._lock = threading.Lock()
+        self._active_hosts: Dict[str, int] = {}
+        self._active_lanes: Dict[int, int] = {lane: 0 for lane in LANE_NAMES}
+        self._host_latency: Dict[str, float] = {}
+        self._recent = deque()
+        self.active = 0
+        self.queued = 0
+        self.completed = 0
+        self.failed = 0
+        self.bytes_downloaded = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._init(), self._loop).result()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    async def _init(self):
+        connector = aiohttp.TCPConnector(
+            limit=self.max_connections, limit_per_host=self.per_host_connections, ttl_dns_cache=300
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=None, connect=ENGINE_CONNECT_TIMEOUT, sock_read=ENGINE_READ_TIMEOUT),
+        )
+        self._semaphores = {
+            LANE_PRIORITY: asyncio.Semaphore(self.priority_concurrency),
+            LANE_BULK: asyncio.Semaphore(self.concurrency),
+        }
+        if self.bulk_bandwidth > 0:
+            self._bulk_bucket = _TokenBucket(self.bulk_bandwidth)
+
+    def _count_bytes(self, size: int):
+        now = time.monotonic()
+        with self._lock:
+            self.bytes_downloaded += size
+            self._recent.append((now, size))
+            while self._recent and now - self._recent[0][0] > THROUGHPUT_WINDOW:
+                self._recent.popleft()
+
+    def _track_host(self, host: str, lane: int, delta: int):
+        with self._lock:
+            self.active += delta
+            self._active_lanes[lane] += delta
+            count = self._active_hosts.get(host, 0) + delta
+            if count:
+                self._active_hosts[host] = count
+            else:
+                self._active_hosts.pop(host, None)
+
+    def _record_latency(self, host: str, seconds: float):
+        with self._lock:
+            previous = self._host_latency.get(host)
+            self._host_latency[host] = seconds if previous is None else previous + HOST_LATENCY_ALPHA * (seconds - previous)
+
+    def rank_urls(self, urls: Sequence[str]) -> List[str]:
+        """按主机的平均响应延迟从低到高排序镜像地址，没有记录的主机排在前面以便测量，其余保持原顺序"""
+        with self._lock:
+            latency = dict(self._host_latency)
+        return sorted(urls, key=lambda url: latency.get(urlsplit(url).netloc, 0.0))
+
+    async def _open(self, url: str, headers: dict) -> aiohttp.ClientResponse:
+        """发送请求并等待响应头，记录主机的响应延迟"""
+        host = urlsplit(url).netloc
+        started = time.monotonic()
+        try:
+            response = await self._session.get(url, headers=headers)
+        except asyncio.CancelledError:
+            # 被更快的镜像取消，延迟至少为已等待的时间
+            self._record_latency(host, time.monotonic() - started)
+            raise
+        except Exception:
+            self._record_latency(host, time.monotonic() - started + HOST_FAILURE_PENALTY)
+            raise
+        self._record_latency(host, time.monotonic() - started)
+        return response
+
+    @staticmethod
+    def _headers_for(url: str, headers: dict, range_host: Optional[str]) -> dict:
+        """续传的 Range/If-Range 只发给产生已下载部分的主机，其他镜像的校验值不一定相同，改为请求完整文件"""
+        if "Range" not in headers or urlsplit(url).netloc == range_host:
+            return headers
+        return {name: value for name, value in headers.items() if name not in ("Range", "If-Range")}
+
+    async def _open_fastest(self, urls: Sequence[str], headers: dict,
+                            range_host: Optional[str] = None) -> Tuple[str, aiohttp.ClientResponse]:
+        """对冲请求多个镜像，返回最先正常响应（状态码小于400）的地址和响应，其余请求取消
+
+        所有镜像都没有正常响应时返回第一个错误响应，都请求失败时抛出最后一个异常。
+        """
+        candidates = list(urls[:self.hedge_fanout])
+        pending: Dict[asyncio.Task, str] = {}
+        winner = fallback = None
+        error: Optional[BaseException] = None
+        try:
+            while winner is None and (candidates or pending):
+                if candidates:
+                    if pending:
+                        with self._lock:
+                            self.hedged += 1
+                    url = candidates.pop(0)
+                    pending[asyncio.ensure_future(self._open(url, self._headers_for(url, headers, range_host)))] = url
+                done, _ = await asyncio.wait(
+                    pending, timeout=self.hedge_delay if candidates else None, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    url = pending.pop(task)
+                    try:
+                        response = task.result()
+                    except Exception as e:
+                        error = e
+                        continue
+                    if winner is None and response.status < 400:
+                        winner = (url, response)
+                    elif fallback is None:
+                        fallback = (url, response)
+                    else:
+                        response.release()
+        finally:
+            # 取消未完成的请求并等待其结束，释放已经返回的响应，同时取走异常，避免连接泄漏和未读取异常的警告
+            for task in pending:
+                task.cancel()
+            for result in await asyncio.gather(*pending, return_exceptions=True):
+                if isinstance(result, aiohttp.ClientResponse):
+                    result.release()
+        if winner is not None:
+            if fallback is not None:
+                fallback[1].release()
+            if winner[0] != urls[0]:
+                with self._lock:
+                    self.hedge_wins += 1
+            return winner
+        if fallback is not None:
+            return fallback
+        raise error
+
+    async def _run_io(self, func: Callable, *args):
+        """在 I/O 线程池中执行阻塞的文件操作"""
+        return await self._loop.run_in_executor(self._io_executor, func, *args)
+
+    @staticmethod
+    def _write_chunk(f, chunk: bytes, hasher) -> None:
+        f.write(chunk)
+        if hasher is not None:
+            hasher.update(chunk)
+
+    async def _fetch_to_file(self, urls: Sequence[str], headers: dict, file_path: str,
+                             on_response: Callable[[int, dict, str], Optional[str]], lane: int,
+                             range_host: Optional[str] = None, hasher=None) -> int:
+        bucket = self._bulk_bucket if lane == LANE_BULK else None
+        with self._lock:
+            self.queued += 1
+        async with self._semaphores[lane]:
+            with self._lock:
+                self.queued -= 1
+            try:
+                url, response = await self._open_fastest(urls, headers, range_host)
+            except BaseException:
+                with self._lock:
+                    self.failed += 1
+                raise
+            host = urlsplit(url).netloc
+            self._track_host(host, lane, 1)
+            try:
+                async with response:
+                    mode = await self._run_io(on_response, response.status, response.headers, url)
+                    if mode:
+                        f = await self._run_io(open, file_path, mode)
+                        try:
+                            async for chunk in response.content.iter_chunked(ENGINE_CHUNK_SIZE):
+                                await self._run_io(self._write_chunk, f, chunk, hasher)
+                                self._count_bytes(len(chunk))
+                                if bucket is not None:
+                                    await bucket.consume(len(chunk))
+                        finally:
+                            await self._run_io(f.close)
+                    with self._lock:
+                        self.completed += 1
+                    return response.status
+            except BaseException:
+                with self._lock:
+                    self.failed += 1
+                raise
+            finally:
+                self._track_host(host, lane, -1)
+
+    def fetch_to_file(self, url: str, headers: dict, file_path: str,
+                      on_response: Callable[[int, dict, str], Optional[str]], lane: int = LANE_BULK,
+                      mirrors: Sequence[str] = (), range_host: Optional[str] = None, hasher=None) -> int:
+        """发送 GET 请求并把响应体写入文件，阻塞直到完成
+
+        Args:
+            on_response: 收到响应头后在引擎的 I/O 线程中调用，参数为 (状态码, 响应头, 响应的地址)，
+                返回文件打开模式 "wb"/"ab" 表示写入响应体，返回 None 表示丢弃响应体；
+                对冲请求时只对最终使用的响应调用
+            lane: 下载通道 LANE_PRIORITY/LANE_BULK
+            mirrors: 内容相同的镜像地址，url 响应慢时对冲请求
+            range_host: 续传时已下载部分来自的主机，headers 中的 Range/If-Range 只发给该主机的地址
+            hasher: hashlib 哈希对象，写入文件的每一块同时计入哈希（续传时由 on_response 先计入已有部分）
+        Returns:
+            响应状态码；连接中断等异常原样抛出，已写入的部分保留在文件中
+        """
+        future = asyncio.run_coroutine_threadsafe(
+            self._fetch_to_file([url, *mirrors], headers, file_path, on_response, lane, range_host, hasher),
+            self._loop
+        )
+        return future.result()
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            recent = sum(size for ts, size in self._recent if now - ts <= THROUGHPUT_WINDOW)
+            return {
+                "concurrency": self.concurrency,
+                "priority_concurrency": self.priority_concurrency,
+                "bulk_bandwidth": self.bulk_bandwidth,
+                "max_connections": self.max_connections,
+                "per_host_connections": self.per_host_connections,
+                "active": self.active,
+                "active_by_lane": {LANE_NAMES[lane]: count for lane, count in self._active_lanes.items()},
+                "queued": self.queued,
+                "completed": self.completed,
+                "failed": self.failed,
+                "bytes_downloaded": self.bytes_downloaded,
+                "throughput_bytes_per_second": round(recent / THROUGHPUT_WINDOW),
+                "active_by_host": dict(self._active_hosts),
+                "hedge_fanout": self.hedge_fanout,
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+                "host_latency_ms": {host: round(latency * 1000) for host, latency in self._host_latency.items()},
+            }
+
+    def close(self):
+        """关闭连接池并停止事件循环"""
+        if self._loop.is_closed():
+            return
+        asyncio.run_coroutine_threadsafe(self._session.close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._io_executor.shutdown(wait=True)
+
+
+_engine: Optional[DownloadEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_download_engine() -> DownloadEngine:
+    """获取进程内共享的下载引擎"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = DownloadEngine()
+        return _engine
+
+
+def get_download_engine_stats() -> dict:
+    """获取下载引擎状态，引擎尚未启动时返回空状态"""
+    with _engine_lock:
+        engine = _engine
+    if engine is None:
+        return {"concurrency": ENGINE_CONCURRENCY, "priority_concurrency": ENGINE_PRIORITY_CONCURRENCY,
+                "bulk_bandwidth": ENGINE_BULK_BANDWIDTH, "max_connections": ENGINE_MAX_CONNECTIONS,
+                "per_host_connections": ENGINE_PER_HOST_CONNECTIONS, "active": 0,
+                "active_by_lane": {name: 0 for name in LANE_NAMES.values()}, "queued": 0,
+                "completed": 0, "failed": 0, "bytes_downloaded": 0,
+                "throughput_bytes_per_second": 0, "active_by_host": {}, "hedge_fanout": ENGINE_HEDGE_FANOUT,
+                "hedged": 0, "hedge_wins": 0, "host_latency_ms": {}}
+    return engine.stats()
+
+
+def shutdown_download_engine():
+    """应用退出时关闭下载引擎"""
+    global _engine
+    with _engine_lock:
+        engine, _engine = _engine, None
+    if engine is not None:
+        engine.close()
@@ -0,0 +1,69 @@
+"""
+抖音资源下载策略
+
+决定新作品的哪些文件立即进入下载队列、哪些延迟到首次请求时再下载：
+- 创作者关闭 download_video 时视频延迟下载，关闭 download_cover 时封面全部延迟下载；
+- 视频的多种封面只立即下载按 DOUYIN_COVER_PREFERENCE 排序后第一个可用的，其余延迟下载。
+延迟下载的文件以 download_status=deferred 记录在 douyin_content_files 中，下载队列不会领取。
+"""
+import os
+from typing import Dict, List, Optional
+
+from app.models.douyin import DouyinContentFile
+
+# 视频封面的类型，以及默认的使用顺序（与作品列表展示封面的顺序一致）
+COVER_VARIANTS = ("dynamic_cover", "origin_cover", "cover")
+COVER_PREFERENCE = tuple(
+    variant.strip() for variant in os.getenv("DOUYIN_COVER_PREFERENCE", ",".join(COVER_VARIANTS)).split(",")
+    if variant.strip() in COVER_VARIANTS
+) or COVER_VARIANTS
+# 延迟到首次请求时才下载的文件状态
+DEFERRED_STATUS = "deferred"
+
+
+def _cover_rank(file_type: str) -> int:
+    return COVER_PREFERENCE.index(file_type) if file_type in COVER_PREFERENCE else len(COVER_PREFERENCE)
+
+
+def apply_download_policy(rows: List[Dict], download_video: Optional[int] = 1,
+                          download_cover: Optional[int] = 1) -> List[Dict]:
+    """按创作者的下载开关和封面偏好调整待下载记录的状态（原地修改并返回）
+
+    Args:
+        rows: DownloadManager.build_queue_rows 生成的同一作品或多个作品的记录
+        download_video: 创作者是否下载视频
+        download_cover: 创作者是否下载封面
+    """
+    best_covers = {}
+    for row in rows:
+        if row["file_type"] in COVER_VARIANTS:
+            best = best_covers.get(row["aweme_id"])
+            if best is None or _cover_rank(row["file_type"]) < _cover_rank(best["file_type"]):
+                best_covers[row["aweme_id"]] = row
+
+    for row in rows:
+        if row["file_type"] == "video":
+            deferred = not download_video
+        elif row["file_type"] in COVER_VARIANTS:
+            deferred = not download_cover or best_covers[row["aweme_id"]] is not row
+        else:
+            deferred = False
+        if deferred:
+            row["download_status"] = DEFERRED_STATUS
+    return rows
+
+
+def select_cover_file(cover_files: List[DouyinContentFile]) -> Optional[DouyinContentFile]:
+    """按封面偏好选择作品列表展示的封面
+
+    优先返回已下载完成的封面；都没有下载时返回排在最前面、还可以下载的封面（请求时再下载）。
+    是否已下载以数据库中的 download_status 为准，不逐个检查文件，列表页一次可以处理整页作品的封面。
+    """
+    ranked = sorted((f for f in cover_files if f.file_path), key=lambda f: _cover_rank(f.file_type))
+    for cover_file in ranked:
+        if cover_file.download_status == "completed":
+            return cover_file
+    for cover_file in ranked:
+        if cover_file.source_urls and cover_file.download_status != "failed":
+            return cover_file
+    return None
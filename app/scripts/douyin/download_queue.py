@@ -0,0 +1,237 @@
+"""
+抖音资源下载队列
+
+采集任务只把待下载的文件写入 douyin_content_files（download_status=pending），
+由这里的后台线程池按批原子领取、下载、失败后按指数退避重试，采集与下载各自独立扩展，
+进程重启后未完成的文件会重新放回队列，不会丢失。
+
+封面和图集首图由单独的优先通道线程领取和下载，不会排在视频后面，采集完成几秒内列表页就有封面可以显示。
+"""
+import os
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.db.session import get_db_context
+from app.crud.douyin import (
+    claim_content_files, claim_content_file, release_stale_claims, refresh_claims, count_downloaded_files
+)
+from app.models.douyin import DouyinContentFile
+from app.scripts.douyin.downloader import DownloadManager, get_file_executor
+from app.scripts.douyin.download_engine import LANE_PRIORITY, LANE_BULK, LANE_NAMES
+from app.scripts.douyin.download_policy import DEFERRED_STATUS
+
+logger = logging.getLogger(__name__)
+
+# 批量通道和优先通道的下载线程数、每次领取的文件数、队列为空时的轮询间隔（秒）
+QUEUE_WORKERS = int(os.getenv("DOUYIN_DOWNLOAD_QUEUE_WORKERS", "2"))
+QUEUE_PRIORITY_WORKERS = int(os.getenv("DOUYIN_DOWNLOAD_QUEUE_PRIORITY_WORKERS", "1"))
+QUEUE_BATCH_SIZE = int(os.getenv("DOUYIN_DOWNLOAD_QUEUE_BATCH_SIZE", "20"))
+QUEUE_POLL_INTERVAL = float(os.getenv("DOUYIN_DOWNLOAD_QUEUE_POLL_INTERVAL", "5"))
+# 最多失败次数，超过后标记为 failed；重试间隔为 基数 * 2^(失败次数-1)，不超过上限
+QUEUE_MAX_RETRIES = int(os.getenv("DOUYIN_DOWNLOAD_QUEUE_MAX_RETRIES", "5"))
+QUEUE_RETRY_BASE = int(os.getenv("DOUYIN_DOWNLOAD_QUEUE_RETRY_BASE", "60"))
+QUEUE_RETRY_MAX = int(os.getenv("DOUYIN_DOWNLOAD_QUEUE_RETRY_MAX", "3600"))
+# 领取后超过该时间仍未完成的文件视为下载进程已退出，重新放回队列（秒）
+QUEUE_CLAIM_LEASE = int(os.getenv("DOUYIN_DOWNLOAD_QUEUE_CLAIM_LEASE", "1800"))
+# 下载期间刷新领取时间的间隔（秒），大文件下载超过租约时间也不会被其他线程重复领取
+QUEUE_CLAIM_HEARTBEAT = max(QUEUE_CLAIM_LEASE // 3, 1)
+
+
+def retry_delay(retry_count: int) -> int:
+    """第 retry_count 次失败后的重试间隔（秒）"""
+    return min(QUEUE_RETRY_BASE * 2 ** max(retry_count - 1, 0), QUEUE_RETRY_MAX)
+
+
+class _ClaimHeartbeat:
+    """下载期间在后台线程中定期刷新本批文件的 claimed_at，使用独立的会话"""
+
+    def __init__(self, db, files: List[DouyinContentFile], interval: float = QUEUE_CLAIM_HEARTBEAT):
+        self.bind = db.get_bind()
+        self.claim_tokens = list({f.claim_token for f in files if f.claim_token})
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="douyin-download-claim-heartbeat")
+
+    def __enter__(self):
+        if self.claim_tokens:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop_event.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                with Session(bind=self.bind) as db:
+                    refresh_claims(db, self.claim_tokens)
+            except Exception as e:
+                logger.warning(f"刷新下载领取时间失败: {str(e)}")
+
+
+def _fingerprint(content_file: DouyinContentFile) -> Optional[tuple]:
+    """文件记录中的 (大小, 修改时间, 哈希)，不完整时返回 None"""
+    if content_file.file_size is None or content_file.file_mtime is None or not content_file.file_hash:
+        return None
+    return content_file.file_size, content_file.file_mtime, content_file.file_hash
+
+
+def process_batch(db, downloader: DownloadManager, files: List[DouyinContentFile],
+                  executor: Optional[ThreadPoolExecutor] = None, lane: Optional[int] = None,
+                  on_demand: bool = False) -> dict:
+    """并发下载一批已领取的文件并更新状态和创作者计数，一次提交；lane 为空时按各文件记录的下载通道
+
+    on_demand 为 True 时是请求触发的延迟下载：失败的文件保持 deferred 并记录错误，
+    不进入后台队列的重试，创作者关闭下载的文件不会被后台下载。
+    """
+    executor = executor or get_file_executor()
+    futures = [
+        (content_file, executor.submit(
+            downloader.download_with_retries, content_file.source_urls or [], content_file.file_path,
+            lane if lane is not None else LANE_BULK if content_file.priority is None else content_file.priority,
+            _fingerprint(content_file)
+        ))
+        for content_file in files
+    ]
+
+    results = []
+    with _ClaimHeartbeat(db, files):
+        for content_file, future in futures:
+            try:
+                results.append((content_file, future.result()))
+            except Exception as e:
+                logger.error(f"下载文件失败 {content_file.file_path}: {str(e)}")
+                results.append((content_file, None))
+
+    completed_files = []
+    failed = 0
+    now = datetime.now()
+    for content_file, result in results:
+        content_file.claim_token = None
+        content_file.claimed_at = None
+        if result is not None and result.success:
+            content_file.download_status = "completed"
+            content_file.file_size = result.file_size
+            content_file.file_hash = result.file_hash
+            content_file.file_mtime = result.file_mtime
+            content_file.error_message = None
+            content_file.next_retry_at = None
+            completed_files.append(content_file)
+            continue
+
+        content_file.error_message = result.error if result is not None else "下载异常"
+        failed += 1
+        if on_demand:
+            content_file.download_status = DEFERRED_STATUS
+            continue
+        content_file.retry_count = (content_file.retry_count or 0) + 1
+        if content_file.retry_count >= QUEUE_MAX_RETRIES:
+            content_file.download_status = "failed"
+            content_file.next_retry_at = None
+        else:
+            content_file.download_status = "pending"
+            content_file.next_retry_at = now + timedelta(seconds=retry_delay(content_file.retry_count))
+
+    # 下载完成的文件计入创作者的已下载文件数和字节数，与状态一起提交
+    count_downloaded_files(db, completed_files)
+    db.commit()
+    return {"completed": len(completed_files), "failed": failed}
+
+
+class DownloadQueueWorkers:
+    """从数据库下载队列领取并下载文件的后台线程池，优先通道和批量通道的线程各自领取对应的文件"""
+
+    def __init__(self, workers: int = QUEUE_WORKERS, priority_workers: int = QUEUE_PRIORITY_WORKERS,
+                 batch_size: int = QUEUE_BATCH_SIZE):
+        self.lane_workers = {LANE_PRIORITY: priority_workers, LANE_BULK: workers}
+        self.batch_size = batch_size
+        self.downloader = DownloadManager(max_workers=batch_size)
+        # 每个通道使用独立的文件线程池，批量通道的大文件不会占满优先通道的线程
+        self._executors = {
+            lane: ThreadPoolExecutor(max_workers=count * batch_size,
+                                     thread_name_prefix=f"douyin-download-queue-{LANE_NAMES[lane]}-file")
+            for lane, count in self.lane_workers.items() if count > 0
+        }
+        self._stop_event = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        # 启动时把租约已过期的下载中记录放回队列；其他进程仍在刷新领取时间的记录不动，避免重复下载同一文件
+        with get_db_context() as db:
+            released = release_stale_claims(db, datetime.now() - timedelta(seconds=QUEUE_CLAIM_LEASE))
+        if released:
+            logger.info(f"已将 {released} 个中断的下载放回队列")
+
+        for lane, count in self.lane_workers.items():
+            for index in range(count):
+                thread = threading.Thread(target=self._run, args=(lane,), daemon=True,
+                                          name=f"douyin-download-queue-{LANE_NAMES[lane]}-{index}")
+                thread.start()
+                self._threads.append(thread)
+        logger.info(f"下载队列已启动: 批量通道线程数={self.lane_workers[LANE_BULK]}, "
+                    f"优先通道线程数={self.lane_workers[LANE_PRIORITY]}, 每批={self.batch_size}")
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop_event.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads.clear()
+        for executor in self._executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, lane: int):
+        while not self._stop_event.is_set():
+            try:
+                with get_db_context() as db:
+                    release_stale_claims(db, datetime.now() - timedelta(seconds=QUEUE_CLAIM_LEASE))
+                    files = claim_content_files(db, self.batch_size, lane)
+                    if files:
+                        result = process_batch(db, self.downloader, files, self._executors[lane])
+                        logger.info(f"下载队列批次完成({LANE_NAMES[lane]}): "
+                                    f"成功={result['completed']}, 失败={result['failed']}")
+                        continue
+            except Exception as e:
+                logger.error(f"下载队列处理失败: {str(e)}")
+            self._stop_event.wait(QUEUE_POLL_INTERVAL)
+
+
+def fetch_deferred_file(db, content_file: DouyinContentFile) -> bool:
+    """延迟下载的封面/视频在首次请求时立即走优先通道下载
+
+    Returns:
+        文件是否已可用；不是延迟下载的文件（在队列中或已失败）或正被其他请求下载时返回 False
+    """
+    if content_file.file_path and os.path.exists(content_file.file_path):
+        return True
+    claimed = claim_content_file(db, content_file.id)
+    if claimed is None:
+        return False
+    process_batch(db, DownloadManager(max_workers=1), [claimed], lane=LANE_PRIORITY, on_demand=True)
+    return claimed.download_status == "completed"
+
+
+_workers: Optional[DownloadQueueWorkers] = None
+
+
+def start_download_workers() -> Optional[DownloadQueueWorkers]:
+    """启动下载队列线程池，两个通道的线程数都为 0 时不启动"""
+    global _workers
+    if _workers is None and (QUEUE_WORKERS > 0 or QUEUE_PRIORITY_WORKERS > 0):
+        _workers = DownloadQueueWorkers()
+        _workers.start()
+    return _workers
+
+
+def stop_download_workers(timeout: Optional[float] = None):
+    """停止下载队列线程池，正在下载的批次完成后退出（最多等待 timeout 秒）"""
+    global _workers
+    if _workers is not None:
+        _workers.stop(timeout)
+        _workers = None
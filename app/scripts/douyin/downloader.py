@@ -1,22 +1,106 @@
 import os
-import requests
+import threading
 import logging
 import hashlib
+import json
+import re
+import time
 from typing import List, Optional, Dict
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from sqlalchemy.orm import Session
 from app.scripts.douyin.schemas import DownloadTask, DownloadResult, DownloadTaskResult, CoverUrls
-from app.crud.douyin import create_content_files_bulk
+from app.crud.douyin import create_content_files_bulk, get_file_fingerprints
 from app.schemas.douyin import DouyinContentFileCreate
+from app.scripts.douyin.download_engine import get_download_engine, LANE_PRIORITY, LANE_BULK
+from app.scripts.douyin.content_store import get_content_store
 
 logger = logging.getLogger(__name__)
 
+# 下载和计算哈希时每次读写的分块大小
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+# 单个文件最多尝试次数（在备用地址间轮换）和重试间隔基数（秒）
+DOWNLOAD_MAX_ATTEMPTS = int(os.getenv("DOUYIN_DOWNLOAD_MAX_ATTEMPTS", "4"))
+DOWNLOAD_RETRY_BACKOFF = float(os.getenv("DOUYIN_DOWNLOAD_RETRY_BACKOFF", "1"))
+CONTENT_RANGE_PATTERN = re.compile(r"bytes (\d+)-(\d+)/(\d+)")
+# 文件哈希算法：md5（默认，与已有记录一致）、blake2b、sha1，安装 xxhash 后可用 xxh3_64/xxh64
+# 非 md5 的哈希值带 "算法:" 前缀保存
+FILE_HASH_ALGORITHM = os.getenv("DOUYIN_FILE_HASH_ALGORITHM", "md5").lower()
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+
+def new_file_hasher():
+    """创建配置的哈希对象"""
+    if FILE_HASH_ALGORITHM == "blake2b":
+        return hashlib.blake2b(digest_size=32)
+    if FILE_HASH_ALGORITHM.startswith("xxh") and xxhash is not None:
+        return getattr(xxhash, FILE_HASH_ALGORITHM)()
+    if FILE_HASH_ALGORITHM in hashlib.algorithms_available:
+        return hashlib.new(FILE_HASH_ALGORITHM)
+    return hashlib.md5()
+
+
+def format_file_hash(hasher) -> str:
+    """md5 直接保存十六进制值，其他算法加上算法前缀"""
+    name = "md5" if hasher.name == "md5" else FILE_HASH_ALGORITHM
+    return hasher.hexdigest() if name == "md5" else f"{name}:{hasher.hexdigest()}"
+
+# 走优先通道的封面类型（图集只有第一张图片走优先通道）
+PRIORITY_COVER_TYPES = ("cover", "origin_cover", "dynamic_cover")
+
+
+def file_priority(file_type: str, file_index: Optional[int] = None) -> int:
+    """文件的下载通道：封面和图集首图为 LANE_PRIORITY，视频和其余图片为 LANE_BULK"""
+    if file_type in PRIORITY_COVER_TYPES or (file_type == "image" and file_index == 1):
+        return LANE_PRIORITY
+    return LANE_BULK
+
+# 所有下载管理器共用的任务线程池大小（线程只负责调度，实际请求由下载引擎完成）
+DOWNLOAD_TASK_WORKERS = int(os.getenv("DOUYIN_DOWNLOAD_TASK_WORKERS", "32"))
+
+# 单个文件下载使用的共享线程池大小（同一作品的多个文件并发下载）
+DOWNLOAD_FILE_WORKERS = int(os.getenv("DOUYIN_DOWNLOAD_FILE_WORKERS", "64"))
+
+_task_executor: Optional[ThreadPoolExecutor] = None
+_file_executor: Optional[ThreadPoolExecutor] = None
+_task_executor_lock = threading.Lock()
+
+
+def get_task_executor() -> ThreadPoolExecutor:
+    """获取进程内共享的下载任务线程池"""
+    global _task_executor
+    with _task_executor_lock:
+        if _task_executor is None:
+            _task_executor = ThreadPoolExecutor(max_workers=DOWNLOAD_TASK_WORKERS, thread_name_prefix="douyin-download-task")
+        return _task_executor
+
+
+def get_file_executor() -> ThreadPoolExecutor:
+    """获取进程内共享的单文件下载线程池
+
+    与任务线程池分开：任务线程等待文件线程，文件线程不再提交其他任务，不会互相占满导致死锁。
+    """
+    global _file_executor
+    with _task_executor_lock:
+        if _file_executor is None:
+            _file_executor = ThreadPoolExecutor(max_workers=DOWNLOAD_FILE_WORKERS, thread_name_prefix="douyin-download-file")
+        return _file_executor
+
 class DownloadManager:
     def __init__(self, base_path: str = None, max_workers: int = 3):
         # 从环境变量获取下载路径，如果未设置则使用默认值 "downloads"
         self.base_path = base_path or os.getenv("DOUYIN_DOWNLOAD_PATH", "downloads")
+        # 单个下载管理器同时进行的任务数，多个采集任务共用全局任务线程池和下载引擎
         self.max_workers = max_workers
-        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        # 当前批次的文件指纹 {file_path: (file_size, file_mtime, file_hash)}，大小和修改时间不变时直接复用哈希
+        self.fingerprints: Dict[str, tuple] = {}
+        # 开启 DOUYIN_CONTENT_STORE 时相同内容只保存一份，下载路径为硬链接
+        self.content_store = get_content_store(self.base_path)
+        self.executor = get_task_executor()
         self.headers = {
             "referer": 'https://www.douyin.com',
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36 Edg/131.0.0.0',
@@ -51,48 +135,172 @@ class DownloadManager:
             
         return os.path.join(aweme_dir, filename)
     
-    def _download_file(self, url: str, file_path: str) -> DownloadTaskResult:
-        """下载文件"""
+    @staticmethod
+    def _update_hash(file_hash, file_path: str) -> None:
+        """把文件内容分块计入哈希，不把整个文件读入内存"""
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b''):
+                file_hash.update(chunk)
+    
+    @classmethod
+    def _hash_file(cls, file_path: str) -> str:
+        """分块计算文件的哈希值"""
+        file_hash = new_file_hasher()
+        cls._update_hash(file_hash, file_path)
+        return format_file_hash(file_hash)
+    
+    def load_fingerprints(self, db: Session, aweme_ids: List[str]) -> List[str]:
+        """从 douyin_content_files 预加载这些作品已记录的文件指纹，返回加载的文件路径"""
+        fingerprints = get_file_fingerprints(db, aweme_ids)
+        self.fingerprints.update(fingerprints)
+        return list(fingerprints)
+    
+    def _existing_file_result(self, file_path: str, result: DownloadTaskResult,
+                              fingerprint: Optional[tuple] = None) -> DownloadTaskResult:
+        """已存在的文件：大小和修改时间与指纹 (大小, 修改时间, 哈希) 一致时只需一次 stat，否则重新计算哈希"""
+        stat = os.stat(file_path)
+        fingerprint = fingerprint or self.fingerprints.get(file_path)
+        if fingerprint and fingerprint[0] == stat.st_size and fingerprint[1] == stat.st_mtime_ns and fingerprint[2]:
+            file_hash = fingerprint[2]
+        else:
+            file_hash = self._hash_file(file_path)
+        
+        result.success = True
+        result.file_size = stat.st_size
+        result.file_mtime = stat.st_mtime_ns
+        result.file_hash = file_hash
+        return result
+    
+    @staticmethod
+    def _load_part_meta(meta_path: str) -> dict:
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    @staticmethod
+    def _save_part_meta(meta_path: str, meta: dict) -> None:
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+    
+    @staticmethod
+    def _remove_part(part_path: str, meta_path: str) -> None:
+        for path in (part_path, meta_path):
+            if os.path.exists(path):
+                os.remove(path)
+    
+    def _download_file(self, url: str, file_path: str, lane: int = LANE_BULK,
+                       mirrors: Optional[List[str]] = None, fingerprint: Optional[tuple] = None) -> DownloadTaskResult:
+        """下载文件
+
+        请求由共享的下载引擎发出，边下载边写入 <目标文件>.part 并计算哈希，完成后原子重命名为目标文件，
+        中途失败不会在目标路径留下不完整的文件。.part 和记录 ETag/Last-Modified/总大小的 .part.json 会保留下来，
+        下次下载同一文件时用 Range + If-Range 续传，资源已变化时服务端返回完整内容并从头下载。
+        开启内容寻址存储时，响应的 ETag 和大小与已存储的文件一致则不下载响应体，直接链接已有文件。
+        """
         result = DownloadTaskResult(file_path=file_path)
+        part_path = f"{file_path}.part"
+        meta_path = f"{file_path}.part.json"
         
         try:
             # 检查文件是否已存在
             if os.path.exists(file_path):
-                # 获取文件大小
-                file_size = os.path.getsize(file_path)
-                # 读取文件内容计算哈希值
-                with open(file_path, 'rb') as f:
-                    content = f.read()
-                    file_hash = hashlib.md5(content).hexdigest()
-                
-                result.success = True
-                result.file_size = file_size
-                result.file_hash = file_hash
                 # logger.info(f"文件已存在，跳过下载: {file_path}")
-                return result
+                return self._existing_file_result(file_path, result, fingerprint)
             
-            # 设置超时和重试次数
-            response = requests.get(url, timeout=30, stream=True, headers=self.headers)
-            if response.status_code != 200:
-                result.error = f"下载请求失败，状态码: {response.status_code}"
-                return result
+            # 确保目录存在
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
             
-            # 使用流式下载，避免内存占用过大
-            content = b''
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    content += chunk
+            # 已有未完成的部分时请求剩余的字节
+            headers = dict(self.headers)
+            meta = self._load_part_meta(meta_path)
+            offset = os.path.getsize(part_path) if meta and os.path.exists(part_path) else 0
+            if offset:
+                headers["Range"] = f"bytes={offset}-"
+                validator = meta.get("etag") or meta.get("last_modified")
+                if validator:
+                    headers["If-Range"] = validator
             
-            result.file_size = len(content)
-            result.file_hash = hashlib.md5(content).hexdigest()
+            state = {"meta": meta}
+            # 响应体边写入边计入哈希，续传时先计入已下载的部分，完成后不再重新读取整个文件
+            file_hash = new_file_hasher()
             
-            # 确保目录存在
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            def on_response(status_code: int, response_headers, response_url: str) -> Optional[str]:
+                """根据响应头决定续传、从头下载还是丢弃响应体"""
+                if status_code == 206 and offset:
+                    content_range = response_headers.get("Content-Range", "")
+                    match = CONTENT_RANGE_PATTERN.match(content_range)
+                    if not match or int(match.group(1)) != offset or (
+                            meta.get("total") and int(match.group(3)) != meta["total"]):
+                        state["error"] = f"续传范围不匹配: {content_range}"
+                        return None
+                    self._update_hash(file_hash, part_path)
+                    state["hashed"] = True
+                    return 'ab'
+                if status_code == 200:
+                    # 首次下载，或资源已变化、服务端不支持续传时从头下载
+                    etag = response_headers.get("ETag")
+                    content_length = response_headers.get("Content-Length")
+                    if self.content_store and etag and content_length and not etag.startswith("W/"):
+                        cached_hash = self.content_store.lookup_etag(etag, int(content_length))
+                        if cached_hash:
+                            state["cached_hash"] = cached_hash
+                            return None
+                    state["meta"] = {
+                        # 对冲请求时可能是镜像地址，续传只向该主机发送 Range/If-Range
+                        "url": response_url,
+                        # 弱 ETag 不能用于 If-Range
+                        "etag": etag if etag and not etag.startswith("W/") else None,
+                        "last_modified": response_headers.get("Last-Modified"),
+                        "total": int(content_length) if content_length else None,
+                    }
+                    self._save_part_meta(meta_path, state["meta"])
+                    state["hashed"] = True
+                    return 'wb'
+                return None
+            
+            range_host = urlsplit(meta["url"]).netloc if offset and meta.get("url") else None
+            status_code = get_download_engine().fetch_to_file(url, headers, part_path, on_response, lane,
+                                                              mirrors or (), range_host, file_hash)
+            meta = state["meta"]
+            if state.get("cached_hash") and self.content_store.link(state["cached_hash"], file_path):
+                self._remove_part(part_path, meta_path)
+                stat = os.stat(file_path)
+                result.file_hash = state["cached_hash"]
+                result.file_size = stat.st_size
+                result.file_mtime = stat.st_mtime_ns
+                result.success = True
+                return result
+            if status_code == 416 and offset and offset == meta.get("total"):
+                # 上次已经下载完整，只差重命名
+                pass
+            elif state.get("error") or status_code == 416:
+                self._remove_part(part_path, meta_path)
+                result.error = state.get("error") or f"下载请求失败，状态码: {status_code}"
+                return result
+            elif status_code not in (200, 206) or (status_code == 206 and not offset):
+                result.error = f"下载请求失败，状态码: {status_code}"
+                return result
+            
+            file_size = os.path.getsize(part_path)
+            if meta.get("total") and file_size != meta["total"]:
+                result.error = f"下载不完整: {file_size}/{meta['total']} 字节"
+                return result
             
-            # 保存文件
-            with open(file_path, 'wb') as f:
-                f.write(content)
+            # 上次已下载完整、本次没有响应体时才需要读取文件计算哈希
+            result.file_hash = format_file_hash(file_hash) if state.get("hashed") else self._hash_file(part_path)
+            if self.content_store:
+                self.content_store.commit(part_path, file_path, result.file_hash)
+                if meta.get("etag") and meta.get("total"):
+                    self.content_store.remember_etag(meta["etag"], meta["total"], result.file_hash)
+            else:
+                os.replace(part_path, file_path)
+            if os.path.exists(meta_path):
+                os.remove(meta_path)
             
+            result.file_size = file_size
+            result.file_mtime = os.stat(file_path).st_mtime_ns
             result.success = True
             # logger.info(f"文件下载成功: {file_path}")
             return result
@@ -102,56 +310,114 @@ class DownloadManager:
             logger.error(f"下载文件失败 {file_path}: {str(e)}")
             return result
     
+    def download_with_retries(self, urls: List[str], file_path: str, lane: int = LANE_BULK,
+                              fingerprint: Optional[tuple] = None) -> DownloadTaskResult:
+        """在备用地址之间轮换重试下载，每次重试都从 .part 续传
+
+        地址按 CDN 主机的历史延迟排序，每次请求时其余地址作为镜像交给下载引擎对冲请求。
+        fingerprint 为数据库中记录的 (大小, 修改时间, 哈希)，文件已存在且未变化时不重新计算哈希。
+        """
+        result = DownloadTaskResult(file_path=file_path, error="没有可用的下载地址")
+        urls = get_download_engine().rank_urls(urls) if len(urls) > 1 else urls
+        for attempt in range(DOWNLOAD_MAX_ATTEMPTS if urls else 0):
+            url = urls[attempt % len(urls)]
+            mirrors = [mirror for mirror in urls if mirror != url]
+            result = self._download_file(url, file_path, lane, mirrors, fingerprint)
+            if result.success:
+                return result
+            if attempt + 1 < DOWNLOAD_MAX_ATTEMPTS:
+                time.sleep(DOWNLOAD_RETRY_BACKOFF * (attempt + 1))
+        return result
+    
     def _download_video_task(self, task: DownloadTask) -> DownloadResult:
-        """下载单个视频任务"""
+        """下载单个视频任务
+
+        视频、各类型封面和图集图片作为独立的文件并发下载（受下载引擎的全局并发限制），
+        封面和图集首图走下载引擎的优先通道，不会排在视频后面，
+        每个文件仍按自身URL列表的顺序回退重试，结果汇总到同一个 DownloadResult。
+        """
         result = DownloadResult(aweme_id=task.aweme_id)
+        executor = get_file_executor()
+        
+        # 先提交封面和图集首图（优先通道），再提交视频和其余图片（批量通道）
+        # 下载封面，每种封面在列表中的URL之间轮换重试直到成功
+        cover_futures = []
+        for cover_info in task.cover_urls or []:
+            file_path = self._get_file_path(task.sec_user_id, task.aweme_id, cover_info.cover_type)
+            cover_futures.append((cover_info.cover_type, executor.submit(
+                self.download_with_retries, cover_info.url, file_path, file_priority(cover_info.cover_type)
+            )))
+        
+        # 下载图片
+        image_futures = []
+        for index, url in enumerate(task.image_urls or [], 1):
+            file_path = self._get_file_path(task.sec_user_id, task.aweme_id, f'image_{index}')
+            image_futures.append((index, executor.submit(
+                self.download_with_retries, [url], file_path, file_priority('image', index)
+            )))
         
         # 下载视频
+        video_future = None
         if task.video_urls:
-            for url in task.video_urls:
-                file_path = self._get_file_path(task.sec_user_id, task.aweme_id, 'video')
-                download_result = self._download_file(url, file_path)
-                if download_result.success:
-                    result.video = download_result
-                    break
-                else:
-                    result.video.error = download_result.error
+            file_path = self._get_file_path(task.sec_user_id, task.aweme_id, 'video')
+            video_future = executor.submit(self.download_with_retries, task.video_urls, file_path, LANE_BULK)
         
-        # 下载封面
-        if task.cover_urls:
-            for cover_info in task.cover_urls:
-                file_path = self._get_file_path(task.sec_user_id, task.aweme_id, cover_info.cover_type)
-                # 尝试下载列表中的每个URL直到成功
-                for url in cover_info.url:
-                    download_result = self._download_file(url, file_path)
-                    if download_result.success:
-                        download_result.cover_type = cover_info.cover_type
-                        if cover_info.cover_type == 'cover':
-                            result.cover = download_result
-                        elif cover_info.cover_type == 'origin_cover':
-                            result.origin_cover = download_result
-                        elif cover_info.cover_type == 'dynamic_cover':
-                            result.dynamic_cover = download_result
-                        break
-                    else:
-                        if cover_info.cover_type == 'cover':
-                            result.cover.error = download_result.error
-                        elif cover_info.cover_type == 'origin_cover':
-                            result.origin_cover.error = download_result.error
-                        elif cover_info.cover_type == 'dynamic_cover':
-                            result.dynamic_cover.error = download_result.error
-
-        # 下载图片
-        if task.image_urls:
-            for index, url in enumerate(task.image_urls, 1):
-                file_path = self._get_file_path(task.sec_user_id, task.aweme_id, f'image_{index}')
-                download_result = self._download_file(url, file_path)
-                if download_result.success:
-                    download_result.image_index = index
-                result.images.append(download_result)
+        if video_future:
+            download_result = video_future.result()
+            if download_result.success:
+                result.video = download_result
+            else:
+                result.video.error = download_result.error
+        
+        for cover_type, future in cover_futures:
+            download_result = future.result()
+            if download_result.success:
+                download_result.cover_type = cover_type
+                if cover_type == 'cover':
+                    result.cover = download_result
+                elif cover_type == 'origin_cover':
+                    result.origin_cover = download_result
+                elif cover_type == 'dynamic_cover':
+                    result.dynamic_cover = download_result
+            else:
+                if cover_type == 'cover':
+                    result.cover.error = download_result.error
+                elif cover_type == 'origin_cover':
+                    result.origin_cover.error = download_result.error
+                elif cover_type == 'dynamic_cover':
+                    result.dynamic_cover.error = download_result.error
+        
+        # 按图片序号顺序汇总
+        for index, future in image_futures:
+            download_result = future.result()
+            if download_result.success:
+                download_result.image_index = index
+            result.images.append(download_result)
 
         return result
     
+    def build_queue_rows(self, task: DownloadTask) -> List[Dict]:
+        """把下载任务拆成 douyin_content_files 的待下载记录（每个文件一行，带目标路径、下载地址列表和下载通道）"""
+        files = []
+        if task.video_urls:
+            files.append(('video', 0, 'video', task.video_urls))
+        for cover_info in task.cover_urls or []:
+            files.append((cover_info.cover_type, 0, cover_info.cover_type, cover_info.url))
+        for index, url in enumerate(task.image_urls or [], 1):
+            files.append(('image', index, f'image_{index}', [url]))
+        
+        return [{
+            "content_id": task.content_id,
+            "aweme_id": task.aweme_id,
+            "file_type": file_type,
+            "file_index": file_index,
+            "file_path": self._get_file_path(task.sec_user_id, task.aweme_id, path_type),
+            "source_urls": list(urls),
+            "priority": file_priority(file_type, file_index),
+            "download_status": "pending",
+            "retry_count": 0,
+        } for file_type, file_index, path_type, urls in files if urls]
+    
     def batch_download_videos(self, tasks: List[DownloadTask]) -> List[DownloadResult]:
         """批量下载视频和图集
         Args:
@@ -159,26 +425,29 @@ class DownloadManager:
         Returns:
             下载结果列表
         """
-        # 提交所有下载任务
-        future_to_task = {
-            self.executor.submit(self._download_video_task, task): task
-            for task in tasks
-        }
-        
-        # 收集结果
+        # 同时最多提交 max_workers 个任务，避免一个批次占满共享线程池
         results = []
-        for future in as_completed(future_to_task):
-            try:
-                result = future.result()
-                results.append(result)
-            except Exception as e:
-                task = future_to_task[future]
-                logger.error(f"下载任务执行失败 {task.aweme_id}: {str(e)}")
-                results.append(DownloadResult(
-                    aweme_id=task.aweme_id,
-                    video=DownloadTaskResult(error=str(e)),
-                    cover=DownloadTaskResult(error=str(e))
-                ))
+        pending = {}
+        task_iter = iter(tasks)
+        while True:
+            for task in task_iter:
+                pending[self.executor.submit(self._download_video_task, task)] = task
+                if len(pending) >= self.max_workers:
+                    break
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                task = pending.pop(future)
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    logger.error(f"下载任务执行失败 {task.aweme_id}: {str(e)}")
+                    results.append(DownloadResult(
+                        aweme_id=task.aweme_id,
+                        video=DownloadTaskResult(error=str(e)),
+                        cover=DownloadTaskResult(error=str(e))
+                    ))
         
         return results
 
@@ -203,6 +472,7 @@ class DownloadManager:
                 file_path=result.video.file_path,
                 file_size=result.video.file_size,
                 file_hash=result.video.file_hash,
+                file_mtime=result.video.file_mtime,
                 download_status=download_status,
                 error_message=error_message
             ))
@@ -219,6 +489,7 @@ class DownloadManager:
                     file_path=cover_result.file_path,
                     file_size=cover_result.file_size,
                     file_hash=cover_result.file_hash,
+                    file_mtime=cover_result.file_mtime,
                     download_status="completed",
                     error_message=None
                 ))
@@ -234,6 +505,7 @@ class DownloadManager:
                     file_path=image_result.file_path,
                     file_size=image_result.file_size,
                     file_hash=image_result.file_hash,
+                    file_mtime=image_result.file_mtime,
                     download_status="completed",
                     error_message=None
                 ))
@@ -254,8 +526,14 @@ class DownloadManager:
                 "failed": [下载失败的记录列表]
             }
         """
-        # 执行下载
-        download_results = self.batch_download_videos(tasks)
+        # 预加载已有文件的指纹，已下载过的文件只需 stat 确认；本批结束后释放
+        loaded_paths = self.load_fingerprints(db, [task.aweme_id for task in tasks])
+        try:
+            # 执行下载
+            download_results = self.batch_download_videos(tasks)
+        finally:
+            for file_path in loaded_paths:
+                self.fingerprints.pop(file_path, None)
         
         # 转换为数据库记录
         content_files = []
@@ -283,21 +561,6 @@ class DownloadManager:
                 # 转换下载结果为内容文件记录
                 content_files_create = self._convert_to_content_files(result, content_id)
                 content_files.extend(content_files_create)
-                
-                # 如果是图集，更新内容的图片路径信息
-                if task.image_urls and content_id:
-                    from app.models.douyin import DouyinContent
-                    content = db.query(DouyinContent).filter_by(id=content_id).first()
-                    if content:
-                        successful_images = [img for img in result.images if img.success]
-                        if successful_images:
-                            image_urls = content.image_urls or []
-                            for img in successful_images:
-                                # 将本地文件路径转换为URL格式，或者直接使用原始URL
-                                # 这里假设我们只需要记录文件已下载的状态，不需要修改image_urls
-                                pass
-                            # 不需要更新image_urls，因为它应该已经包含了原始URL
-                            # 如果需要记录本地路径，应该在DouyinContent模型中添加image_paths字段
             else:
                 failed_results.append(result)
         
@@ -0,0 +1,137 @@
+"""
+抖音请求自适应限速
+
+同一个 Cookie 的所有抖音接口请求共用一个 AdaptivePacer：
+响应正常时逐步缩短请求间隔，遇到空响应、非 200 或验证码时按指数退避拉长间隔，
+在不触发风控的前提下尽量提高每分钟可采集的页数。
+"""
+import asyncio
+import hashlib
+import os
+import threading
+import time
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 请求间隔（秒）的下限、上限和初始值
+MIN_INTERVAL = float(os.getenv("DOUYIN_PACER_MIN_INTERVAL", "0.5"))
+MAX_INTERVAL = float(os.getenv("DOUYIN_PACER_MAX_INTERVAL", "120"))
+INITIAL_INTERVAL = float(os.getenv("DOUYIN_PACER_INITIAL_INTERVAL", "2"))
+# 每次正常响应后间隔缩短的比例，每次异常响应后间隔放大的倍数
+SPEEDUP_FACTOR = 0.9
+BACKOFF_FACTOR = 2.0
+
+# 验证码/风控响应的特征
+CAPTCHA_HEADERS = ("x-vc-bdturing-parameters", "bdturing-verify")
+CAPTCHA_MARKERS = ("verify_check", "captcha", "verifycenter")
+
+
+def is_throttled_response(status_code: int, text: Optional[str], headers=None) -> bool:
+    """判断响应是否为被限流/风控的结果：非 200、空响应体或验证码"""
+    if status_code != 200 or not text:
+        return True
+    if headers and any(name in headers for name in CAPTCHA_HEADERS):
+        return True
+    # 验证码页面一般很短，只检查开头部分，避免扫描整个列表响应
+    head = text[:512].lower()
+    return any(marker in head for marker in CAPTCHA_MARKERS)
+
+
+class AdaptivePacer:
+    """自适应请求节奏控制器（线程安全，同时支持同步和异步等待）"""
+
+    def __init__(self,
+                 min_interval: float = MIN_INTERVAL,
+                 max_interval: float = MAX_INTERVAL,
+                 initial_interval: float = INITIAL_INTERVAL):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min(max(initial_interval, min_interval), max_interval)
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+        self.success_count = 0
+        self.failure_count = 0
+        self.consecutive_failures = 0
+
+    @property
+    def rate(self) -> float:
+        """当前允许的请求速率（次/秒）"""
+        return 1.0 / self.interval
+
+    def _reserve(self) -> float:
+        """预约下一个请求时间，返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+            return slot - now
+
+    def wait(self) -> None:
+        """同步等待到允许发送下一个请求"""
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def async_wait(self) -> None:
+        """异步等待到允许发送下一个请求"""
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.success_count += 1
+            self.consecutive_failures = 0
+            self.interval = max(self.min_interval, self.interval * SPEEDUP_FACTOR)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failure_count += 1
+            self.consecutive_failures += 1
+            self.interval = min(self.max_interval, self.interval * BACKOFF_FACTOR)
+            # 已经预约的时间也要顺延，让退避立即生效
+            self._next_slot = max(self._next_slot, time.monotonic() + self.interval)
+        logger.warning(f"抖音请求异常，限速退避: 间隔={self.interval:.2f}秒, 连续失败={self.consecutive_failures}")
+
+    def record(self, status_code: int, text: Optional[str], headers=None) -> bool:
+        """根据响应调整节奏，返回响应是否正常"""
+        if is_throttled_response(status_code, text, headers):
+            self.record_failure()
+            return False
+        self.record_success()
+        return True
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "interval": round(self.interval, 3),
+            "rate_per_minute": round(self.rate * 60, 2),
+            "success_count": self.success_count,
+            "failure_count": self.failure_count,
+            "consecutive_failures": self.consecutive_failures,
+        }
+
+
+_pacers: Dict[str, AdaptivePacer] = {}
+_pacers_lock = threading.Lock()
+
+
+def pacer_key(cookie: Optional[str]) -> str:
+    return hashlib.md5(cookie.encode()).hexdigest()[:12] if cookie else "anonymous"
+
+
+def get_pacer(cookie: Optional[str] = None) -> AdaptivePacer:
+    """获取 Cookie 对应的共享限速器"""
+    key = pacer_key(cookie)
+    with _pacers_lock:
+        pacer = _pacers.get(key)
+        if pacer is None:
+            pacer = _pacers[key] = AdaptivePacer()
+        return pacer
+
+
+def get_pacer_stats() -> Dict[str, Dict[str, float]]:
+    """获取所有限速器的当前状态"""
+    with _pacers_lock:
+        return {key: pacer.stats() for key, pacer in _pacers.items()}
@@ -206,7 +206,8 @@ class DownloadTaskResult(BaseModel):
     success: bool = Field(default=False, description="是否下载成功")
     file_path: str = Field(default="", description="文件保存路径")
     file_size: int = Field(default=0, description="文件大小(字节)")
-    file_hash: str = Field(default="", description="文件MD5哈希值")
+    file_hash: str = Field(default="", description="文件哈希值")
+    file_mtime: Optional[int] = Field(default=None, description="文件修改时间(纳秒)")
     error: str = Field(default="", description="错误信息")
     cover_type: Optional[str] = Field(default=None, description="封面类型(仅封面文件有此字段)")
     image_index: Optional[int] = Field(default=None, description="图片序号(仅图集图片有此字段)")
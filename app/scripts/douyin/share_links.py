@@ -0,0 +1,63 @@
+"""
+抖音分享短链解析（带持久化缓存）
+
+同一个 v.douyin.com 短链会被反复粘贴，解析结果按短链缓存在 douyin_share_links 表中，
+缓存有效期内直接返回 sec_user_id/aweme_id，不再请求重定向链。
+"""
+import os
+import logging
+from typing import Optional, Tuple
+from sqlalchemy.orm import Session
+
+from app.crud.douyin import get_share_link, save_share_link
+from app.scripts.douyin.tiktok_api import TikTokApi, AsyncTikTokApi
+
+logger = logging.getLogger(__name__)
+
+# 短链解析结果的缓存时间（秒），默认30天
+SHARE_LINK_TTL = int(os.getenv("DOUYIN_SHARE_LINK_TTL", str(30 * 24 * 3600)))
+
+
+def normalize_share_url(share_url: str) -> str:
+    """统一短链格式作为缓存键"""
+    share_url = share_url.strip()
+    if "?" not in share_url and not share_url.endswith("/"):
+        share_url += "/"
+    return share_url
+
+
+def _lookup(db: Session, short_url: str) -> Optional[Tuple[Optional[str], Optional[str]]]:
+    link = get_share_link(db, short_url)
+    if link:
+        return link.sec_user_id, link.aweme_id
+    return None
+
+
+def _store(db: Session, short_url: str, resolved_url: str) -> Tuple[Optional[str], Optional[str]]:
+    # 解析函数未匹配时返回 0，统一为 None
+    sec_user_id = TikTokApi.parse_sec_user_id(resolved_url) or None
+    aweme_id = TikTokApi.parse_aweme_id(resolved_url) or None
+    if sec_user_id or aweme_id:
+        try:
+            save_share_link(db, short_url, resolved_url, sec_user_id, aweme_id, SHARE_LINK_TTL)
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"保存分享短链缓存失败 {short_url}: {str(e)}")
+    return sec_user_id, aweme_id
+
+
+async def async_resolve_share_link(
+    db: Session, api: AsyncTikTokApi, share_url: str
+) -> Tuple[Optional[str], Optional[str]]:
+    """解析分享短链，缓存有效期内直接返回缓存结果
+
+    规范化后的短链只作为缓存键，请求时仍使用用户提交的原始地址。
+
+    Returns:
+        (sec_user_id, aweme_id)，未解析出的项为 None
+    """
+    short_url = normalize_share_url(share_url)
+    cached = _lookup(db, short_url)
+    if cached:
+        return cached
+    return _store(db, short_url, await api.resolve_share_url(share_url.strip()))
@@ -1,17 +1,49 @@
 import asyncio
-from app.scripts.douyin.tiktok_api import TikTokApi
+from app.scripts.douyin.tiktok_api import TikTokApi, AsyncTikTokApi
+from sqlalchemy import update
 from app.db.session import get_db_context, base_db
 from app.models.douyin import DouyinCreator, DouyinContent
 from app.services.douyin import get_douyin_cookie
 from app.scripts.douyin.downloader import DownloadManager
+from app.scripts.douyin.content_store import get_content_store
+from app.scripts.douyin.download_policy import apply_download_policy
 from app.scripts.douyin.schemas import DownloadTask, CoverUrls
 from app.core.task_context import get_task_context
+from app.scripts.douyin.pacer import pacer_key
+from app.crud.douyin import (
+    CONTENT_STAT_COLUMNS, get_content_stats_by_aweme_ids, upsert_content_stats,
+    bulk_insert_contents, bulk_insert_content_metrics,
+    get_crawl_checkpoint, save_crawl_checkpoint, delete_crawl_checkpoint, enqueue_content_files,
+    count_created_contents, recount_creator_counters
+)
+import os
+import queue
+import threading
 import time
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 列表页被限流时同一页最多重试的次数（间隔由限速器控制）
+MAX_PAGE_RETRIES = 3
+# 采集流水线各阶段之间最多积压的页数，超过后上游阻塞等待，内存占用不随作品数增长
+PIPELINE_QUEUE_SIZE = int(os.getenv("DOUYIN_PIPELINE_QUEUE_SIZE", "2"))
+# 同一个Cookie同时处理的创作者数；批量采集的所有创作者共用当前用户的Cookie，也就是批量采集的并发数
+FLEET_PER_COOKIE_CONCURRENCY = int(os.getenv("DOUYIN_FLEET_PER_COOKIE_CONCURRENCY", "2"))
+# 刷新创作者信息时同时进行的请求数
+CREATOR_INFO_CONCURRENCY = int(os.getenv("DOUYIN_CREATOR_INFO_CONCURRENCY", "8"))
+# 刷新创作者信息时同步的字段
+CREATOR_INFO_FIELDS = (
+    "nickname", "avatar_url", "unique_id", "signature", "ip_location", "gender",
+    "follower_count", "following_count", "aweme_count", "total_favorited",
+)
+# 作品表上的统计值只作为列表排序用的近似值：某项统计的变化达到该比例时才改写作品行，每次变化都会追加快照
+CONTENT_STATS_REWRITE_RATIO = float(os.getenv("DOUYIN_CONTENT_STATS_REWRITE_RATIO", "0.05"))
+# 流水线结束标记
+_PIPELINE_END = object()
+
 
 def test_task():
     """
@@ -25,6 +57,330 @@ async def test_task_async():
     print("测试异步任务结束: ", time.time())
 
 
+def _build_content_row(aweme, creator_id: int) -> dict:
+    """将接口返回的作品转换为 douyin_contents 的一行数据（各行字段一致，便于批量写入）"""
+    content_type = "image" if aweme.aweme_type == 68 else "video"
+    statistics = aweme.statistics
+    video = aweme.video if content_type == "video" else None
+    play_addr = video.play_addr if video else None
+    images = aweme.images if content_type == "image" and aweme.images else []
+    return {
+        "creator_id": creator_id,
+        "aweme_id": aweme.aweme_id,
+        "desc": aweme.desc,
+        "group_id": aweme.group_id,
+        "create_time": aweme.create_time,
+        "is_top": aweme.is_top,
+        "content_type": content_type,
+        "aweme_type": aweme.aweme_type if content_type == "video" else 0,
+        "media_type": aweme.media_type if content_type == "video" else 0,
+        
+        # 统计信息
+        "admire_count": statistics.admire_count,
+        "comment_count": statistics.comment_count,
+        "digg_count": statistics.digg_count,
+        "collect_count": statistics.collect_count,
+        "share_count": statistics.share_count,
+        "play_count": statistics.play_count if content_type == "video" else 0,
+        
+        # 视频特有信息
+        "duration": video.duration if video else None,
+        "video_height": play_addr.height if play_addr else None,
+        "video_width": play_addr.width if play_addr else None,
+        
+        # 图集特有信息
+        "images_count": len(images),
+        "image_urls": [img.url_list[0] for img in images] if content_type == "image" else None,
+        
+        "tags": [{
+            "tag_id": tag.tag_id,
+            "tag_name": tag.tag_name,
+            "level": tag.level
+        } for tag in (aweme.video_tag or [])],
+    }
+
+
+def _build_metric_row(row: dict, content_id: int, ts: int) -> dict:
+    """从内容行数据生成一条互动数据快照"""
+    metric = {column: row[column] for column in CONTENT_STAT_COLUMNS}
+    metric["content_id"] = content_id
+    metric["ts"] = ts
+    return metric
+
+
+def _stats_need_rewrite(row: dict, current: dict) -> bool:
+    """统计值的变化是否大到需要改写 douyin_contents（从无到有或变化比例达到 CONTENT_STATS_REWRITE_RATIO）"""
+    for column in CONTENT_STAT_COLUMNS:
+        old, new = current[column] or 0, row[column] or 0
+        if old != new and (not old or abs(new - old) >= old * CONTENT_STATS_REWRITE_RATIO):
+            return True
+    return False
+
+
+def _build_download_task(aweme, sec_user_id: str, content_id: int) -> DownloadTask | None:
+    """为新作品创建下载任务"""
+    if aweme.aweme_type != 68:
+        # 获取视频URL列表
+        video_urls = []
+        if aweme.video and aweme.video.play_addr and aweme.video.play_addr.url_list:
+            video_urls.extend(aweme.video.play_addr.url_list)
+        
+        # 获取封面URL列表
+        cover_urls = []
+        if aweme.video:
+            if aweme.video.dynamic_cover and aweme.video.dynamic_cover.url_list:
+                cover_urls.append(CoverUrls(cover_type='dynamic_cover', url=aweme.video.dynamic_cover.url_list))
+            if aweme.video.cover and aweme.video.cover.url_list:
+                cover_urls.append(CoverUrls(cover_type='cover', url=aweme.video.cover.url_list))
+            if aweme.video.origin_cover and aweme.video.origin_cover.url_list:
+                cover_urls.append(CoverUrls(cover_type='origin_cover', url=aweme.video.origin_cover.url_list))
+        
+        return DownloadTask(
+            sec_user_id=sec_user_id,
+            aweme_id=aweme.aweme_id,
+            image_urls=[],
+            video_urls=video_urls,
+            cover_urls=cover_urls,
+            content_id=content_id
+        )
+    if aweme.images:
+        return DownloadTask(
+            sec_user_id=sec_user_id,
+            aweme_id=aweme.aweme_id,
+            image_urls=[img.url_list[0] for img in aweme.images],
+            video_urls=[],
+            cover_urls=[],
+            content_id=content_id
+        )
+    return None
+
+
+def _save_page(db, creator: DouyinCreator, sec_user_id: str, aweme_list: list, last_aweme_id: str) -> dict:
+    """保存一页作品数据，查询次数与页大小无关
+
+    Returns:
+        dict: {
+            "non_top_aweme_ids": 本页非置顶作品ID,
+            "should_stop": 是否已到达上次采集的位置,
+            "download_tasks": 新作品的下载任务,
+            "created": 新增数量,
+            "updated": 统计值变化明显而改写作品行的数量
+        }
+    """
+    awemes = {}
+    non_top_aweme_ids = []
+    should_stop = False
+    for aweme in aweme_list:
+        # 如果视频的aweme_id小于last_aweme_id且不是置顶视频，则结束采集
+        if aweme.aweme_id < last_aweme_id and aweme.is_top != 1:
+            logger.info(f"发现视频 {aweme.aweme_id} 小于last_aweme_id {last_aweme_id} 且不是置顶视频，结束采集")
+            should_stop = True
+            break
+        
+        # 如果不是置顶视频/图集，则收集aweme_id用于更新last_aweme_id
+        if aweme.is_top != 1:
+            non_top_aweme_ids.append(aweme.aweme_id)
+        awemes[aweme.aweme_id] = aweme
+    
+    existing = get_content_stats_by_aweme_ids(db, list(awemes))
+    rows_to_update = []
+    rows_to_create = []
+    metric_rows = []
+    ts = int(time.time())
+    for aweme_id, aweme in awemes.items():
+        try:
+            row = _build_content_row(aweme, creator.id)
+        except Exception as e:
+            logger.error(f"处理数据失败 {aweme_id}: {str(e)}")
+            continue
+        if aweme_id not in existing:
+            rows_to_create.append(row)
+            continue
+        # 统计值有变化就追加快照；douyin_contents 上的统计值只在变化明显时改写，热门作品不会每次采集都被改写
+        content_id, current = existing[aweme_id]
+        if any(row[column] != current[column] for column in CONTENT_STAT_COLUMNS):
+            metric_rows.append(_build_metric_row(row, content_id, ts))
+            if _stats_need_rewrite(row, current):
+                rows_to_update.append(row)
+    
+    upsert_content_stats(db, rows_to_update)
+    created_ids = bulk_insert_contents(db, rows_to_create)
+    # 新作品计入创作者的视频/图集数，与本页一起提交
+    count_created_contents(db, creator.id, [row for row in rows_to_create if row["aweme_id"] in created_ids])
+    metric_rows.extend(
+        _build_metric_row(row, created_ids[row["aweme_id"]], ts)
+        for row in rows_to_create if row["aweme_id"] in created_ids
+    )
+    bulk_insert_content_metrics(db, metric_rows)
+    
+    download_tasks = []
+    for aweme_id, content_id in created_ids.items():
+        task = _build_download_task(awemes[aweme_id], sec_user_id, content_id)
+        if task:
+            download_tasks.append(task)
+    
+    return {
+        "non_top_aweme_ids": non_top_aweme_ids,
+        "should_stop": should_stop,
+        "download_tasks": download_tasks,
+        "created": len(created_ids),
+        "updated": len(rows_to_update),
+    }
+
+
+def _put_until_stopped(q: queue.Queue, item, stop_event: threading.Event) -> bool:
+    """阻塞放入队列，收到停止信号时放弃，返回是否放入成功"""
+    while not stop_event.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _fetch_pages(api: TikTokApi, sec_user_id: str, page_queue: queue.Queue, stop_event: threading.Event,
+                 fetch_state: dict, max_cursor: int = 0, count: int = 40):
+    """抓取阶段：从 max_cursor 开始逐页获取作品列表放入队列，直到没有更多数据或收到停止信号
+
+    正常翻到最后一页时将 fetch_state["completed"] 置为 True，请求失败中途退出时保持 False。
+    """
+    # 当前页已重试的次数；限速器的连续失败数由同一 Cookie 的所有线程共享，不能用来限制单页重试
+    attempts = 0
+    try:
+        while not stop_event.is_set():
+            # 获取视频列表
+            response = api.get_creator_video_list(
+                sec_user_id=sec_user_id,
+                count=count,
+                max_cursor=max_cursor
+            )
+            
+            if response is None and attempts < MAX_PAGE_RETRIES:
+                # 空响应/验证码，限速器已退避，稍后重试同一页
+                attempts += 1
+                logger.warning(f"获取视频列表被限流，第 {attempts} 次重试当前页 max_cursor={max_cursor}")
+                continue
+            attempts = 0
+            
+            if not response or not response.aweme_list:
+                logger.info(f"未获取到更多视频数据，结束采集")
+                fetch_state["completed"] = response is not None
+                break
+            
+            if not _put_until_stopped(page_queue, response, stop_event):
+                break
+            
+            # 更新分页信息
+            has_more = response.has_more == 1
+            max_cursor = response.max_cursor
+            logger.info(f"分页信息: has_more={has_more}, max_cursor={max_cursor}, 当前速率={api.pacer.rate * 60:.1f}页/分钟")
+            if not has_more:
+                fetch_state["completed"] = True
+                break
+    except Exception as e:
+        logger.error(f"获取列表失败: {str(e)}")
+    finally:
+        _put_until_stopped(page_queue, _PIPELINE_END, stop_event)
+
+
+def _collect_creator(db, api: TikTokApi, creator: DouyinCreator, downloader: DownloadManager) -> dict:
+    """采集单个创作者的作品，返回本次采集的统计信息
+
+    新作品的待下载文件与本页数据、采集断点（下一页游标、已完成页数）在同一事务中写入下载队列，
+    由下载队列线程池负责下载；上次采集中断时从断点继续，而不是从第一页重新翻。
+    """
+    sec_user_id = creator.sec_user_id
+    started = time.monotonic()
+    stats = {"pages": 0, "created": 0, "updated": 0, "queued": 0}
+    
+    # 用于收集所有非置顶视频和图集的aweme_id
+    all_non_top_aweme_ids = []
+    
+    checkpoint = get_crawl_checkpoint(db, creator.id)
+    if checkpoint:
+        # 沿用中断那一轮的停止位置，creator.last_aweme_id 只在整轮完成后更新
+        last_aweme_id = checkpoint.last_aweme_id or "0"
+        max_cursor = checkpoint.max_cursor or 0
+        pages_done = checkpoint.pages_done or 0
+        if checkpoint.max_aweme_id:
+            all_non_top_aweme_ids.append(checkpoint.max_aweme_id)
+        logger.info(f"创作者 {sec_user_id} 从断点继续采集: 已完成 {pages_done} 页, max_cursor={max_cursor}")
+    else:
+        last_aweme_id = creator.last_aweme_id or "0"
+        max_cursor = 0
+        pages_done = 0
+    logger.info(f"创作者 {sec_user_id} 的last_aweme_id: {last_aweme_id}")
+    
+    # 两段流水线：抓取线程 -> 当前线程写库并入队下载，队列有界形成背压
+    page_queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    stop_event = threading.Event()
+    fetch_state = {"completed": False}
+    fetcher = threading.Thread(
+        target=_fetch_pages, args=(api, sec_user_id, page_queue, stop_event, fetch_state, max_cursor),
+        name=f"douyin-fetch-{sec_user_id[-8:]}", daemon=True
+    )
+    fetcher.start()
+    
+    completed = False
+    try:
+        while True:
+            response = page_queue.get()
+            if response is _PIPELINE_END:
+                completed = fetch_state["completed"]
+                break
+            
+            # 批量处理当前页：一次IN查询 + 一次统计upsert + 一次批量插入，下载队列和断点随本页一起提交
+            try:
+                page = _save_page(db, creator, sec_user_id, response.aweme_list, last_aweme_id)
+                # 按创作者的下载开关和封面偏好决定哪些文件立即下载，其余延迟到首次请求时下载
+                queued = enqueue_content_files(db, apply_download_policy(
+                    [row for task in page["download_tasks"] for row in downloader.build_queue_rows(task)],
+                    creator.download_video, creator.download_cover
+                ))
+                page_max_aweme_id = max(all_non_top_aweme_ids + page["non_top_aweme_ids"], default=None)
+                save_crawl_checkpoint(
+                    db, creator.id, response.max_cursor, pages_done + 1, last_aweme_id, page_max_aweme_id
+                )
+                db.commit()
+            except Exception as e:
+                logger.error(f"批量保存数据失败: {str(e)}")
+                db.rollback()
+                break
+            
+            all_non_top_aweme_ids.extend(page["non_top_aweme_ids"])
+            pages_done += 1
+            stats["pages"] += 1
+            stats["created"] += page["created"]
+            stats["updated"] += page["updated"]
+            stats["queued"] += queued
+            logger.info(f"成功批量保存 {page['created']} 个新内容，更新 {page['updated']} 个现有内容，"
+                        f"加入下载队列 {queued} 个文件")
+            
+            # 如果应该停止采集，则跳出循环
+            if page["should_stop"]:
+                completed = True
+                break
+    finally:
+        stop_event.set()
+        fetcher.join()
+    
+    max_aweme_id = max(all_non_top_aweme_ids, default=None)
+    if completed:
+        # 整轮完成：删除断点并更新创作者的last_aweme_id
+        delete_crawl_checkpoint(db, creator.id)
+        if max_aweme_id and max_aweme_id > (creator.last_aweme_id or "0"):
+            creator.last_aweme_id = max_aweme_id
+            logger.info(f"已更新创作者 {sec_user_id} 的last_aweme_id为 {max_aweme_id}")
+        db.commit()
+    elif pages_done:
+        logger.warning(f"创作者 {sec_user_id} 采集未完成，已保存断点: 已完成 {pages_done} 页")
+    
+    stats["completed"] = completed
+    stats["elapsed"] = round(time.monotonic() - started, 2)
+    return stats
+
+
 def collect_creator_videos(sec_user_id: str = None):
     """采集抖音创作者的视频数据
     
@@ -59,275 +415,203 @@ def collect_creator_videos(sec_user_id: str = None):
                 logger.error(f"创作者 {sec_user_id} 不存在")
                 return
             
-            # 获取创作者的last_aweme_id
-            last_aweme_id = creator.last_aweme_id or "0"
-            logger.info(f"创作者 {sec_user_id} 的last_aweme_id: {last_aweme_id}")
-            
-            # 初始化下载管理器
-            downloader = DownloadManager()
-            
-            # 初始化API客户端
-            api = TikTokApi(cookie=saved_cookie)
-            
-            # 分页获取视频列表
-            max_cursor = 0
-            count = 40
-            has_more = True
-            should_stop = False  # 标记是否应该停止采集
-            
-            # 用于收集所有非置顶视频和图集的aweme_id
-            all_non_top_aweme_ids = []
-            
-            while has_more and not should_stop:
-                try:
-                    # 获取视频列表
-                    response = api.get_creator_video_list(
-                        sec_user_id=sec_user_id,
-                        count=count,
-                        max_cursor=max_cursor
-                    )
-                    
-                    if not response or not response.aweme_list:
-                        logger.info(f"未获取到更多视频数据，结束采集")
-                        break
-                    
-                    # 处理视频数据
-                    # 批量处理视频数据
-                    contents_to_update = []
-                    contents_to_create = []
-                    download_tasks = []
-                    
-                    # 检查是否有视频的aweme_id小于last_aweme_id
-                    for aweme in response.aweme_list:
-                        try:
-                            # 如果视频的aweme_id小于last_aweme_id且不是置顶视频，则结束采集
-                            if aweme.aweme_id < last_aweme_id and aweme.is_top != 1:
-                                logger.info(f"发现视频 {aweme.aweme_id} 小于last_aweme_id {last_aweme_id} 且不是置顶视频，结束采集")
-                                should_stop = True
-                                break
-                            
-                            # 如果不是置顶视频/图集，则收集aweme_id用于更新last_aweme_id
-                            if aweme.is_top != 1:
-                                all_non_top_aweme_ids.append(aweme.aweme_id)
-                            
-                            # 确定内容类型
-                            content_type = "image" if aweme.aweme_type == 68 else "video"
-                            
-                            # 检查内容是否已存在
-                            existing_content = db.query(DouyinContent).filter_by(aweme_id=aweme.aweme_id).first()
-                            
-                            if existing_content:
-                                # 更新内容统计数据
-                                existing_content.admire_count = aweme.statistics.admire_count
-                                existing_content.comment_count = aweme.statistics.comment_count
-                                existing_content.digg_count = aweme.statistics.digg_count
-                                existing_content.collect_count = aweme.statistics.collect_count
-                                existing_content.share_count = aweme.statistics.share_count
-                                
-                                # 如果是视频，还需要更新播放次数
-                                if content_type == "video":
-                                    existing_content.play_count = aweme.statistics.play_count
-                                
-                                contents_to_update.append(existing_content)
-                                continue
-                            
-                            # 准备新内容记录
-                            content = DouyinContent(
-                                creator_id=creator.id,
-                                aweme_id=aweme.aweme_id,
-                                desc=aweme.desc,
-                                group_id=aweme.group_id,
-                                create_time=aweme.create_time,
-                                is_top=aweme.is_top,
-                                content_type=content_type,
-                                
-                                # 统计信息
-                                admire_count=aweme.statistics.admire_count,
-                                comment_count=aweme.statistics.comment_count,
-                                digg_count=aweme.statistics.digg_count,
-                                collect_count=aweme.statistics.collect_count,
-                                share_count=aweme.statistics.share_count,
-                            )
-                            
-                            # 根据内容类型设置特定字段
-                            if content_type == "video":
-                                content.aweme_type = aweme.aweme_type
-                                content.media_type = aweme.media_type
-                                content.play_count = aweme.statistics.play_count
-                                content.duration = aweme.video.duration if aweme.video else None
-                                content.video_height = aweme.video.play_addr.height if aweme.video and aweme.video.play_addr else None
-                                content.video_width = aweme.video.play_addr.width if aweme.video and aweme.video.play_addr else None
-                            elif content_type == "image":
-                                content.images_count = len(aweme.images) if aweme.images else 0
-                                content.image_urls = [img.url_list[0] for img in aweme.images] if aweme.images else []
-                            content.tags = [{
-                                "tag_id": tag.tag_id,
-                                "tag_name": tag.tag_name,
-                                "level": tag.level
-                            } for tag in (aweme.video_tag or [])]
-                            
-                            # 保存内容记录并获取ID
-                            db.add(content)
-                            try:
-                                db.flush()
-                                db.refresh(content)
-                                # logger.info(f"成功创建内容记录，ID: {content.id}, 类型: {content_type}")
-                                
-                                # 添加到批量创建列表
-                                contents_to_create.append(content)
-                                
-                                # 创建下载任务
-                                if content_type == "video":
-                                    # 获取视频URL列表
-                                    video_urls = []
-                                    if aweme.video and aweme.video.play_addr and aweme.video.play_addr.url_list:
-                                        video_urls.extend(aweme.video.play_addr.url_list)
-                                    
-                                    # 获取封面URL列表
-                                    cover_urls = []
-                                    if aweme.video:
-                                        if aweme.video.dynamic_cover and aweme.video.dynamic_cover.url_list:
-                                            cover_urls.append(CoverUrls(cover_type='dynamic_cover', url=aweme.video.dynamic_cover.url_list))
-                                        if aweme.video.cover and aweme.video.cover.url_list:
-                                            cover_urls.append(CoverUrls(cover_type='cover', url=aweme.video.cover.url_list))
-                                        if aweme.video.origin_cover and aweme.video.origin_cover.url_list:
-                                            cover_urls.append(CoverUrls(cover_type='origin_cover', url=aweme.video.origin_cover.url_list))
-                                    
-                                    download_tasks.append(DownloadTask(
-                                        sec_user_id=sec_user_id,
-                                        aweme_id=aweme.aweme_id,
-                                        image_urls=[],
-                                        video_urls=video_urls,
-                                        cover_urls=cover_urls,
-                                        content_id=content.id
-                                    ))
-                                elif content_type == "image" and aweme.images:
-                                    download_tasks.append(DownloadTask(
-                                        sec_user_id=sec_user_id,
-                                        aweme_id=aweme.aweme_id,
-                                        image_urls=[img.url_list[0] for img in aweme.images],
-                                        video_urls=[],
-                                        cover_urls=[],
-                                        content_id=content.id
-                                    ))
-                                    # logger.info(f"已创建图集 {aweme.aweme_id} 的下载任务，content_id: {content.id}")
-                            except Exception as e:
-                                logger.error(f"保存内容记录失败: {str(e)}")
-                                db.rollback()
-                                continue
-                            
-                        except Exception as e:
-                            logger.error(f"处理数据失败: {str(e)}")
-                            continue
-                    
-                    try:
-                        # 批量更新现有记录
-                        if contents_to_update:
-                            db.bulk_save_objects(contents_to_update)
-                        
-                        # 批量创建新记录
-                        if contents_to_create:
-                            db.add_all(contents_to_create)
-                            
-                        # 提交所有更改
-                        db.commit()
-                            
-                        logger.info(f"成功批量保存 {len(contents_to_create)} 个新内容，更新 {len(contents_to_update)} 个现有内容")
-                        
-                        # 使用并发下载资源
-                        if download_tasks:
-                            try:
-                                # 初始化下载管理器
-                                downloader = DownloadManager(max_workers=3)
-                                
-                                download_results = downloader.batch_download_videos_with_db(db, download_tasks)
-                                logger.info(f"批量下载结果: 成功={len(download_results['success'])}, 失败={len(download_results['failed'])}")
-                                if download_results['failed']:
-                                    logger.warning(f"以下内容下载失败: {download_results['failed']}")
-                                
-                                # 提交下载记录
-                                db.commit()
-                            except Exception as e:
-                                logger.error(f"下载任务执行失败: {str(e)}")
-                                db.rollback()
-                        
-                    except Exception as e:
-                        logger.error(f"批量保存数据失败: {str(e)}")
-                        db.rollback()
-                    
-                    # 更新分页信息
-                    has_more = response.has_more == 1
-                    max_cursor = response.max_cursor
-                    logger.info(f"分页信息: has_more={has_more}, max_cursor={max_cursor}")
-                    
-                    # 如果应该停止采集，则跳出循环
-                    if should_stop:
-                        break
-                    
-                    # 添加延时，避免请求过快
-                    time.sleep(2)
-                    
-                except Exception as e:
-                    logger.error(f"获取列表失败: {str(e)}")
-                    break
-            
-            # 更新创作者的last_aweme_id
-            if all_non_top_aweme_ids:
-                max_aweme_id = max(all_non_top_aweme_ids)
-                if max_aweme_id > last_aweme_id:
-                    creator.last_aweme_id = max_aweme_id
-                    db.commit()
-                    logger.info(f"已更新创作者 {sec_user_id} 的last_aweme_id为 {max_aweme_id}")
-            
-            logger.info(f"创作者 {sec_user_id} 的数据采集完成")
+            stats = _collect_creator(db, TikTokApi(cookie=saved_cookie), creator, DownloadManager())
+            logger.info(f"创作者 {sec_user_id} 的数据采集完成: {stats}")
             
     except Exception as e:
         logger.error(f"采集创作者 {sec_user_id} 的视频数据失败: {str(e)}")
         raise
 
 
-async def collect_creator_info():
-    """采集抖音创作者信息"""
-    logger.info(f"开始采集创作者信息")
-    
+_cookie_budgets: dict = {}
+_cookie_budgets_lock = threading.Lock()
+
+
+def _get_cookie_budget(cookie: str) -> threading.Semaphore:
+    """同一个 Cookie 同时采集的创作者数上限（与限速器一样按 Cookie 共享）"""
+    key = pacer_key(cookie)
+    with _cookie_budgets_lock:
+        budget = _cookie_budgets.get(key)
+        if budget is None:
+            budget = _cookie_budgets[key] = threading.Semaphore(FLEET_PER_COOKIE_CONCURRENCY)
+        return budget
+
 
+def _collect_fleet_member(creator_id: int, cookie: str, downloader: DownloadManager) -> dict:
+    """在独立的数据库会话中采集一个创作者，受 Cookie 并发预算约束"""
+    with _get_cookie_budget(cookie):
+        with get_db_context() as db:
+            creator = db.query(DouyinCreator).filter_by(id=creator_id).first()
+            if not creator:
+                raise ValueError(f"创作者 {creator_id} 不存在")
+            return _collect_creator(db, TikTokApi(cookie=cookie), creator, downloader)
+
+
+def collect_all_creator_videos():
+    """批量采集所有开启自动更新的抖音创作者的视频数据"""
     context = get_task_context()
     if not context:
         raise ValueError("未找到任务上下文")
-
+    
     user_id = context.get('user_id')
     if not user_id:
         raise ValueError("未提供user_id参数")
-
+    
     with get_db_context() as db:
         saved_cookie = get_douyin_cookie(db, user_id)
         if not saved_cookie:
             raise ValueError("未找到保存的Cookie")
+        creators = [
+            (creator.id, creator.sec_user_id, creator.nickname)
+            for creator in db.query(DouyinCreator).filter(
+                DouyinCreator.status == 1, DouyinCreator.auto_update == 1
+            ).all()
+        ]
+    
+    total = len(creators)
+    # 所有创作者共用一个Cookie，超出该Cookie并发预算的线程只会阻塞等待
+    workers = max(FLEET_PER_COOKIE_CONCURRENCY, 1)
+    logger.info(f"开始批量采集 {total} 个创作者，并发数={workers}，单Cookie并发数={FLEET_PER_COOKIE_CONCURRENCY}")
+    
+    # 下载由下载队列线程池统一处理，这里只用来生成文件路径
+    downloader = DownloadManager()
+    started = time.monotonic()
+    summary = {"creators": total, "succeeded": 0, "failed": 0,
+               "pages": 0, "created": 0, "updated": 0, "queued": 0}
+    
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="douyin-fleet") as executor:
+        futures = {
+            executor.submit(_collect_fleet_member, creator_id, saved_cookie, downloader): (sec_user_id, nickname)
+            for creator_id, sec_user_id, nickname in creators
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            sec_user_id, nickname = futures[future]
+            try:
+                stats = future.result()
+            except Exception as e:
+                summary["failed"] += 1
+                logger.error(f"[{done}/{total}] 采集创作者 {nickname}({sec_user_id}) 失败: {str(e)}")
+                continue
             
+            summary["succeeded"] += 1
+            for key in ("pages", "created", "updated", "queued"):
+                summary[key] += stats[key]
+            elapsed = time.monotonic() - started
+            logger.info(
+                f"[{done}/{total}] 创作者 {nickname} 采集完成: 页数={stats['pages']}, 新增={stats['created']}, "
+                f"更新={stats['updated']}, 入队={stats['queued']}, 耗时={stats['elapsed']}秒 | "
+                f"累计 {summary['pages'] / elapsed * 60:.1f}页/分钟, {summary['created'] / elapsed * 60:.1f}新作品/分钟"
+            )
+    
+    summary["elapsed"] = round(time.monotonic() - started, 2)
+    logger.info(f"批量采集完成: {summary}")
+    return summary
+
+
+def recount_creator_counters_task():
+    """按作品表和文件表重新统计所有创作者的视频/图集数和已下载文件数"""
+    with get_db_context() as db:
+        updated = recount_creator_counters(db)
+    logger.info(f"创作者计数重新统计完成: {updated} 个创作者")
+    return updated
+
+
+def prune_content_store():
+    """清理内容寻址存储中已没有任何下载路径引用的文件"""
+    store = get_content_store(DownloadManager().base_path)
+    if store is None:
+        logger.info("未开启内容寻址存储，跳过清理")
+        return 0
+    removed = store.prune()
+    logger.info(f"内容寻址存储清理完成: 删除 {removed} 个文件")
+    return removed
+
+
+def _creator_info_values(user) -> dict:
+    """从接口返回的用户信息中取出需要保存到 douyin_creators 的字段"""
+    return {
+        "nickname": user.nickname,
+        "avatar_url": user.avatar_larger.url_list[0] if user.avatar_larger and user.avatar_larger.url_list else None,
+        "unique_id": user.unique_id,
+        "signature": user.signature,
+        "ip_location": user.ip_location,
+        "gender": user.gender,
+        "follower_count": user.follower_count,
+        "following_count": user.following_count,
+        "aweme_count": user.aweme_count,
+        "total_favorited": user.total_favorited,
+    }
+
+
+def _load_auto_update_creators(user_id: int):
+    """读取Cookie和所有需要自动更新的创作者当前信息"""
+    with get_db_context() as db:
+        saved_cookie = get_douyin_cookie(db, user_id)
+        if not saved_cookie:
+            raise ValueError("未找到保存的Cookie")
+        creators = db.query(
+            DouyinCreator.id,
+            DouyinCreator.sec_user_id,
+            *[getattr(DouyinCreator, field) for field in CREATOR_INFO_FIELDS]
+        ).filter(DouyinCreator.status == 1, DouyinCreator.auto_update == 1).all()
+        return saved_cookie, [creator._asdict() for creator in creators]
+
+
+def _bulk_update_creators(rows: list) -> None:
+    """按主键批量更新创作者信息"""
+    with get_db_context() as db:
+        db.execute(update(DouyinCreator), rows)
+        db.commit()
+
+
+async def collect_creator_info():
+    """采集抖音创作者信息"""
+    logger.info(f"开始采集创作者信息")
+    
+    context = get_task_context()
+    if not context:
+        raise ValueError("未找到任务上下文")
+
+    user_id = context.get('user_id')
+    if not user_id:
+        raise ValueError("未提供user_id参数")
+
     try:
-        creators = db.query(DouyinCreator).filter(DouyinCreator.status == 1, DouyinCreator.auto_update == 1).all()
-        # 初始化API客户端
-        api = TikTokApi(cookie=saved_cookie)
-        for creator in creators:
-            sec_user_id = creator.sec_user_id
-            # 获取创作者信息
-            creator_info = api.get_user_info(sec_user_id=sec_user_id)
-            if creator_info:
-                # 更新创作者信息
-                creator.nickname = creator_info.user.nickname
-                creator.avatar_url = creator_info.user.avatar_larger.url_list[0]
-                creator.unique_id = creator_info.user.unique_id
-                creator.signature = creator_info.user.signature
-                creator.ip_location = creator_info.user.ip_location
-                creator.gender = creator_info.user.gender
-                creator.follower_count = creator_info.user.follower_count
-                creator.following_count = creator_info.user.following_count
-                creator.aweme_count = creator_info.user.aweme_count
-                creator.total_favorited = creator_info.user.total_favorited
-                db.commit()
-                logger.info(f"已更新创作者 {sec_user_id} 的信息")
-            else:
-                logger.error(f"获取创作者 {sec_user_id} 的信息失败")
+        # 数据库读写放到线程中执行，避免阻塞事件循环
+        saved_cookie, creators = await asyncio.to_thread(_load_auto_update_creators, user_id)
+        
+        api = AsyncTikTokApi(cookie=saved_cookie)
+        semaphore = asyncio.Semaphore(CREATOR_INFO_CONCURRENCY)
+        
+        async def fetch(sec_user_id: str):
+            async with semaphore:
+                try:
+                    return await api.get_user_info(sec_user_id=sec_user_id)
+                except Exception as e:
+                    logger.error(f"获取创作者 {sec_user_id} 的信息失败: {str(e)}")
+                    return None
+        
+        started = time.monotonic()
+        creator_infos = await asyncio.gather(*(fetch(creator["sec_user_id"]) for creator in creators))
+        
+        # 只更新信息有变化的创作者，一次批量UPDATE写入
+        rows = []
+        failed = 0
+        for creator, creator_info in zip(creators, creator_infos):
+            if not creator_info or not creator_info.user:
+                failed += 1
+                logger.error(f"获取创作者 {creator['sec_user_id']} 的信息失败")
+                continue
+            values = _creator_info_values(creator_info.user)
+            if any(creator[field] != value for field, value in values.items()):
+                rows.append({"id": creator["id"], **values})
+        
+        if rows:
+            await asyncio.to_thread(_bulk_update_creators, rows)
+        logger.info(
+            f"已刷新 {len(creators)} 个创作者的信息: 有变化={len(rows)}, 失败={failed}, "
+            f"耗时={time.monotonic() - started:.2f}秒"
+        )
             
     except Exception as e:
         logger.error(f"采集创作者信息失败: {str(e)}")
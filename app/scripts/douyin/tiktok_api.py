@@ -2,14 +2,25 @@ from app.scripts.douyin import schemas
 from app.scripts.douyin.abogus import ABogus
 from app.scripts.douyin.data_schemas import Creator, following, hot_list, video_info, fetch_one_video, me_following
 from app.scripts.douyin.urls import Urls
+from app.scripts.douyin.pacer import get_pacer
 from app.services.douyin import get_douyin_cookie
 from app.db.session import get_db
 from fastapi import Depends
 
-from urllib.parse import quote
+from urllib.parse import quote, urljoin, urlparse
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import aiohttp
+import asyncio
+import http.cookiejar
+import json
 import requests
+import threading
+import logging
 import re
 
+logger = logging.getLogger(__name__)
+
 
 douyin_headers = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.4430.212 Safari/537.36',
@@ -18,12 +29,60 @@ douyin_headers = {
     # 'Cookie': constant.COOKIE,
 }
 
+# a_bogus 签名器无请求级状态，全进程复用一个实例
+_abogus = ABogus()
+
+# 连接/读取超时（秒）
+REQUEST_TIMEOUT = (5, 15)
+# 连接池大小与失败重试次数；429 不在这里重试，交给限速器退避
+POOL_MAXSIZE = 20
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.5
+RETRY_STATUS = (500, 502, 503, 504)
+
+# 分享短链解析：最多跟随的重定向次数、请求头，以及到达目标页面的路径特征
+MAX_SHARE_REDIRECTS = 10
+SHARE_HEADERS = {"Content-Type": "application/json"}
+SHARE_TARGET_PATTERN = re.compile(r"/(user|video|note)/")
+
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """获取进程内共享的 requests 会话
+
+    所有 TikTokApi 实例共用一个带连接池的会话，保持与 douyin.com 的长连接，
+    避免每次请求重新建立 TCP+TLS 连接。Cookie 等请求头由各实例在请求时传入，
+    会话不保存响应的 Set-Cookie，一个用户的 Cookie 不会混入其他用户的请求。
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                retry = Retry(
+                    total=MAX_RETRIES,
+                    backoff_factor=RETRY_BACKOFF,
+                    status_forcelist=RETRY_STATUS,
+                    allowed_methods=("GET", "HEAD"),
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_MAXSIZE, max_retries=retry)
+                session = requests.Session()
+                session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
 
 class TikTokApi:
 
     def __init__(self, cookie: str = None):
         self.urls = Urls()
         self.headers = douyin_headers.copy()
+        self.session = get_http_session()
+        self.pacer = get_pacer(cookie)
         
         if cookie:
             self.headers["Cookie"] = cookie
@@ -31,30 +90,21 @@ class TikTokApi:
 
     def get_user_info(self, sec_user_id) -> Creator.Base | None:
         params = schemas.Profile(sec_user_id=sec_user_id)
-        params_dict = params.model_dump()
-        params_dict["a_bogus"] = self.get_abogus(params_dict)
-        url = self.urls.USER_DETAIL + self.dict_to_url_params(params_dict)
-        res = requests.get(url=url, headers=self.headers)  # 使用实例的headers而不是全局headers
+        res = self.get(self.urls.USER_DETAIL, params)
         if res.status_code == 200 and res.text != "":
             return Creator.Base(**res.json())
         return None
     
     def get_user_short_info(self):
         params = schemas.UserShortInfo()
-        params_dict = params.model_dump()
-        params_dict["a_bogus"] = self.get_abogus(params_dict)
-        url = self.urls.USER_SHORT_INFO + self.dict_to_url_params(params_dict)
-        res = requests.get(url=url, headers=self.headers)
+        res = self.get(self.urls.USER_SHORT_INFO, params)
         print(res.json())
         # return UserShortInfo.Base(**res.json())
 
 
     def get_me_following_list(self, count: int = 50, max_time: int = 0, min_time: int = 0) -> me_following.Base | None:
         params = schemas.FollowingList(count=count, max_time=max_time, min_time=min_time)
-        params_dict = params.model_dump()
-        params_dict["a_bogus"] = self.get_abogus(params_dict)
-        url = self.urls.FOLLOWING_LIST + self.dict_to_url_params(params_dict)
-        res = requests.get(url=url, headers=self.headers)
+        res = self.get(self.urls.FOLLOWING_LIST, params)
         # with open("following_list.json", "w", encoding="utf-8") as f:
         #     f.write(res.text)
         return me_following.Base(**res.json())
@@ -81,29 +131,70 @@ class TikTokApi:
     def get_creator_video_list(self, sec_user_id: str, count: int = 20, max_cursor: int = 0):
         params = schemas.CreatorVideoList(
             sec_user_id=sec_user_id, count=count, max_cursor=max_cursor)
-        res = self.get(self.urls.USER_POST, params)
-        if res.status_code == 200 and res.text != "":
-            # print(res.text)
-            return video_info.Base(**res.json())
-        return None
+        data = self.get_json(self.urls.USER_POST, params)
+        return video_info.Base(**data) if data else None
 
     def get(self, url, params):
+        return self._request(url, params)[0]
+
+    def get_json(self, url, params) -> dict | None:
+        """请求签名后的接口，返回 JSON；被限流（空响应、验证码等）或响应体不是 JSON 时返回 None"""
+        res, ok = self._request(url, params)
+        if not ok:
+            return None
+        try:
+            return res.json()
+        except ValueError:
+            logger.warning(f"接口返回的不是 JSON: {res.text[:100]}")
+            return None
+
+    def _request(self, url, params) -> tuple:
+        """按限速器的节奏发送请求并记录结果，返回 (响应, 响应是否正常)"""
+        new_url = self.build_url(url, params)
+        self.pacer.wait()
+        try:
+            res = self.session.get(url=new_url, headers=self.headers, timeout=REQUEST_TIMEOUT)
+        except requests.RequestException:
+            self.pacer.record_failure()
+            raise
+        return res, self.pacer.record(res.status_code, res.text, res.headers)
+
+    @classmethod
+    def build_url(cls, url, params) -> str:
+        """拼接请求参数并附加 a_bogus 签名"""
         params_dict = params.model_dump()
-        params_dict["a_bogus"] = self.get_abogus(params_dict)
-        new_url = url + self.dict_to_url_params(params_dict)
-        res = requests.get(url=new_url, headers=self.headers, timeout=10)
-        return res
+        params_dict["a_bogus"] = cls.get_abogus(params_dict)
+        return url + cls.dict_to_url_params(params_dict)
 
     def get_aweme_id(self, share_url: str):
-        r = requests.get(share_url, headers={
-                         "Content-Type": "application/json"})
-        reditList = r.history  # 可以看出获取的是一个地址序列
-        # print(f'获取重定向的历史记录：{reditList}')
-        # print(f'获取第一次重定向的headers头部信息：{reditList[0].headers}')
-        if len(reditList) > 0:
-            url = reditList[len(reditList)-1].headers["location"]
-        else:
-            url = share_url
+        return self.parse_aweme_id(self.resolve_share_url(share_url))
+
+    def get_sec_user_id(self, share_url: str):
+        return self.parse_sec_user_id(self.resolve_share_url(share_url))
+
+    def resolve_share_url(self, share_url: str) -> str:
+        """跟随分享链接的重定向，返回目标地址
+
+        只用 HEAD 请求逐跳读取 Location，到达用户/作品页面即停止，不下载任何页面内容。
+        """
+        url = share_url
+        for _ in range(MAX_SHARE_REDIRECTS):
+            res = self.session.head(url, headers=SHARE_HEADERS, allow_redirects=False, timeout=REQUEST_TIMEOUT)
+            if res.status_code in (405, 501):
+                # 不支持 HEAD 时退回 GET，但只读响应头
+                res = self.session.get(url, headers=SHARE_HEADERS, allow_redirects=False,
+                                       stream=True, timeout=REQUEST_TIMEOUT)
+                res.close()
+            location = res.headers.get("location")
+            if not res.is_redirect or not location:
+                break
+            url = urljoin(url, location)
+            if SHARE_TARGET_PATTERN.search(urlparse(url).path):
+                break
+        return url
+
+    @staticmethod
+    def parse_aweme_id(url: str):
         video_pattern = re.compile(r"video/([^/?]*)")
         note_pattern = re.compile(r"note/([^/?]*)")
         match = video_pattern.search(str(url))
@@ -118,16 +209,8 @@ class TikTokApi:
         return 0
         # print(f'获取重定向最终的url：{reditList[len(reditList)-1].headers["location"]}')
 
-    def get_sec_user_id(self, share_url: str):
-        r = requests.get(share_url, headers={
-                         "Content-Type": "application/json"})
-        reditList = r.history  # 可以看出获取的是一个地址序列
-        # print(f'获取重定向的历史记录：{reditList}')
-        # print(f'获取第一次重定向的headers头部信息：{reditList[0].headers}')
-        if len(reditList) > 0:
-            url = reditList[len(reditList)-1].headers["location"]
-        else:
-            url = share_url
+    @staticmethod
+    def parse_sec_user_id(url: str):
         pattern = re.compile(r"user/([^/?]*)")
         match = pattern.search(str(url))
         if match:
@@ -144,17 +227,16 @@ class TikTokApi:
 
     @staticmethod
     def get_abogus(url_params: dict):
-        bogus = ABogus()
         # USERAGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.4430.212 Safari/537.36"
         # print(f"URL参数: {url_params}")
-        a_bogus = bogus.get_value(url_params, )
+        a_bogus = _abogus.get_value(url_params, )
         # 使用url编码a_bogus
         a_bogus = quote(a_bogus, safe='')
         return a_bogus
 
     @staticmethod
     def get_info_from_url(url, pattern):
-        response = requests.get(url, allow_redirects=True)
+        response = get_http_session().get(url, allow_redirects=True, timeout=REQUEST_TIMEOUT)
         if response.status_code in {200, 444}:
             match = pattern.search(response.url)
             if match:
@@ -172,6 +254,138 @@ class TikTokApi:
         url_params = "&".join(params_list)
 
         return url_params
+
+
+# 每个事件循环各用一个 aiohttp 会话（会话不能跨事件循环使用）
+_async_sessions: dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+_async_sessions_lock = threading.Lock()
+
+
+async def get_async_http_session() -> aiohttp.ClientSession:
+    """获取当前事件循环共享的 aiohttp 会话（带连接池），不保存响应的 Set-Cookie，Cookie 只取自各请求的请求头
+
+    已关闭的事件循环留下的会话在这里释放连接池，不会泄漏连接或产生 "Unclosed client session" 警告。
+    """
+    loop = asyncio.get_running_loop()
+    with _async_sessions_lock:
+        for stale_loop in [other for other in _async_sessions if other.is_closed()]:
+            stale_session = _async_sessions.pop(stale_loop)
+            if not stale_session.closed:
+                # 事件循环已关闭，不能再 await close()，直接关闭连接池
+                stale_session.connector.close()
+        session = _async_sessions.get(loop)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(limit=POOL_MAXSIZE, limit_per_host=POOL_MAXSIZE, ttl_dns_cache=300)
+            session = _async_sessions[loop] = aiohttp.ClientSession(
+                connector=connector,
+                cookie_jar=aiohttp.DummyCookieJar(),
+                timeout=aiohttp.ClientTimeout(total=sum(REQUEST_TIMEOUT), connect=REQUEST_TIMEOUT[0]),
+            )
+    return session
+
+
+async def close_async_http_session():
+    """关闭当前事件循环的共享 aiohttp 会话，应用退出时调用"""
+    with _async_sessions_lock:
+        session = _async_sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.closed:
+        await session.close()
+
+
+class AsyncTikTokApi:
+    """TikTokApi 的异步版本，供 API 层在事件循环中直接调用"""
+
+    def __init__(self, cookie: str = None):
+        self.urls = Urls()
+        self.headers = douyin_headers.copy()
+        self.pacer = get_pacer(cookie)
+
+        if cookie:
+            self.headers["Cookie"] = cookie
+
+    async def request(self, url: str, allow_redirects: bool = True, method: str = "GET", headers: dict = None):
+        """发送请求，连接错误、超时和 5xx 时按指数退避重试（429 交给限速器退避）
+
+        Returns:
+            (状态码, 响应文本, 最终地址, 响应头)
+        """
+        session = await get_async_http_session()
+        last_error = None
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                async with session.request(method, url, headers=headers or self.headers,
+                                           allow_redirects=allow_redirects) as res:
+                    text = await res.text()
+                    if res.status not in RETRY_STATUS or attempt == MAX_RETRIES:
+                        return res.status, text, str(res.url), res.headers
+                    last_error = f"状态码: {res.status}"
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                last_error = str(e) or e.__class__.__name__
+                if attempt == MAX_RETRIES:
+                    raise
+            logger.warning(f"请求失败，准备重试({attempt + 1}/{MAX_RETRIES}): {url} {last_error}")
+            await asyncio.sleep(RETRY_BACKOFF * (2 ** attempt))
+
+    async def get_json(self, url, params) -> dict | None:
+        """请求签名后的接口，返回 JSON，响应为空或状态码非 200 时返回 None"""
+        await self.pacer.async_wait()
+        try:
+            status, text, _, headers = await self.request(TikTokApi.build_url(url, params))
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self.pacer.record_failure()
+            raise
+        if self.pacer.record(status, text, headers):
+            return json.loads(text)
+        return None
+
+    async def get_user_info(self, sec_user_id) -> Creator.Base | None:
+        data = await self.get_json(self.urls.USER_DETAIL, schemas.Profile(sec_user_id=sec_user_id))
+        return Creator.Base(**data) if data else None
+
+    async def get_me_following_list(self, count: int = 50, max_time: int = 0, min_time: int = 0) -> me_following.Base | None:
+        params = schemas.FollowingList(count=count, max_time=max_time, min_time=min_time)
+        data = await self.get_json(self.urls.FOLLOWING_LIST, params)
+        return me_following.Base(**data) if data else None
+
+    async def get_following_list(self, sec_user_id, user_id, offset: int = 0, count: int = 20):
+        params = schemas.Following(
+            sec_user_id=sec_user_id, user_id=user_id, offset=offset, count=count)
+        data = await self.get_json(self.urls.FOLLOWING, params)
+        return following.Base(**data) if data else None
+
+    async def get_creator_video_list(self, sec_user_id: str, count: int = 20, max_cursor: int = 0):
+        params = schemas.CreatorVideoList(
+            sec_user_id=sec_user_id, count=count, max_cursor=max_cursor)
+        data = await self.get_json(self.urls.USER_POST, params)
+        return video_info.Base(**data) if data else None
+
+    async def fetch_one_video(self, aweme_id: str) -> fetch_one_video.Base | None:
+        data = await self.get_json(self.urls.POST_DETAIL, schemas.FetchOneVideo(aweme_id=aweme_id))
+        return fetch_one_video.Base(**data) if data else None
+
+    async def resolve_share_url(self, share_url: str) -> str:
+        """跟随分享链接的重定向，返回目标地址（仅 HEAD，不下载页面内容）"""
+        session = await get_async_http_session()
+        url = share_url
+        for _ in range(MAX_SHARE_REDIRECTS):
+            async with session.head(url, headers=SHARE_HEADERS, allow_redirects=False) as res:
+                status, location = res.status, res.headers.get("location")
+            if status in (405, 501):
+                # 不支持 HEAD 时退回 GET，但只读响应头
+                async with session.get(url, headers=SHARE_HEADERS, allow_redirects=False) as res:
+                    status, location = res.status, res.headers.get("location")
+            if status not in (301, 302, 303, 307, 308) or not location:
+                break
+            url = urljoin(url, location)
+            if SHARE_TARGET_PATTERN.search(urlparse(url).path):
+                break
+        return url
+
+    async def get_aweme_id(self, share_url: str):
+        return TikTokApi.parse_aweme_id(await self.resolve_share_url(share_url))
+
+    async def get_sec_user_id(self, share_url: str):
+        return TikTokApi.parse_sec_user_id(await self.resolve_share_url(share_url))
     
     
 if __name__ == "__main__":
@@ -0,0 +1,28 @@
+import os
+import sys
+import asyncio
+
+import pytest
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from fastapi import HTTPException
+from starlette.requests import Request
+from app.main import http_exception_handler
+from app.models.douyin import DouyinContentFile
+from app.api.v1.endpoints.douyin import _ensure_local_file, QUEUED_FILE_RETRY_AFTER
+
+
+@pytest.mark.parametrize("status", ["pending", "downloading"])
+def test_queued_file_returns_retryable_503(tmp_path, status):
+    """仍在下载队列中的文件返回 503 + Retry-After，媒体标签不会把 JSON 当作文件内容"""
+    file_record = DouyinContentFile(file_path=str(tmp_path / "missing.mp4"), download_status=status)
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(_ensure_local_file(None, file_record))
+    assert exc_info.value.status_code == 503
+
+    request = Request({"type": "http", "method": "GET", "path": "/", "headers": []})
+    response = asyncio.run(http_exception_handler(request, exc_info.value))
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(QUEUED_FILE_RETRY_AFTER)
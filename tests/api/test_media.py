@@ -0,0 +1,92 @@
+import os
+import sys
+import asyncio
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from app.core.media import MediaFileResponse, parse_range_header
+
+
+def _call(response, range_header=None, extensions=None, headers=None):
+    """直接以 ASGI 方式调用响应，返回 (状态码, 响应头, 响应体, 发送的消息)"""
+    request_headers = dict(headers or {})
+    if range_header:
+        request_headers["range"] = range_header
+    scope = {"type": "http", "method": "GET", "extensions": extensions or {},
+             "headers": [(name.encode(), value.encode()) for name, value in request_headers.items()]}
+    messages = []
+
+    async def receive():
+        return {"type": "http.request"}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(response(scope, receive, send))
+    start = messages[0]
+    body = b"".join(message.get("body", b"") for message in messages[1:])
+    return start["status"], {k.decode(): v.decode() for k, v in start["headers"]}, body, messages
+
+
+def test_parse_range_header():
+    assert parse_range_header("bytes=0-99", 1000) == [(0, 99)]
+    assert parse_range_header("bytes=900-", 1000) == [(900, 999)]
+    assert parse_range_header("bytes=-100", 1000) == [(900, 999)]
+    assert parse_range_header("bytes=0-9,5-19,100-109", 1000) == [(0, 19), (100, 109)], "重叠的范围应合并"
+    assert parse_range_header("bytes=1000-", 1000) == [], "超出文件大小的范围无法满足"
+    assert parse_range_header("bytes=5-1", 1000) is None, "无效的范围忽略 Range"
+    assert parse_range_header("items=0-1", 1000) is None
+
+
+def test_media_file_response_ranges(tmp_path):
+    data = bytes(range(256)) * 40
+    path = str(tmp_path / "video.mp4")
+    with open(path, "wb") as f:
+        f.write(data)
+    
+    status, headers, body, _ = _call(MediaFileResponse(path, media_type="video/mp4"))
+    assert (status, body, headers["accept-ranges"]) == (200, data, "bytes")
+    
+    status, headers, body, _ = _call(MediaFileResponse(path, media_type="video/mp4"), "bytes=-10")
+    assert (status, body) == (206, data[-10:])
+    assert headers["content-range"] == f"bytes {len(data) - 10}-{len(data) - 1}/{len(data)}"
+    
+    status, headers, body, _ = _call(MediaFileResponse(path, media_type="video/mp4"), f"bytes={len(data)}-")
+    assert (status, headers["content-range"]) == (416, f"bytes */{len(data)}")
+    
+    status, headers, body, _ = _call(MediaFileResponse(path, media_type="video/mp4"), "bytes=0-1,10-11")
+    assert status == 206 and headers["content-type"].startswith("multipart/byteranges")
+    assert int(headers["content-length"]) == len(body)
+    assert b"Content-Range: bytes 0-1/" in body and data[10:12] in body
+    
+    # 服务器支持 pathsend 时完整文件交给服务器发送
+    _, _, _, messages = _call(MediaFileResponse(path, media_type="video/mp4"),
+                              extensions={"http.response.pathsend": {}})
+    assert messages[1] == {"type": "http.response.pathsend", "path": os.path.abspath(path)}
+
+
+def test_media_file_response_conditional(tmp_path):
+    path = str(tmp_path / "cover.jpg")
+    with open(path, "wb") as f:
+        f.write(b"cover" * 100)
+    
+    status, headers, _, _ = _call(MediaFileResponse(path, media_type="image/jpeg", file_hash="abc"))
+    assert headers["etag"] == '"abc"' and "immutable" in headers["cache-control"] and headers["last-modified"]
+    
+    # If-None-Match 命中时返回 304，不需要文件存在
+    response = MediaFileResponse(str(tmp_path / "missing.jpg"), media_type="image/jpeg", file_hash="abc")
+    status, headers, body, _ = _call(response, headers={"if-none-match": 'W/"xyz", "abc"'})
+    assert (status, body, headers["etag"]) == (304, b"", '"abc"')
+    
+    status, _, _, _ = _call(MediaFileResponse(path, media_type="image/jpeg"),
+                            headers={"if-modified-since": "Fri, 01 Jan 2100 00:00:00 GMT"})
+    assert status == 304
+    
+    # If-Range 与当前 ETag 不一致时忽略 Range
+    status, _, body, _ = _call(MediaFileResponse(path, media_type="image/jpeg", file_hash="abc"), "bytes=0-4",
+                               headers={"if-range": '"old"'})
+    assert (status, len(body)) == (200, 500)
+    status, _, body, _ = _call(MediaFileResponse(path, media_type="image/jpeg", file_hash="abc"), "bytes=0-4",
+                               headers={"if-range": '"abc"'})
+    assert (status, body) == (206, b"cover")
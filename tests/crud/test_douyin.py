@@ -5,6 +5,7 @@ import uuid
 from datetime import datetime
 from typing import List, Dict, Any
 from unittest import mock
+import pytest
 
 # 添加项目根目录到Python路径
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
@@ -14,7 +15,15 @@ from sqlalchemy.orm import sessionmaker
 from app.db.session import base_db
 from app.models.douyin import DouyinCreator, DouyinContent, DouyinContentFile, Base
 from app.schemas.douyin import DouyinContentCreate, DouyinContentFileCreate
-from app.crud.douyin import get_content, get_content_file
+from app.crud.douyin import (
+    get_content, get_content_file, upsert_content_stats, build_content_stats_upsert, bulk_insert_contents, get_content_ids_by_aweme_ids,
+    bulk_insert_content_metrics, get_content_metrics_rollup,
+    get_crawl_checkpoint, save_crawl_checkpoint, delete_crawl_checkpoint,
+    enqueue_content_files, claim_content_files, release_stale_claims, get_download_queue_stats,
+    get_content_files_by_aweme_ids, get_contents_page,
+    count_created_contents, count_downloaded_files, recount_creator_counters, delete_content,
+    create_content, create_contents_bulk
+)
 
 def create_test_db():
     """创建测试数据库引擎和会话工厂"""
@@ -356,11 +365,249 @@ def test_create_content_files_bulk():
         # 删除所有表
         Base.metadata.drop_all(bind=test_engine)
 
+def test_bulk_insert_and_upsert_content_stats():
+    """测试批量插入内容和批量更新统计数据"""
+    test_engine, TestingSessionLocal = create_test_db()
+    db = TestingSessionLocal()
+    
+    try:
+        creator = DouyinCreator(sec_user_id="test_user_id", nickname="测试用户", status=1)
+        db.add(creator)
+        db.commit()
+        
+        def row(aweme_id, digg_count):
+            return {
+                "creator_id": creator.id,
+                "aweme_id": aweme_id,
+                "content_type": "video",
+                "desc": "测试视频",
+                "admire_count": 0,
+                "comment_count": 1,
+                "digg_count": digg_count,
+                "collect_count": 0,
+                "share_count": 0,
+                "play_count": 0,
+                "tags": [{"tag_id": 1, "tag_name": "测试", "level": 1}],
+            }
+        
+        created = bulk_insert_contents(db, [row("1001", 10), row("1002", 20)])
+        db.commit()
+        assert set(created) == {"1001", "1002"}, "批量插入应返回新内容ID"
+        assert get_content_ids_by_aweme_ids(db, ["1001", "1002", "1003"]) == created
+        
+        upsert_content_stats(db, [row("1001", 11), row("1002", 22)])
+        db.commit()
+        
+        db.expire_all()
+        first = get_content(db, created["1001"])
+        second = get_content(db, created["1002"])
+        assert first.digg_count == 11, "统计数据应被更新"
+        assert second.digg_count == 22, "统计数据应被更新"
+        assert first.tags == [{"tag_id": 1, "tag_name": "测试", "level": 1}], "非统计字段不应变化"
+        assert db.query(DouyinContent).count() == 2, "upsert不应插入重复记录"
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=test_engine)
+
+def test_content_stats_upsert_mysql():
+    """测试 MySQL 的统计数据 upsert 语句可以编译，且只更新统计字段和更新时间"""
+    from sqlalchemy.dialects import mysql
+    rows = [{"creator_id": 1, "aweme_id": "1001", "content_type": "video", "digg_count": 10, "admire_count": 0,
+             "comment_count": 0, "collect_count": 0, "share_count": 0, "play_count": 0}]
+    sql = str(build_content_stats_upsert("mysql", rows).compile(dialect=mysql.dialect()))
+    update_clause = sql.split("ON DUPLICATE KEY UPDATE")[1]
+    assert "digg_count = VALUES(digg_count)" in update_clause
+    assert "updated_at = now()" in update_clause
+    assert "content_type" not in update_clause, "非统计字段不应被更新"
+
+def test_content_metrics_rollup():
+    """测试互动数据快照按时间桶汇总"""
+    test_engine, TestingSessionLocal = create_test_db()
+    db = TestingSessionLocal()
+    
+    try:
+        creator = DouyinCreator(sec_user_id="test_user_id", nickname="测试用户", status=1)
+        db.add(creator)
+        db.commit()
+        content = DouyinContent(creator_id=creator.id, aweme_id="2001", content_type="video")
+        db.add(content)
+        db.commit()
+        
+        def metric(ts, digg_count):
+            return {"content_id": content.id, "ts": ts, "admire_count": 0, "comment_count": 0,
+                    "digg_count": digg_count, "collect_count": 0, "share_count": 0, "play_count": 0}
+        
+        bulk_insert_content_metrics(db, [metric(0, 10), metric(3600, 15), metric(86400, 40), metric(2 * 86400 + 5, 100)])
+        db.commit()
+        
+        points = get_content_metrics_rollup(db, content.id, bucket_seconds=86400)
+        assert [point["ts"] for point in points] == [0, 86400, 2 * 86400], "应按天汇总"
+        assert [point["digg_count"] for point in points] == [15, 40, 100], "每个桶取最大值"
+        assert [point["digg_count_delta"] for point in points] == [0, 25, 60], "增量为相对上一个桶的差值"
+        
+        points = get_content_metrics_rollup(db, content.id, bucket_seconds=86400, start_ts=86400)
+        assert [point["ts"] for point in points] == [86400, 2 * 86400], "应支持时间范围过滤"
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=test_engine)
+
+def test_crawl_checkpoint():
+    """测试采集断点的保存、覆盖和删除"""
+    test_engine, TestingSessionLocal = create_test_db()
+    db = TestingSessionLocal()
+    
+    try:
+        creator = DouyinCreator(sec_user_id="test_user_id", nickname="测试用户", status=1)
+        db.add(creator)
+        db.commit()
+        
+        assert get_crawl_checkpoint(db, creator.id) is None, "初始不应有断点"
+        
+        save_crawl_checkpoint(db, creator.id, 100, 1, "0", "3001")
+        db.commit()
+        save_crawl_checkpoint(db, creator.id, 200, 2, "0", "3002")
+        db.commit()
+        
+        checkpoint = get_crawl_checkpoint(db, creator.id)
+        assert (checkpoint.max_cursor, checkpoint.pages_done, checkpoint.max_aweme_id) == (200, 2, "3002"), "断点应被覆盖"
+        
+        delete_crawl_checkpoint(db, creator.id)
+        db.commit()
+        assert get_crawl_checkpoint(db, creator.id) is None, "断点应被删除"
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=test_engine)
+
+def test_download_queue():
+    """测试下载队列的入队、按通道领取和中断放回"""
+    test_engine, TestingSessionLocal = create_test_db()
+    db = TestingSessionLocal()
+    
+    try:
+        creator = DouyinCreator(sec_user_id="test_user_id", nickname="测试用户", status=1)
+        db.add(creator)
+        db.commit()
+        content = DouyinContent(creator_id=creator.id, aweme_id="4001", content_type="image")
+        db.add(content)
+        db.commit()
+        
+        rows = [
+            {"content_id": content.id, "aweme_id": "4001", "file_type": "image", "file_index": index,
+             "file_path": f"/tmp/4001_{index}.jpg", "source_urls": [f"http://example.com/{index}.jpg"],
+             "priority": 0 if index == 1 else 1, "download_status": "pending", "retry_count": 0}
+            for index in range(1, 4)
+        ]
+        assert enqueue_content_files(db, rows) == 3, "应加入3个文件"
+        db.commit()
+        assert enqueue_content_files(db, rows) == 0, "已入队的文件应跳过"
+        grouped = get_content_files_by_aweme_ids(db, ["4001", "4002"], ["image"])
+        assert list(grouped) == ["4001"] and [f.file_index for f in grouped["4001"]] == [1, 2, 3]
+        
+        claimed = claim_content_files(db, 5, priority=0)
+        assert [f.file_index for f in claimed] == [1], "优先通道只领取首图"
+        claimed = claim_content_files(db, 1)
+        assert len(claimed) == 1, "应领取1个文件"
+        assert all(f.download_status == "downloading" and f.claim_token for f in claimed), "领取后应标记为下载中"
+        assert len(claim_content_files(db, 5)) == 1, "已领取的文件不应被重复领取"
+        assert get_download_queue_stats(db) == {"downloading": 3}
+        
+        assert release_stale_claims(db) == 3, "中断的下载应全部放回队列"
+        assert get_download_queue_stats(db) == {"pending": 3}
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=test_engine)
+
+def test_contents_keyset_pagination():
+    """测试作品列表按游标翻页与按偏移翻页的结果一致，排序字段为空的作品不会丢失"""
+    test_engine, TestingSessionLocal = create_test_db()
+    db = TestingSessionLocal()
+    
+    try:
+        creator = DouyinCreator(sec_user_id="test_user_id", nickname="测试用户", status=1)
+        db.add(creator)
+        db.commit()
+        for index in range(23):
+            db.add(DouyinContent(
+                creator_id=creator.id, aweme_id=f"5{index:03d}", content_type="video",
+                is_top=1 if index % 7 == 0 else 0, create_time=None if index % 5 == 0 else index % 4
+            ))
+        db.commit()
+        
+        for sort_desc in (True, False):
+            expected, _ = get_contents_page(db, creator.id, sort_by="create_time", sort_desc=sort_desc, limit=100)
+            paged, cursor = [], None
+            while True:
+                page, cursor = get_contents_page(db, creator.id, sort_by="create_time", sort_desc=sort_desc,
+                                                 limit=5, cursor=cursor)
+                paged.extend(page)
+                if cursor is None:
+                    break
+            assert [c.id for c in paged] == [c.id for c in expected], "游标翻页的结果应与一次查询一致"
+            assert len(paged) == 23
+        
+        _, cursor = get_contents_page(db, creator.id, sort_by="create_time", limit=5)
+        with pytest.raises(ValueError):
+            get_contents_page(db, creator.id, sort_by="digg_count", limit=5, cursor=cursor)
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=test_engine)
+
+def test_creator_counters():
+    """测试创作者计数的增量维护与重新统计结果一致"""
+    test_engine, TestingSessionLocal = create_test_db()
+    db = TestingSessionLocal()
+    
+    try:
+        creator = DouyinCreator(sec_user_id="test_user_id", nickname="测试用户", status=1)
+        db.add(creator)
+        db.commit()
+        rows = []
+        for index in range(6):
+            content_type = "image" if index % 3 == 0 else "video"
+            content = DouyinContent(creator_id=creator.id, aweme_id=f"6{index:03d}", content_type=content_type)
+            db.add(content)
+            db.flush()
+            rows.append({"content_type": content_type})
+            db.add(DouyinContentFile(
+                content_id=content.id, aweme_id=content.aweme_id, file_type="video", file_index=0,
+                file_size=100 * index, download_status="completed" if index % 2 else "pending"
+            ))
+        db.flush()
+        count_created_contents(db, creator.id, rows)
+        count_downloaded_files(db, db.query(DouyinContentFile).filter(DouyinContentFile.download_status == "completed").all())
+        db.commit()
+        
+        counters = lambda: (creator.video_count, creator.image_count, creator.downloaded_file_count, creator.downloaded_bytes)
+        assert counters() == (4, 2, 3, 900)
+        
+        delete_content(db, db.query(DouyinContent).filter(DouyinContent.aweme_id == "6001").one().id)
+        db.refresh(creator)
+        assert counters() == (3, 2, 2, 800), "删除作品应同时减去其已下载的文件"
+        
+        create_content(db, DouyinContentCreate(aweme_id="6100", creator_id=creator.id, content_type="video"))
+        create_contents_bulk(db, [
+            DouyinContentCreate(aweme_id="6101", creator_id=creator.id, content_type="image"),
+            DouyinContentCreate(aweme_id="6102", creator_id=creator.id, content_type="video"),
+            DouyinContentCreate(aweme_id="6100", creator_id=creator.id, content_type="video"),
+        ])
+        db.refresh(creator)
+        assert counters() == (5, 3, 2, 800), "单条和批量创建作品都应计入创作者，已存在的作品不重复计数"
+        
+        assert recount_creator_counters(db) == 1
+        db.refresh(creator)
+        assert counters() == (5, 3, 2, 800), "重新统计的结果应与增量维护一致"
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=test_engine)
+
 if __name__ == "__main__":
     # 运行测试
     try:
         test_create_contents_bulk()
         test_create_content_files_bulk()
+        test_bulk_insert_and_upsert_content_stats()
+        test_content_metrics_rollup()
+        test_crawl_checkpoint()
         print("所有测试通过!")
     except Exception as e:
         print(f"测试失败: {str(e)}") 
\ No newline at end of file
@@ -0,0 +1,58 @@
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from app.scripts.douyin.content_store import ContentStore
+
+
+def _write(path: str, data: bytes) -> str:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def test_commit_deduplicates_and_prune_keeps_linked_blobs(tmp_path):
+    """相同内容只存一份，下载路径都是硬链接；没有下载路径引用的文件才会被清理"""
+    store = ContentStore(str(tmp_path / ".cas"))
+    first, second = str(tmp_path / "a" / "1.jpg"), str(tmp_path / "b" / "2.jpg")
+    for file_path in (first, second):
+        part_path = _write(f"{file_path}.part", b"same-bytes")
+        store.commit(part_path, file_path, "sha256:abcdef")
+        assert not os.path.exists(part_path)
+
+    assert os.path.samefile(first, second)
+    assert os.stat(store.blob_path("sha256:abcdef")).st_nlink == 3
+    assert store.prune() == 0
+
+    os.remove(first)
+    os.remove(second)
+    assert store.prune() == 1
+    assert not os.path.exists(store.blob_path("sha256:abcdef"))
+
+
+class _PruningStore(ContentStore):
+    """第一次链接前把存储中的文件删掉，模拟与 prune 的竞争"""
+
+    def link(self, file_hash: str, file_path: str) -> bool:
+        if not getattr(self, "pruned", False):
+            self.pruned = True
+            os.remove(self.blob_path(file_hash))
+        return super().link(file_hash, file_path)
+
+
+def test_commit_restores_blob_pruned_before_link(tmp_path):
+    """已有的文件在链接前被清理时，用临时文件重新放入存储"""
+    store = _PruningStore(str(tmp_path / ".cas"))
+    _write(store.blob_path("sha256:abcdef"), b"same-bytes")
+    file_path = str(tmp_path / "a" / "1.jpg")
+    part_path = _write(f"{file_path}.part", b"same-bytes")
+
+    store.commit(part_path, file_path, "sha256:abcdef")
+
+    assert not os.path.exists(part_path)
+    with open(file_path, "rb") as f:
+        assert f.read() == b"same-bytes"
+    assert os.path.samefile(file_path, store.blob_path("sha256:abcdef"))
@@ -0,0 +1,40 @@
+import os
+import sys
+from types import SimpleNamespace
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from app.scripts.douyin.download_policy import apply_download_policy, select_cover_file, DEFERRED_STATUS
+
+
+def _rows(file_types):
+    return [{"aweme_id": "1", "file_type": file_type, "file_index": 0, "download_status": "pending"}
+            for file_type in file_types]
+
+
+def test_only_best_cover_is_downloaded():
+    """只立即下载最优的一种封面，其余封面延迟下载"""
+    rows = apply_download_policy(_rows(["video", "cover", "origin_cover"]))
+    assert [row["download_status"] for row in rows] == ["pending", DEFERRED_STATUS, "pending"]
+    
+    rows = apply_download_policy(_rows(["dynamic_cover", "cover", "origin_cover"]))
+    assert [row["download_status"] for row in rows] == ["pending", DEFERRED_STATUS, DEFERRED_STATUS]
+
+
+def test_creator_flags_defer_files():
+    """创作者关闭下载视频/封面时对应文件延迟下载，图集图片不受影响"""
+    rows = apply_download_policy(_rows(["video", "cover", "image"]), download_video=0, download_cover=0)
+    assert [row["download_status"] for row in rows] == [DEFERRED_STATUS, DEFERRED_STATUS, "pending"]
+
+
+def test_select_cover_file_uses_download_status():
+    """优先选择已下载完成的封面，都未下载时选择最优的可下载封面"""
+    def cover(file_type, status):
+        return SimpleNamespace(file_type=file_type, file_path=f"/tmp/{file_type}.jpg",
+                               download_status=status, source_urls=["http://example.com/c.jpg"])
+    
+    covers = [cover("cover", "completed"), cover("dynamic_cover", DEFERRED_STATUS)]
+    assert select_cover_file(covers).file_type == "cover"
+    covers = [cover("cover", "failed"), cover("origin_cover", DEFERRED_STATUS)]
+    assert select_cover_file(covers).file_type == "origin_cover"
@@ -0,0 +1,117 @@
+import os
+import sys
+import json
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from app.scripts.douyin.downloader import DownloadManager
+from app.scripts.douyin.content_store import ContentStore
+
+
+def test_existing_file_uses_fingerprint(tmp_path, monkeypatch):
+    """已存在的文件大小和修改时间与指纹一致时不重新计算哈希"""
+    file_path = str(tmp_path / "video.mp4")
+    with open(file_path, "wb") as f:
+        f.write(b"video" * 1000)
+    
+    manager = DownloadManager(base_path=str(tmp_path))
+    result = manager._download_file("http://unused", file_path)
+    assert result.success
+    assert result.file_hash == hashlib.md5(b"video" * 1000).hexdigest()
+    
+    # 指纹一致：只 stat，不读文件
+    manager.fingerprints[file_path] = (result.file_size, result.file_mtime, "cached")
+    monkeypatch.setattr(DownloadManager, "_hash_file", staticmethod(lambda path: "rehashed"))
+    assert manager._download_file("http://unused", file_path).file_hash == "cached"
+    
+    # 下载队列传入数据库记录中的指纹
+    manager.fingerprints.clear()
+    fingerprint = (result.file_size, result.file_mtime, "from-row")
+    assert manager.download_with_retries(["http://unused"], file_path, fingerprint=fingerprint).file_hash == "from-row"
+    
+    # 修改时间变化：重新计算哈希
+    os.utime(file_path, ns=(1, 1))
+    assert manager._download_file("http://unused", file_path).file_hash == "rehashed"
+
+
+class _RangeHandler(BaseHTTPRequestHandler):
+    """支持 Range + If-Range 的静态文件"""
+    data = os.urandom(300000)
+    etag = '"v1"'
+    statuses = []
+
+    def do_GET(self):
+        body, status = self.data, 200
+        range_header = self.headers.get("Range")
+        if range_header and self.headers.get("If-Range") == self.etag:
+            start = int(range_header[len("bytes="):-1])
+            body, status = self.data[start:], 206
+        self.statuses.append(status)
+        self.send_response(status)
+        self.send_header("ETag", self.etag)
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{len(self.data) - 1}/{len(self.data)}")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_download_hashes_while_writing(tmp_path, monkeypatch):
+    """下载和续传边写入边计算哈希，完成后不再重新读取整个文件"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _RangeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/video.mp4"
+    data = _RangeHandler.data
+    
+    def unexpected_rehash(path):
+        raise AssertionError("下载完成后不应重新读取文件计算哈希")
+    monkeypatch.setattr(DownloadManager, "_hash_file", staticmethod(unexpected_rehash))
+    manager = DownloadManager(base_path=str(tmp_path))
+    try:
+        result = manager._download_file(url, str(tmp_path / "full.mp4"))
+        assert result.success and result.file_hash == hashlib.md5(data).hexdigest()
+        
+        # 续传：已有前半部分时只下载剩余字节，哈希包含已有部分
+        file_path = str(tmp_path / "resumed.mp4")
+        with open(f"{file_path}.part", "wb") as f:
+            f.write(data[:100000])
+        with open(f"{file_path}.part.json", "w", encoding="utf-8") as f:
+            json.dump({"url": url, "etag": _RangeHandler.etag, "last_modified": None, "total": len(data)}, f)
+        result = manager._download_file(url, file_path)
+        assert _RangeHandler.statuses[-1] == 206
+        assert result.success and result.file_hash == hashlib.md5(data).hexdigest()
+        with open(file_path, "rb") as f:
+            assert f.read() == data
+    finally:
+        server.shutdown()
+
+
+def test_content_store_dedupes_identical_files(tmp_path):
+    """相同内容只保存一份，下载路径为硬链接，未被引用的文件可被清理"""
+    store = ContentStore(str(tmp_path / ".cas"))
+    file_hash = hashlib.md5(b"cover").hexdigest()
+    paths = [str(tmp_path / f"{index}_cover.jpg") for index in range(2)]
+    for path in paths:
+        with open(f"{path}.part", "wb") as f:
+            f.write(b"cover")
+        store.commit(f"{path}.part", path, file_hash)
+    
+    blob_path = store.blob_path(file_hash)
+    assert os.stat(blob_path).st_nlink == 3
+    assert all(os.path.samefile(path, blob_path) for path in paths)
+    
+    store.remember_etag('"abc"', 5, file_hash)
+    assert store.lookup_etag('"abc"', 5) == file_hash
+    assert store.lookup_etag('"abc"', 6) is None
+    
+    for path in paths:
+        os.remove(path)
+    assert store.prune() == 1
+    assert store.lookup_etag('"abc"', 5) is None
@@ -0,0 +1,45 @@
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from app.scripts.douyin.pacer import AdaptivePacer, is_throttled_response, get_pacer
+
+
+def test_is_throttled_response():
+    """空响应、非200和验证码视为被限流"""
+    assert is_throttled_response(200, "")
+    assert is_throttled_response(403, '{"status_code": 0}')
+    assert is_throttled_response(200, '{"verify_check": 1}')
+    assert is_throttled_response(200, '{"aweme_list": []}', {"x-vc-bdturing-parameters": "{}"})
+    assert not is_throttled_response(200, '{"status_code": 0, "aweme_list": []}', {})
+
+
+def test_pacer_speeds_up_and_backs_off():
+    """正常响应加速，异常响应指数退避，且不越过上下限"""
+    pacer = AdaptivePacer(min_interval=0.5, max_interval=8, initial_interval=2)
+
+    for _ in range(50):
+        pacer.record(200, '{"status_code": 0}')
+    assert pacer.interval == 0.5
+    assert pacer.rate == 2
+
+    pacer.record(200, "")
+    assert pacer.interval == 1
+    pacer.record(500, "error")
+    assert pacer.interval == 2
+    assert pacer.consecutive_failures == 2
+    for _ in range(10):
+        pacer.record_failure()
+    assert pacer.interval == 8
+
+    pacer.record_success()
+    assert pacer.consecutive_failures == 0
+    assert pacer.stats()["failure_count"] == 12
+
+
+def test_get_pacer_shared_per_cookie():
+    """同一Cookie共享限速器"""
+    assert get_pacer("a=1") is get_pacer("a=1")
+    assert get_pacer("a=1") is not get_pacer("b=2")
@@ -0,0 +1,94 @@
+import os
+import sys
+import asyncio
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+# 先注册全部模型，tiktok_api 会间接导入用户模型
+import app.db.base  # noqa: F401
+from app.models.douyin import Base, DouyinShareLink
+from app.scripts.douyin.tiktok_api import TikTokApi, AsyncTikTokApi, close_async_http_session
+from app.scripts.douyin.share_links import async_resolve_share_link
+
+
+class _RecordingApi:
+    """记录被请求的短链，返回固定的用户主页地址"""
+
+    def __init__(self):
+        self.requested = []
+
+    async def resolve_share_url(self, share_url: str) -> str:
+        self.requested.append(share_url)
+        return "https://www.douyin.com/user/MS4wLjABAAAAtest"
+
+
+def _create_session():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+
+def test_share_link_cache_hit_and_expiry():
+    """缓存有效期内不再请求短链，过期后重新解析；请求使用原始地址，规范化地址只作缓存键"""
+    db = _create_session()
+    api = _RecordingApi()
+    try:
+        first = asyncio.run(async_resolve_share_link(db, api, " https://v.douyin.com/abc "))
+        second = asyncio.run(async_resolve_share_link(db, api, "https://v.douyin.com/abc/"))
+        assert first == second == ("MS4wLjABAAAAtest", None)
+        assert api.requested == ["https://v.douyin.com/abc"], "命中缓存时不应再请求短链"
+
+        link = db.query(DouyinShareLink).one()
+        assert link.short_url == "https://v.douyin.com/abc/"
+        link.expires_at = datetime.now() - timedelta(seconds=1)
+        db.commit()
+
+        assert asyncio.run(async_resolve_share_link(db, api, "https://v.douyin.com/abc")) == ("MS4wLjABAAAAtest", None)
+        assert len(api.requested) == 2, "缓存过期后应重新解析"
+        assert db.query(DouyinShareLink).one().expires_at > datetime.now(), "重新解析后应刷新缓存有效期"
+    finally:
+        db.close()
+
+
+class _NoHeadHandler(BaseHTTPRequestHandler):
+    """HEAD 返回 405，GET 重定向到用户主页"""
+
+    def do_HEAD(self):
+        self.send_response(405)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        self.send_response(302)
+        self.send_header("Location", "/user/MS4wLjABAAAAtest?from=share")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def test_resolve_share_url_falls_back_to_get():
+    """不支持 HEAD 的短链服务退回 GET 读取重定向地址"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _NoHeadHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    share_url = f"http://127.0.0.1:{server.server_address[1]}/abc/"
+    expected = f"http://127.0.0.1:{server.server_address[1]}/user/MS4wLjABAAAAtest?from=share"
+
+    async def run():
+        try:
+            return await AsyncTikTokApi().resolve_share_url(share_url)
+        finally:
+            await close_async_http_session()
+
+    try:
+        assert TikTokApi().resolve_share_url(share_url) == expected
+        assert asyncio.run(run()) == expected
+    finally:
+        server.shutdown()
@@ -0,0 +1,143 @@
+import os
+import sys
+import gc
+import asyncio
+import warnings
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+# 先注册全部模型，tiktok_api 会间接导入用户模型
+import app.db.base  # noqa: F401
+from app.scripts.douyin import schemas
+from app.scripts.douyin.tiktok_api import TikTokApi, get_http_session, get_async_http_session, close_async_http_session
+
+
+class _CookieEchoHandler(BaseHTTPRequestHandler):
+    """返回请求带的 Cookie，并下发一个新的 Cookie"""
+
+    def do_GET(self):
+        body = (self.headers.get("Cookie") or "").encode()
+        self.send_response(200)
+        self.send_header("Set-Cookie", "sessionid=from-server; Path=/")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _start_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _CookieEchoHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    # 用主机名访问，aiohttp 默认的 CookieJar 不保存 IP 地址下发的 Cookie
+    return server, f"http://localhost:{server.server_address[1]}/"
+
+
+def test_shared_session_keeps_cookies_per_request():
+    """共享的 requests 会话不保存 Set-Cookie，每次请求只带自己的 Cookie"""
+    server, url = _start_server()
+    try:
+        session = get_http_session()
+        assert session.get(url, headers={"Cookie": "sessionid=user-a"}).text == "sessionid=user-a"
+        assert session.get(url, headers={"Cookie": "sessionid=user-b"}).text == "sessionid=user-b"
+        assert session.get(url).text == ""
+        assert len(session.cookies) == 0
+    finally:
+        server.shutdown()
+
+
+def test_shared_async_session_keeps_cookies_per_request():
+    """共享的 aiohttp 会话不保存 Set-Cookie，每次请求只带自己的 Cookie"""
+    server, url = _start_server()
+
+    async def run():
+        session = await get_async_http_session()
+        try:
+            bodies = []
+            for headers in ({"Cookie": "sessionid=user-a"}, {"Cookie": "sessionid=user-b"}, {}):
+                async with session.get(url, headers=headers) as res:
+                    bodies.append(await res.text())
+            return bodies
+        finally:
+            await close_async_http_session()
+
+    try:
+        assert asyncio.run(run()) == ["sessionid=user-a", "sessionid=user-b", ""]
+    finally:
+        server.shutdown()
+
+
+class _HtmlHandler(BaseHTTPRequestHandler):
+    """状态码 200，但返回 HTML 页面"""
+
+    def do_GET(self):
+        body = b"<html><body>please retry</body></html>"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_get_json_returns_none_for_non_json_body():
+    """200 但响应体不是 JSON 时返回 None，交给调用方重试，而不是抛出解析异常"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _HtmlHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        api = TikTokApi(cookie="sessionid=non-json-test")
+        params = schemas.CreatorVideoList(sec_user_id="MS4wLjABAAAAtest", count=20, max_cursor=0)
+        assert api.get_json(f"http://127.0.0.1:{server.server_address[1]}/aweme/post/?", params) is None
+    finally:
+        server.shutdown()
+
+
+def test_async_session_from_closed_loop_is_released():
+    """事件循环结束后留下的会话在下一个事件循环获取会话时被关闭，不产生未关闭会话的警告"""
+    first = asyncio.run(get_async_http_session())
+
+    async def run():
+        try:
+            return await get_async_http_session()
+        finally:
+            await close_async_http_session()
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        second = asyncio.run(run())
+        gc.collect()
+    assert second is not first
+    assert first.closed
+    assert not [w for w in caught if "Unclosed" in str(w.message)]
+
+
+class _TooManyRequestsHandler(BaseHTTPRequestHandler):
+    """始终返回 429，并记录收到的请求数"""
+    requests = 0
+
+    def do_GET(self):
+        type(self).requests += 1
+        self.send_response(429)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def test_shared_session_does_not_retry_429():
+    """429 直接返回给调用方，由限速器退避，连接层不静默重试"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _TooManyRequestsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        res = get_http_session().get(f"http://127.0.0.1:{server.server_address[1]}/")
+        assert res.status_code == 429
+        assert _TooManyRequestsHandler.requests == 1
+    finally:
+        server.shutdown()